@@ -14,7 +14,7 @@ a = Analysis(
         ('config.json', '.'),
         ('icon.png', '.'),
     ],
-    hiddenimports=[],
+    hiddenimports=['loudness', 'fingerprint'],
     hookspath=[],
     runtime_hooks=[],
     excludes=['zlib'],
@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('ffmpeg/ffmpeg.exe', 'ffmpeg'), ('yt-dlp/yt-dlp.exe', 'yt-dlp'), ('config.json', '.'), ('icon.ico', '.')],
-    hiddenimports=[],
+    hiddenimports=['loudness', 'fingerprint'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('ffmpeg/ffmpeg', 'ffmpeg'), ('yt-dlp/yt-dlp', 'yt-dlp'), ('config.json', '.'), ('icon.icns', '.')],
-    hiddenimports=[],
+    hiddenimports=['loudness', 'fingerprint'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
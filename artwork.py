@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "spotdown", "artwork")
+NORMALIZED_DIR = "normalized"
+# Normalized covers kept in memory, enough for the albums of a large run
+MEMORY_CACHE_SIZE = 256
+# Exportify writes "Album Image URL"; other exporters use shorter names
+COVER_URL_FIELDS = ("Album Image URL", "Album Art URL", "Image URL")
+
+log = logging.getLogger(__name__)
+
+
+def cover_url(row):
+    for field in COVER_URL_FIELDS:
+        if (row.get(field) or "").strip():
+            return row[field].strip()
+    return None
+
+
+def album_key(row):
+    """Identity of a row's album, so its tracks share one cover download."""
+    return (row.get("Album URI") or "").strip() or cover_url(row)
+
+
+class ArtworkFetcher:
+    """
+    Downloads album covers over one pooled HTTP session.
+
+    Covers are stored in ``cache_dir`` under the SHA-1 of their URL, so a
+    cover is downloaded once across runs and playlists, and a URL already
+    being fetched is waited for rather than requested again. At most
+    ``workers`` downloads run at a time, sharing as many kept-alive
+    connections. Pass ``session`` to use a preconfigured requests.Session.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, workers=4, timeout=15, session=None):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.timeout = timeout
+        self._session = session
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="artwork"
+        )
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                # requests is imported on first use to keep GUI start-up fast
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                adapter = HTTPAdapter(
+                    pool_connections=self.workers,
+                    pool_maxsize=self.workers,
+                    max_retries=2,
+                )
+                self._session = requests.Session()
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+            return self._session
+
+    def cache_path(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".jpg")
+
+    def fetch(self, url):
+        """Future resolving to the cached cover file for ``url``, or None."""
+        with self._lock:
+            future = self._pending.get(url)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._download, url)
+            self._pending[url] = future
+        # Outside the lock: the callback runs here if the download already ended
+        future.add_done_callback(partial(self._forget, url))
+        return future
+
+    def _forget(self, url, future):
+        # Once done the cover is on disk (or failed and may be retried), so
+        # later fetches go to the cache instead of a kept future
+        with self._lock:
+            if self._pending.get(url) is future:
+                del self._pending[url]
+
+    def _download(self, url):
+        path = self.cache_path(url)
+        if os.path.isfile(path):
+            return path
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            log.warning("Could not fetch artwork %s: %s", url, e)
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.part"
+        with open(tmp, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp, path)
+        return path
+
+    def fetch_rows(self, tracks):
+        """
+        Covers for (track number, CSV row) pairs.
+
+        Returns:
+            dict: track number -> cached cover file, for tracks whose cover
+                could be fetched
+        """
+        albums = {}
+        for number, row in tracks:
+            url = cover_url(row)
+            if url:
+                albums.setdefault(album_key(row), (url, []))[1].append(number)
+        futures = [(self.fetch(url), numbers) for url, numbers in albums.values()]
+        covers = {}
+        for future, numbers in futures:
+            path = future.result()
+            if path:
+                covers.update(dict.fromkeys(numbers, path))
+        return covers
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def shared_fetcher(config=None):
+    """
+    The process-wide ArtworkFetcher, sized by the ``artwork_workers`` config
+    key (default 4) and caching in ``artwork_cache_dir`` if set.
+    """
+    global _fetcher
+    config = config or {}
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = ArtworkFetcher(
+                cache_dir=config.get("artwork_cache_dir") or CACHE_DIR,
+                workers=int(config.get("artwork_workers") or 4),
+            )
+        return _fetcher
+
+
+_normalized = OrderedDict()
+_normalized_lock = threading.Lock()
+
+
+def scale_with_pillow(src, dst, max_size, quality):
+    from PIL import Image
+
+    with Image.open(src) as image:
+        image = image.convert("RGB")
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+        image.save(dst, "JPEG", quality=quality, optimize=True)
+
+
+def scale_with_ffmpeg(src, dst, max_size, quality, ffmpeg_exe):
+    # ffmpeg's JPEG scale runs from 2 (best) to 31
+    qscale = round(2 + (100 - quality) * 29 / 100)
+    subprocess.run(
+        [
+            ffmpeg_exe,
+            "-y",
+            "-loglevel",
+            "error",
+            "-i",
+            src,
+            "-vf",
+            f"scale='min({max_size},iw)':'min({max_size},ih)'"
+            ":force_original_aspect_ratio=decrease",
+            "-frames:v",
+            "1",
+            "-q:v",
+            str(qscale),
+            dst,
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+
+def normalized_cover(
+    path, max_size=800, quality=85, cache_dir=CACHE_DIR, ffmpeg_exe="ffmpeg"
+):
+    """
+    JPEG bytes of the cover in ``path``, scaled down to fit ``max_size``
+    pixels and re-encoded at ``quality``.
+
+    Results are cached by the cover's content hash and the settings, in
+    memory and under ``cache_dir``, so every track of an album embeds the
+    same bytes and each distinct cover is decoded once. Uses Pillow when
+    installed, else ffmpeg; if both fail the original file is used as is.
+    """
+    with open(path, "rb") as f:
+        original = f.read()
+    digest = hashlib.sha1(original).hexdigest() + f"_{max_size}_{quality}"
+    with _normalized_lock:
+        if digest in _normalized:
+            _normalized.move_to_end(digest)
+            return _normalized[digest]
+
+    target = os.path.join(cache_dir, NORMALIZED_DIR, digest + ".jpg")
+    if not os.path.isfile(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{threading.get_ident()}.part.jpg"
+        try:
+            try:
+                scale_with_pillow(path, tmp, max_size, quality)
+            except ImportError:
+                scale_with_ffmpeg(path, tmp, max_size, quality, ffmpeg_exe)
+            os.replace(tmp, target)
+        except Exception as e:
+            print(f"Could not normalize cover {path}, embedding it as is: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return original
+    with open(target, "rb") as f:
+        data = f.read()
+    # A cover that was already small may only grow by re-encoding
+    if len(original) < len(data) and original[:3] == b"\xff\xd8\xff":
+        data = original
+    with _normalized_lock:
+        _normalized[digest] = data
+        while len(_normalized) > MEMORY_CACHE_SIZE:
+            _normalized.popitem(last=False)
+    return data
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Each probe runs in a fresh interpreter and prints seconds since it started
+# for "import" (app module loaded) and "window" (first window drawn).
+PROBES = {
+    "tk": """
+import time
+t0 = time.perf_counter()
+import json
+import tkinter as tk
+import spotify2media
+t1 = time.perf_counter()
+root = tk.Tk()
+app = spotify2media.Spotify2MP3GUI(root)
+root.update()
+t2 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "window": t2 - t0}))
+root.destroy()
+""",
+    "qt": """
+import time
+t0 = time.perf_counter()
+import json
+import sys
+import spotdown
+t1 = time.perf_counter()
+app = spotdown.QApplication(sys.argv)
+window = spotdown.SpotDownMainWindow()
+app.processEvents()
+t2 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "window": t2 - t0}))
+window.close()
+""",
+}
+
+
+def run_probe(app, offscreen=False):
+    env = dict(os.environ)
+    if offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBES[app]],
+        cwd=HERE,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    # The app may print while starting; the probe's result is the last line
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process"] = wall
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure import time and time-to-first-window of the desktop apps"
+    )
+    parser.add_argument("--app", choices=["tk", "qt", "all"], default="all")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--offscreen",
+        action="store_true",
+        help="Use Qt's offscreen platform (for machines without a display)",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    apps = ["tk", "qt"] if args.app == "all" else [args.app]
+    report = {}
+    for app in apps:
+        try:
+            # First run warms the .ui cache and bytecode; it is not counted
+            run_probe(app, args.offscreen)
+            runs = [run_probe(app, args.offscreen) for _ in range(args.runs)]
+        except RuntimeError as e:
+            report[app] = {"error": str(e)}
+            continue
+        report[app] = {
+            key: statistics.median(r[key] for r in runs)
+            for key in ("import", "window", "process")
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for app, result in report.items():
+        if "error" in result:
+            print(f"{app}: failed ({result['error']})")
+            continue
+        print(
+            f"{app}: import {result['import'] * 1000:.0f} ms, "
+            f"first window {result['window'] * 1000:.0f} ms, "
+            f"process {result['process'] * 1000:.0f} ms "
+            f"(median of {args.runs})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,24 @@
+import base64
 import os
+import signal
 import subprocess
 import csv
+import glob
 import re
 import json
+import shutil
 import time
+import random
 import sys
 import platform
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import timedelta
-from mutagen.easyid3 import EasyID3
-from mutagen.mp4 import MP4, MP4Tags
-from pathlib import PureWindowsPath
+
+import artwork
+import throttle
+from eta import EtaModel
 
 
 def resource_path(relative_path):
@@ -29,6 +38,8 @@ def load_config():
         "transcode_mp3": "false",
         "generate_m3u": "true",
         "exclude_instrumentals": "false",
+        "workers": 4,
+        "negative_cache_days": 7,
     }
     if os.path.isfile(CONFIG_FILE):
         try:
@@ -40,6 +51,19 @@ def load_config():
     return default
 
 
+def is_transient_error(stderr):
+    stderr = (stderr or "").lower()
+    return any(marker in stderr for marker in TRANSIENT_ERRORS)
+
+
+def config_flag(config, key, default=False):
+    """Read a boolean setting that may be stored as a bool or a "true" string."""
+    value = config.get(key, default)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
 def get_file_timestamps(file_path):
     return {
         "created": os.path.getctime(file_path),
@@ -51,59 +75,73 @@ def set_file_timestamps(file_path, timestamps):
     os.utime(file_path, (timestamps["modified"], timestamps["modified"]))
 
 
-def embed_artwork(audio_file, jpg_file):
+def embed_artwork(audio_file, jpg_file, config=None):
+    """
+    Embed ``jpg_file`` as the front cover of ``audio_file``.
+
+    The cover goes through artwork.normalized_cover first (at most
+    ``artwork_max_size`` pixels, ``artwork_quality`` JPEG quality), so the
+    tracks of an album share one small, once-encoded JPEG, which mutagen
+    writes into the tags without touching the audio stream.
+    """
+    config = config or {}
     print(f"\nEmbedding artwork for: {audio_file}")
     print(f"Using artwork: {jpg_file}")
 
-    timestamps = get_file_timestamps(audio_file)
-
-    audio_dir = os.path.dirname(audio_file)
-    audio_filename = os.path.basename(audio_file)
-    temp_output = os.path.join(audio_dir, f"temp_{audio_filename}")
-
-    if platform.system() == "Darwin":
-        ffmpeg_path = resource_path("ffmpeg")
-        ffmpeg_exe = os.path.join(ffmpeg_path, "ffmpeg")
-    elif platform.system() == "Linux":
-        ffmpeg_exe = "ffmpeg"
-    else:
-        ffmpeg_path = resource_path("ffmpeg")
-        ffmpeg_exe = os.path.join(
-            ffmpeg_path, "ffmpeg.exe" if platform.system() == "Windows" else "ffmpeg"
-        )
-
-    cmd = [
-        ffmpeg_exe,
-        "-i",
-        audio_file,
-        "-i",
-        jpg_file,
-        "-map",
-        "0:a",
-        "-map",
-        "1:v",
-        "-c:a",
-        "copy",
-        "-c:v",
-        "mjpeg",
-        "-disposition:v:0",
-        "attached_pic",
-        temp_output,
-    ]
+    ext = os.path.splitext(audio_file)[1].lower()
+    if ext == ".webm":
+        print(f"Skipping {audio_file}: WebM files cannot hold cover art")
+        return
     try:
-        creationflags = (
-            subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-        )
-        subprocess.run(
-            cmd, check=True, capture_output=True, creationflags=creationflags
+        data = artwork.normalized_cover(
+            jpg_file,
+            max_size=int(config.get("artwork_max_size") or 800),
+            quality=int(config.get("artwork_quality") or 85),
+            cache_dir=config.get("artwork_cache_dir") or artwork.CACHE_DIR,
+            ffmpeg_exe=find_executables(config)[0],
         )
-        os.replace(temp_output, audio_file)
-        set_file_timestamps(audio_file, timestamps)
+        embed_cover(audio_file, data)
         print(f"Successfully embedded artwork for {audio_file}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error processing {audio_file}: {e.stderr.decode()}")
-        if os.path.exists(temp_output):
-            os.remove(temp_output)
+    except Exception as e:
+        print(f"Error processing {audio_file}: {e}")
+
+
+def embed_cover(audio_file, data):
+    """Write JPEG bytes as the front cover of an MP3, MP4 or Ogg file."""
+    from mutagen import File
+    from mutagen.id3 import APIC, ID3, ID3NoHeaderError
+    from mutagen.mp4 import MP4, MP4Cover
+
+    timestamps = get_file_timestamps(audio_file)
+    ext = os.path.splitext(audio_file)[1].lower()
+    if ext in OGG_AUDIO_EXTS:
+        # Vorbis comments carry the picture, no need to rewrite the stream
+        from mutagen.flac import Picture
+
+        picture = Picture()
+        picture.type = 3  # front cover
+        picture.mime = "image/jpeg"
+        picture.data = data
+        audio = File(audio_file)
+        audio["metadata_block_picture"] = [
+            base64.b64encode(picture.write()).decode("ascii")
+        ]
+        audio.save()
+    elif ext in (".m4a", ".mp4"):
+        audio = MP4(audio_file)
+        if audio.tags is None:
+            audio.add_tags()
+        audio.tags["covr"] = [MP4Cover(data, imageformat=MP4Cover.FORMAT_JPEG)]
+        audio.save()
+    else:
+        try:
+            tags = ID3(audio_file)
+        except ID3NoHeaderError:
+            tags = ID3()
+        tags.delall("APIC")
+        tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="", data=data))
+        tags.save(audio_file)
+    set_file_timestamps(audio_file, timestamps)
 
 
 def clean_filename_for_artwork(filename):
@@ -122,9 +160,7 @@ def rename_album_art(output_dir, not_found_songs=None):
 
     failed_track_numbers = {song["Track Number"] for song in not_found_songs}
 
-    audio_files = [
-        f for f in os.listdir(output_dir) if f.lower().endswith((".mp3", ".m4a"))
-    ]
+    audio_files = [f for f in os.listdir(output_dir) if f.lower().endswith(AUDIO_EXTS)]
     jpg_files = [f for f in os.listdir(output_dir) if f.endswith(".jpg")]
 
     audio_files.sort(key=lambda x: os.path.getctime(os.path.join(output_dir, x)))
@@ -161,7 +197,7 @@ def rename_album_art(output_dir, not_found_songs=None):
         i += 1
 
 
-def embed_all_artwork(csv_path, output_dir, not_found_songs=None):
+def embed_all_artwork(csv_path, output_dir, not_found_songs=None, config=None):
     if not_found_songs is None:
         not_found_songs = []
 
@@ -184,9 +220,7 @@ def embed_all_artwork(csv_path, output_dir, not_found_songs=None):
         print(f"Error reading CSV file: {str(e)}")
         return
 
-    audio_files = [
-        f for f in os.listdir(output_dir) if f.lower().endswith((".m4a", ".mp3"))
-    ]
+    audio_files = [f for f in os.listdir(output_dir) if f.lower().endswith(AUDIO_EXTS)]
     jpg_files = [f for f in os.listdir(output_dir) if f.endswith(".jpg")]
 
     audio_files.sort(key=lambda x: os.path.getctime(os.path.join(output_dir, x)))
@@ -221,24 +255,8 @@ def embed_all_artwork(csv_path, output_dir, not_found_songs=None):
                     artist = "Unknown Artist"
                     album = "Unknown Album"
 
-                if audio_file.lower().endswith(".m4a"):
-                    audio = MP4(audio_path)
-                    tags = audio.tags or MP4Tags()
-                    tags["\xa9nam"] = [title]
-                    tags["\xa9ART"] = [artist]
-                    tags["\xa9alb"] = [album]
-                    audio.save()
-                else:  # MP3
-                    try:
-                        audio = EasyID3(audio_path)
-                    except:
-                        audio = EasyID3()
-                    audio["title"] = title
-                    audio["artist"] = artist
-                    audio["album"] = album
-                    audio.save()
-
-                embed_artwork(audio_path, jpg_path)
+                tag_audio(audio_path, title, artist, album)
+                embed_artwork(audio_path, jpg_path, config)
 
             except Exception as e:
                 print(f"Error processing {audio_file}: {str(e)}")
@@ -259,47 +277,533 @@ def contains_keywords_in_order(candidate_title: str, keywords: list[str]) -> boo
     return True
 
 
-def convert_playlist(
-    csv_path,
-    output_folder,
-    config,
-    deep_search=True,
-    transcode_mp3=False,
-    generate_m3u=True,
-    exclude_instrumentals=False,
-    embed_thumbnails=False,
-    spotify_art=False,
-    progress_callback=None,
-):
+MANIFEST_FILE = "manifest.json"
+NEGATIVE_CACHE_FILE = ".spotdown_negative_cache.json"
+QUERY_STATS_FILE = ".spotdown_query_stats.json"
+CHANNEL_INDEX_FILE = ".spotdown_channels.json"
+FINGERPRINT_FILE = ".spotdown_fingerprints.json"
+# Query shapes tried after the configured variants when deep search can
+# verify the result: the artist's "- Topic" channel, and the title alone
+FALLBACK_SHAPES = ("@topic", "@title")
+# Extra query shapes tried by retry_failures
+RETRY_VARIANTS = ("official audio", "audio", "lyrics")
+REMOVED_DIR = "removed"
+# yt-dlp errors that say nothing about the track: the search or download may
+# well succeed on another run
+TRANSIENT_ERRORS = (
+    "timed out",
+    "temporary failure in name resolution",
+    "name or service not known",
+    "getaddrinfo failed",
+    "network is unreachable",
+    "connection reset",
+    "connection refused",
+    "connection aborted",
+    "remote end closed connection",
+    "http error 429",
+    "http error 5",
+)
+PARTIAL_FILE_PATTERNS = ("temp_*", "*.part", "*.part-Frag*", "*.ytdl", "*.temp.*")
+# Containers bestaudio may arrive in before transcoding
+RAW_AUDIO_EXTS = (".m4a", ".webm", ".opus", ".ogg", ".mka", ".mp4", ".aac")
+OGG_AUDIO_EXTS = (".opus", ".ogg")
+# Files treated as playlist tracks by the artwork and library stages
+AUDIO_EXTS = (".mp3", ".m4a", ".opus", ".ogg", ".webm")
+# output_format policies: the yt-dlp format selector, the extension the
+# track must end up with (None keeps the source) and the ffmpeg encoder used
+# when the download does not already fit
+# "kbps" is the typical bitrate of the downloaded stream and of the output
+# file, used by plan_playlist to estimate sizes
+OUTPUT_FORMATS = {
+    "native": {"select": "bestaudio", "ext": None, "codec": None, "kbps": (140, 140)},
+    "m4a": {
+        "select": "bestaudio[ext=m4a]/bestaudio",
+        "ext": ".m4a",
+        "codec": None,
+        "kbps": (130, 130),
+    },
+    "mp3": {
+        "select": "bestaudio[ext=m4a]/bestaudio",
+        "ext": ".mp3",
+        "codec": ["libmp3lame", "-q:a", "0", "-id3v2_version", "3"],
+        "kbps": (130, 245),
+    },
+    "opus": {
+        "select": "bestaudio[acodec=opus]/bestaudio",
+        "ext": ".opus",
+        "codec": ["libopus", "-b:a", "160k"],
+        "kbps": (140, 160),
+    },
+}
+# Assumed for tracks whose CSV row has no duration
+DEFAULT_TRACK_SECONDS = 210
+NOT_FOUND_FIELDS = [
+    "Track Name",
+    "Artist Name(s)",
+    "Album Name",
+    "Track Number",
+    "Error",
+]
+
+
+def terminate_process_tree(proc):
+    """Stop a child process together with the processes it spawned."""
+    if proc.poll() is not None:
+        return
+    try:
+        if platform.system() == "Windows":
+            subprocess.run(
+                ["taskkill", "/T", "/F", "/PID", str(proc.pid)],
+                capture_output=True,
+                creationflags=subprocess.CREATE_NO_WINDOW,
+            )
+        else:
+            os.killpg(proc.pid, signal.SIGTERM)
+    except OSError:
+        pass
+
+
+class Cancelled(Exception):
+    """Raised inside a conversion once its CancelToken has been cancelled."""
+
+
+class InsufficientSpace(OSError):
+    """Raised before a run starts when its output would not fit on disk."""
+
+
+class CancelToken:
     """
-    Core conversion function
+    Shared with a running conversion to pause, resume or cancel it.
 
-    Args:
-        csv_path: Path to CSV file with playlist
-        output_folder: Folder to save downloaded files
-        config: Configuration dictionary
-        deep_search: Enable deep search mode
-        transcode_mp3: Convert to MP3 format
-        generate_m3u: Generate M3U playlist file
-        exclude_instrumentals: Filter out instrumental versions
-        embed_thumbnails: Embed video thumbnails as artwork
-        spotify_art: Use Spotify album art
-        progress_callback: Optional callback function(current, total, status_text)
+    Pausing is cooperative: work stops at the next search or download while
+    in-flight child processes finish. Cancelling also terminates every child
+    process started through ``run`` so yt-dlp and ffmpeg do not outlive it.
+    """
 
-    Returns:
-        tuple: (downloaded_files, not_found_songs)
+    def __init__(self):
+        self._event = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._lock = threading.Lock()
+        self._procs = set()
+
+    def cancel(self):
+        self._event.set()
+        self._running.set()
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            terminate_process_tree(proc)
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def check(self):
+        """Block while paused, then raise Cancelled if the run was cancelled."""
+        self._running.wait()
+        if self._event.is_set():
+            raise Cancelled()
+
+    def run(self, cmd, **kwargs):
+        """
+        subprocess.run() replacement whose child is killed on cancel().
+
+        Accepts the capture_output, text and creationflags arguments used here.
+        """
+        self.check()
+        capture = kwargs.pop("capture_output", False)
+        if capture:
+            kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+        if platform.system() != "Windows":
+            kwargs["start_new_session"] = True
+        proc = subprocess.Popen(cmd, **kwargs)
+        with self._lock:
+            self._procs.add(proc)
+        if self.cancelled:
+            terminate_process_tree(proc)
+        try:
+            try:
+                stdout, stderr = proc.communicate()
+            except BaseException:
+                terminate_process_tree(proc)
+                proc.kill()
+                proc.wait()
+                raise
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+        if proc.returncode != 0 and self.cancelled:
+            raise Cancelled()
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+class SearchCache:
     """
-    start_time = time.time()
-    duration_min = config.get("duration_min", 0)
-    duration_max = config.get("duration_max", float("inf"))
+    Thread-safe LRU cache of resolved searches, shared across tracks and jobs.
 
-    playlist_name = os.path.splitext(os.path.basename(csv_path))[0]
-    output_dir = os.path.join(output_folder, playlist_name)
-    os.makedirs(output_dir, exist_ok=True)
+    Maps a search (query, expected duration, deep search flag) to the
+    download spec it resolved to, so repeated tracks skip the yt-dlp probes.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FolderStore:
+    """
+    JSON file in an output folder holding what earlier runs learned.
+
+    ``for_folder`` hands every job writing to the same folder one shared
+    instance. Subclasses keep ``_data`` JSON-serialisable, guard it with
+    ``_lock`` and may filter what is written in ``snapshot``.
+    """
+
+    FILENAME = None
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self.empty()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        if isinstance(data, dict):
+            self._data.update(data)
+
+    def empty(self):
+        return {}
+
+    @classmethod
+    def for_folder(cls, output_folder):
+        path = os.path.abspath(os.path.join(output_folder, cls.FILENAME))
+        with FolderStore._instances_lock:
+            store = FolderStore._instances.get(path)
+            if store is None:
+                store = FolderStore._instances[path] = cls(path)
+            return store
+
+    def snapshot(self):
+        return self._data
+
+    def save(self):
+        with self._lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class NegativeCache(FolderStore):
+    """
+    Remembers tracks that could not be matched, per output folder.
+
+    Each failed track records the search strategies (deep/flat search plus
+    query shape) that were tried. For ``ttl`` seconds after the last
+    failure, later runs skip those strategies, so a hopeless track costs
+    nothing unless the config offers a strategy it has not failed with
+    yet. Successes clear the record.
+    """
+
+    FILENAME = NEGATIVE_CACHE_FILE
+    ttl = 0
+
+    @classmethod
+    def for_folder(cls, output_folder, ttl):
+        cache = super().for_folder(output_folder)
+        cache.ttl = ttl
+        return cache
+
+    def get(self, key):
+        with self._lock:
+            record = self._data.get(key)
+            if record and time.time() - record["time"] > self.ttl:
+                del self._data[key]
+                return None
+            return record
+
+    def record_failure(self, key, strategies, error):
+        with self._lock:
+            record = self._data.get(key) or {"tried": []}
+            tried = record["tried"] + [
+                s for s in strategies if s not in record["tried"]
+            ]
+            self._data[key] = {"time": time.time(), "error": error, "tried": tried}
+
+    def clear(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def snapshot(self):
+        now = time.time()
+        return {k: v for k, v in self._data.items() if now - v["time"] <= self.ttl}
+
+
+class QueryStats(FolderStore):
+    """
+    How often each search query shape led to an accepted match, overall and
+    per artist.
+
+    A shape is a configured variant ("" is plain title + artist) or one of
+    the FALLBACK_SHAPES. ``plan`` orders a track's shapes by smoothed
+    success rate, using the artist's own history once it has
+    ``ARTIST_MIN_ATTEMPTS`` tries, and drops shapes that have not worked
+    once in ``PRUNE_AFTER`` attempts.
+
+    Counts are halved whenever a shape passes ``MAX_TRIES``, so old runs
+    weigh less than recent ones, and a dropped shape is still tried last
+    in an ``EXPLORE_RATE`` share of plans so that it can earn its way back.
+    """
+
+    FILENAME = QUERY_STATS_FILE
+    ARTIST_MIN_ATTEMPTS = 2
+    PRUNE_AFTER = 20
+    MAX_TRIES = 50
+    EXPLORE_RATE = 0.05
+
+    def empty(self):
+        return {"global": {}, "artists": {}}
+
+    def record(self, artist, shape, success):
+        with self._lock:
+            artist_counts = self._data["artists"].setdefault(artist.lower(), {})
+            for counts in (self._data["global"], artist_counts):
+                hits, tries = counts.get(shape, (0, 0))
+                hits, tries = hits + bool(success), tries + 1
+                if tries > self.MAX_TRIES:
+                    hits, tries = hits / 2, tries / 2
+                counts[shape] = [hits, tries]
+
+    def plan(self, artist, shapes):
+        with self._lock:
+            overall = self._data["global"]
+            mine = self._data["artists"].get(artist.lower(), {})
+
+            def counts(shape):
+                hits, tries = mine.get(shape, (0, 0))
+                if tries < self.ARTIST_MIN_ATTEMPTS:
+                    hits, tries = overall.get(shape, (0, 0))
+                return hits, tries
+
+            kept = [
+                shape
+                for shape in shapes
+                if counts(shape)[0] or counts(shape)[1] < self.PRUNE_AFTER
+            ]
+            rates = {
+                shape: (counts(shape)[0] + 1) / (counts(shape)[1] + 2) for shape in kept
+            }
+        # sorted() is stable, so untried shapes keep the configured order
+        plan = sorted(kept, key=rates.get, reverse=True)
+        if random.random() < self.EXPLORE_RATE:
+            plan += [shape for shape in shapes if shape not in kept]
+        return plan or shapes[:1]
+
+
+class ChannelIndex(FolderStore):
+    """
+    Channels that supplied accepted deep-search matches, per artist.
+
+    Once a channel (typically the artist's "- Topic" channel) has matched
+    one of an artist's tracks, deep search looks for it in the first
+    listing and accepts it on the listing's title and duration alone,
+    and probes candidates from it first otherwise.
+    """
+
+    FILENAME = CHANNEL_INDEX_FILE
+
+    def record(self, artist, channel):
+        with self._lock:
+            channels = self._data.setdefault(artist.lower(), {})
+            channels[channel] = channels.get(channel, 0) + 1
+
+    def channels(self, artist):
+        with self._lock:
+            return set(self._data.get(artist.lower(), ()))
 
-    downloaded = []
-    not_found_songs = []
 
+class FingerprintStore(FolderStore):
+    """
+    Acoustic fingerprints of a playlist folder's tracks, by file name.
+
+    Each fingerprint is stored with its file's size and modification time
+    and is only trusted while both are unchanged.
+    """
+
+    FILENAME = FINGERPRINT_FILE
+
+    def get(self, name, stat):
+        with self._lock:
+            entry = self._data.get(name)
+        if (
+            entry
+            and entry["size"] == stat.st_size
+            and entry["mtime"] == stat.st_mtime_ns
+        ):
+            return entry["fingerprint"]
+        return None
+
+    def put(self, name, stat, fingerprint):
+        with self._lock:
+            self._data[name] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "fingerprint": fingerprint,
+            }
+
+    def prune(self, names):
+        """Forget files other than ``names``."""
+        with self._lock:
+            for name in set(self._data) - set(names):
+                del self._data[name]
+
+
+class ConnectionBudget:
+    """
+    Caps the download connections open at once across every worker thread.
+
+    Each download asks for the connections it would like and is granted
+    what is left of the budget (at least one, waiting for it if necessary),
+    so parallel tracks share the cap instead of each opening the maximum.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, wanted, cancel_token=None):
+        while True:
+            with self._cond:
+                free = self.limit - self.in_use
+                if free > 0:
+                    granted = max(1, min(wanted, free))
+                    self.in_use += granted
+                    return granted
+                self._cond.wait(0.5)
+            if cancel_token is not None:
+                cancel_token.check()
+
+    def release(self, granted):
+        with self._cond:
+            self.in_use -= granted
+            self._cond.notify_all()
+
+
+_connection_budget = None
+_transcode_pool = None
+_shared_lock = threading.Lock()
+
+
+def connection_budget(config=None):
+    """
+    Process-wide ConnectionBudget sized by the ``max_connections`` config key,
+    or None when connections are not capped.
+    """
+    global _connection_budget
+    limit = int((config or {}).get("max_connections") or 0)
+    with _shared_lock:
+        if _connection_budget is None and limit > 0:
+            _connection_budget = ConnectionBudget(limit)
+    return _connection_budget
+
+
+def transcode_pool(config=None):
+    """
+    Process-wide executor for the ffmpeg stage, shared by every playlist.
+
+    Each task blocks on one ffmpeg child, so sizing it to the CPU count keeps
+    every core encoding without tying up download slots. Override with the
+    ``transcode_workers`` config key.
+    """
+    global _transcode_pool
+    with _shared_lock:
+        if _transcode_pool is None:
+            _transcode_pool = ThreadPoolExecutor(
+                max_workers=transcode_workers(config), thread_name_prefix="transcode"
+            )
+    return _transcode_pool
+
+
+def transcode_workers(config=None):
+    return int((config or {}).get("transcode_workers") or os.cpu_count() or 1)
+
+
+def find_downloader(config):
+    """
+    Resolve the ``external_downloader`` setting to an executable path.
+
+    "auto" uses aria2c when it is installed; a name or path is used as is if
+    it can be found. Returns None for yt-dlp's built-in downloader.
+    """
+    name = (config.get("external_downloader") or "").strip()
+    if not name or name.lower() in ("native", "none", "false"):
+        return None
+    if name.lower() == "auto":
+        return shutil.which("aria2c")
+    found = shutil.which(name) or (name if os.path.isfile(name) else None)
+    if not found:
+        print(f"External downloader {name!r} not found, using yt-dlp's own")
+    return found
+
+
+def download_args(job, connections):
+    """yt-dlp options that spread one download over ``connections`` connections."""
+    args = ["--proxy", job["proxy"]] if job["proxy"] else []
+    if connections > 1:
+        args += ["--concurrent-fragments", str(connections)]
+    downloader = job["downloader"]
+    if downloader:
+        args += ["--downloader", downloader]
+        if os.path.basename(downloader).lower().startswith("aria2c"):
+            n = max(connections, 1)
+            args += [
+                "--downloader-args",
+                f"aria2c:-x {n} -s {n} -k 1M --summary-interval=0",
+            ]
+    return args
+
+
+def find_executables(config=None):
+    config = config or {}
+    if config.get("ffmpeg_path") and config.get("yt_dlp_path"):
+        return config["ffmpeg_path"], config["yt_dlp_path"]
     base_dir = os.path.dirname(os.path.abspath(__file__))
     if platform.system() == "Darwin":
         ffmpeg_exe = os.path.join(resource_path("ffmpeg"), "ffmpeg")
@@ -310,100 +814,659 @@ def convert_playlist(
     else:
         ffmpeg_exe = os.path.join(base_dir, "ffmpeg", "ffmpeg.exe")
         yt_dlp_exe = os.path.join(base_dir, "yt-dlp", "yt-dlp.exe")
+    return (
+        config.get("ffmpeg_path") or ffmpeg_exe,
+        config.get("yt_dlp_path") or yt_dlp_exe,
+    )
 
-    rows = list(csv.DictReader(open(csv_path, newline="", encoding="utf-8")))
-    total = len(rows)
-    archive_file = os.path.join(output_dir, "downloaded.txt")
-    creationflags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
 
-    for i, row in enumerate(rows, start=1):
-        title = row.get("Track Name") or row.get("Track name") or "Unknown"
-        artist_raw = row.get("Artist Name(s)") or row.get("Artist name") or "Unknown"
-        artist_primary = re.split(r"[,/&]| feat\.| ft\.", artist_raw, flags=re.I)[
-            0
-        ].strip()
-        safe_artist = re.sub(r"[^\w\s]", "", artist_primary)
-        album = row.get("Album Name") or row.get("Album") or playlist_name
-        spotify_ms = row.get("Duration (ms)")
-        spotify_sec = (
+def read_rows(csv_path):
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def track_key(row):
+    """Stable identity of a CSV row: the Spotify URI, else title and artist."""
+    uri = (row.get("Track URI") or row.get("Spotify ID") or "").strip()
+    if uri:
+        return uri
+    title = row.get("Track Name") or row.get("Track name") or ""
+    artist = row.get("Artist Name(s)") or row.get("Artist name") or ""
+    return f"{normalize(title).strip()}|{normalize(artist).strip()}"
+
+
+def channel_key(info):
+    """Channel of a yt-dlp search entry or video, for ChannelIndex."""
+    return info.get("channel_id") or (info.get("uploader") or "").lower() or None
+
+
+def track_info(row, playlist_name):
+    title = row.get("Track Name") or row.get("Track name") or "Unknown"
+    artist_raw = row.get("Artist Name(s)") or row.get("Artist name") or "Unknown"
+    artist_primary = re.split(r"[,/&]| feat\.| ft\.", artist_raw, flags=re.I)[0].strip()
+    spotify_ms = row.get("Duration (ms)")
+    return {
+        "key": track_key(row),
+        "title": title,
+        "artist": artist_primary,
+        "safe_title": re.sub(r"[^\w\s]", "", title),
+        "safe_artist": re.sub(r"[^\w\s]", "", artist_primary),
+        "album": row.get("Album Name") or row.get("Album") or playlist_name,
+        "spotify_sec": (
             int(spotify_ms) / 1000 if spotify_ms and spotify_ms.isdigit() else None
+        ),
+    }
+
+
+def tag_audio(path, title, artist, album, tracknumber=None):
+    # mutagen is imported on first use to keep GUI start-up fast
+    from mutagen import File
+    from mutagen.easyid3 import EasyID3
+    from mutagen.mp4 import MP4, MP4Tags
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".webm":
+        # mutagen cannot write Matroska tags; yt-dlp's metadata stays
+        return
+    if ext in OGG_AUDIO_EXTS:
+        audio = File(path)
+        if audio is None:
+            raise ValueError(f"Unrecognised Ogg file: {path}")
+        if audio.tags is None:
+            audio.add_tags()
+        audio["title"] = [title]
+        audio["artist"] = [artist]
+        audio["album"] = [album]
+        if tracknumber:
+            audio["tracknumber"] = [str(tracknumber)]
+        audio.save()
+    elif ext in (".m4a", ".mp4"):
+        audio = MP4(path)
+        tags = audio.tags or MP4Tags()
+        tags["\xa9nam"] = [title]
+        tags["\xa9ART"] = [artist]
+        tags["\xa9alb"] = [album]
+        if tracknumber:
+            tags["trkn"] = [(int(tracknumber), 0)]
+        audio.save()
+    else:
+        audio = EasyID3()
+        try:
+            audio.load(path)
+        except:
+            pass
+        audio.update({"artist": artist, "title": title, "album": album})
+        if tracknumber:
+            audio["tracknumber"] = str(tracknumber)
+        audio.save(path)
+
+
+def renumber_filename(filename, number):
+    return re.sub(r"^\d+ - ", f"{number:03d} - ", filename, count=1)
+
+
+def recover_entries(rows, output_dir, playlist_name):
+    """
+    Manifest entries for a folder written before manifests existed, matching
+    CSV rows to files by their track number prefix.
+    """
+    names = sorted(f for f in os.listdir(output_dir) if f.endswith(AUDIO_EXTS))
+    entries = []
+    for i, row in enumerate(rows, start=1):
+        info = track_info(row, playlist_name)
+        file = next((f for f in names if f.startswith(f"{i:03d} - ")), None)
+        entries.append(
+            {
+                "key": info["key"],
+                "number": i,
+                "title": info["title"],
+                "artist": info["artist"],
+                "album": info["album"],
+                "duration_ms": row.get("Duration (ms)"),
+                "file": file,
+                "video_id": None,
+                "error": None if file else "No valid download",
+            }
         )
+    return entries
 
-        safe_title = re.sub(r"[^\w\s]", "", title)
-        variants = config.get("variants") or [""]
-        if "instrumental" in title.lower():
-            variants.insert(0, "instrumental")
-
-        best_file = None
-        for variant in variants:
-            parts = [safe_title]
-            if safe_artist and safe_artist.lower() != "unknown":
-                parts.append(safe_artist)
-            if variant:
-                parts.append(variant)
-            q = " ".join(parts)
-            print(f"Searching for → {q!r}")
 
-            if progress_callback:
-                progress_callback(i, total, f"Searching: {q}")
-
-            def yt_cmd(extra_args, search_spec):
-                cmd = [
-                    yt_dlp_exe,
-                    f"--ffmpeg-location={os.path.dirname(ffmpeg_exe)}",
-                    "--no-config",
-                ]
-                cmd += extra_args + [search_spec]
-                return cmd
-
-            if deep_search:
-                # Deep search logic
-                proc_q = subprocess.run(
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable manifest {path}: {e}")
+        return None
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("tracks"), list):
+        return None
+    return manifest
+
+
+def save_manifest(output_dir, playlist_name, entries):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {"playlist": playlist_name, "tracks": entries},
+            f,
+            indent=2,
+            ensure_ascii=False,
+        )
+    os.replace(tmp, path)
+
+
+def known_video_ids(output_dir):
+    """Video IDs recorded in an output folder's manifest, by track key."""
+    manifest = load_manifest(output_dir) or {"tracks": []}
+    return {
+        e["key"]: e["video_id"]
+        for e in manifest["tracks"]
+        if isinstance(e, dict) and e.get("key") and e.get("video_id")
+    }
+
+
+def forget_archived_ids(archive_file, video_ids):
+    """Drop video IDs from the yt-dlp archive so they can be fetched again."""
+    video_ids = {v for v in video_ids if v}
+    if not video_ids or not os.path.isfile(archive_file):
+        return
+    with open(archive_file, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    # Archive lines look like "youtube <id>"
+    kept = [ln for ln in lines if ln.strip().rpartition(" ")[2] not in video_ids]
+    if len(kept) != len(lines):
+        with open(archive_file, "w", encoding="utf-8") as f:
+            f.writelines(kept)
+
+
+def remove_partial_files(output_dir):
+    """Delete leftovers of interrupted downloads, remuxes and artwork swaps."""
+    for pattern in PARTIAL_FILE_PATTERNS:
+        for path in glob.glob(os.path.join(glob.escape(output_dir), pattern)):
+            try:
+                os.remove(path)
+                print(f"Removed partial file {os.path.basename(path)}")
+            except OSError as e:
+                print(f"Could not remove {path}: {e}")
+
+
+def not_found_entry(entry):
+    return {
+        "Track Name": entry["title"],
+        "Artist Name(s)": entry["artist"],
+        "Album Name": entry["album"],
+        "Track Number": entry["number"],
+        "Error": entry["error"],
+    }
+
+
+def write_not_found(output_dir, playlist_name, not_found_songs):
+    nf_path = os.path.join(output_dir, f"{playlist_name}_not_found.csv")
+    if not not_found_songs:
+        if os.path.isfile(nf_path):
+            os.remove(nf_path)
+        return
+    with open(nf_path, "w", newline="", encoding="utf-8") as cf:
+        writer = csv.DictWriter(cf, fieldnames=NOT_FOUND_FIELDS)
+        writer.writeheader()
+        writer.writerows(not_found_songs)
+
+
+def write_m3u(output_dir, playlist_name, filenames):
+    m3u_filename = playlist_name.replace("_", " ")
+    m3u_path = os.path.join(output_dir, f"{m3u_filename}.m3u")
+    with open(m3u_path, "w", encoding="utf-8") as m3u:
+        m3u.write("#EXTM3U\n")
+        for fn in filenames:
+            m3u.write(f"#EXTINF:-1,{os.path.splitext(fn)[0]}\n")
+            m3u.write(f"{fn}\n")
+
+
+def resolve_output_format(config, transcode_mp3=False):
+    output_format = "mp3" if transcode_mp3 else config.get("output_format") or "m4a"
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unknown output_format {output_format!r}, "
+            f"expected one of {', '.join(OUTPUT_FORMATS)}"
+        )
+    return output_format
+
+
+def make_job(
+    csv_path,
+    output_folder,
+    config,
+    deep_search=True,
+    transcode_mp3=False,
+    exclude_instrumentals=False,
+    embed_thumbnails=False,
+    progress_callback=None,
+    search_cache=None,
+    cancel_token=None,
+    event_callback=None,
+):
+    """Collect the per-run settings shared by every track of a playlist."""
+    playlist_name = os.path.splitext(os.path.basename(csv_path))[0]
+    output_dir = os.path.join(output_folder, playlist_name)
+    os.makedirs(output_dir, exist_ok=True)
+    ffmpeg_exe, yt_dlp_exe = find_executables(config)
+    output_format = resolve_output_format(config, transcode_mp3)
+    return {
+        "csv_path": csv_path,
+        "playlist_name": playlist_name,
+        "output_dir": output_dir,
+        "archive_file": os.path.join(output_dir, "downloaded.txt"),
+        "config": config,
+        "deep_search": deep_search,
+        "transcode_mp3": transcode_mp3,
+        "output_format": output_format,
+        "exclude_instrumentals": exclude_instrumentals,
+        "embed_thumbnails": embed_thumbnails,
+        "progress_callback": progress_callback,
+        "search_cache": search_cache,
+        "cancel_token": cancel_token or CancelToken(),
+        "event_callback": event_callback,
+        "ffmpeg_exe": ffmpeg_exe,
+        "yt_dlp_exe": yt_dlp_exe,
+        "downloader": find_downloader(config),
+        "connections": max(int(config.get("connections_per_track") or 1), 1),
+        "connection_budget": connection_budget(config),
+        "proxy": throttle.shared_proxy(config.get("bandwidth_limit")),
+        "query_stats": (
+            QueryStats.for_folder(output_folder)
+            if config_flag(config, "learn_query_order", True)
+            else None
+        ),
+        "channel_index": (
+            ChannelIndex.for_folder(output_folder)
+            if config_flag(config, "channel_affinity", True)
+            else None
+        ),
+        "negative_cache": (
+            NegativeCache.for_folder(
+                output_folder, float(config["negative_cache_days"]) * 86400
+            )
+            if float(config.get("negative_cache_days") or 0) > 0
+            else None
+        ),
+        # yt-dlp prints no ID for downloads it skips as already archived
+        "known_ids": known_video_ids(output_dir),
+        "eta": None,
+        "creationflags": (
+            subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
+        ),
+        "total": 0,
+    }
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024 or unit == "TB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def free_space(path):
+    """Free bytes on the disk holding ``path``, which need not exist yet."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+def present_tracks(output_dir):
+    """Numbers of manifest tracks whose files are still in ``output_dir``."""
+    manifest = load_manifest(output_dir) or {"tracks": []}
+    return {
+        e.get("number")
+        for e in manifest["tracks"]
+        if e.get("file") and os.path.isfile(os.path.join(output_dir, e["file"]))
+    }
+
+
+def estimate_tracks(
+    tracks, output_dir, config, output_format, deep_search=True, workers=1, present=()
+):
+    """
+    Estimate the cost of processing (track number, row) pairs into
+    ``output_dir``, downloading all but the ``present`` track numbers; see
+    plan_playlist.
+    """
+    seconds = {i: track_info(row, "")["spotify_sec"] for i, row in tracks}
+    known = [s for s in seconds.values() if s]
+    typical = sum(known) / len(known) if known else DEFAULT_TRACK_SECONDS
+    fetch = [i for i in seconds if i not in present]
+    audio_seconds = sum(seconds[i] or typical for i in fetch)
+
+    policy = OUTPUT_FORMATS[output_format]
+    source_kbps, output_kbps = policy["kbps"]
+    download_bytes = int(audio_seconds * source_kbps * 125)
+    output_bytes = int(audio_seconds * output_kbps * 125)
+    # Sources of tracks still downloading or waiting for ffmpeg sit next to
+    # the finished outputs
+    in_flight = min(
+        len(fetch),
+        workers + (transcode_workers(config) if policy["codec"] else 0),
+    )
+    margin = float(config.get("disk_margin_mb", 100)) * 1024**2
+    required = int(output_bytes + in_flight * typical * source_kbps * 125 + margin)
+    free = free_space(output_dir)
+
+    # yt-dlp calls per query shape: deep search lists the top result and
+    # usually accepts it; at worst it lists the candidates and probes each
+    shapes = len(config.get("variants") or [""])
+    candidates = int(config.get("search_candidates") or 3)
+    if deep_search:
+        if config_flag(config, "fallback_query_shapes", True):
+            shapes += len(FALLBACK_SHAPES)
+        per_track, per_shape = 2, 2 + candidates + 1
+    else:
+        per_track, per_shape = 1, 1
+    return {
+        "tracks": len(seconds),
+        "to_fetch": len(fetch),
+        "audio_seconds": int(audio_seconds),
+        "download_bytes": download_bytes,
+        "output_bytes": output_bytes,
+        "required_bytes": required,
+        "free_bytes": free,
+        "fits": free >= required,
+        "requests": per_track * len(seconds),
+        "max_requests": per_shape * shapes * len(seconds),
+    }
+
+
+def plan_playlist(
+    csv_path, output_folder, config, deep_search=True, transcode_mp3=False, workers=1
+):
+    """
+    Estimate what converting a playlist will cost, without starting it.
+
+    Sizes come from the CSV durations of tracks not already in the
+    manifest and the typical bitrates of the output format.
+
+    Returns:
+        dict: "tracks", "to_fetch", "audio_seconds", "download_bytes",
+            "output_bytes", "required_bytes" (peak disk use plus the
+            ``disk_margin_mb`` config margin), "free_bytes", "fits",
+            "requests" (expected yt-dlp calls) and "max_requests" (when
+            every query shape is tried in full)
+    """
+    playlist_name = os.path.splitext(os.path.basename(csv_path))[0]
+    output_dir = os.path.join(output_folder, playlist_name)
+    return estimate_tracks(
+        list(enumerate(read_rows(csv_path), start=1)),
+        output_dir,
+        config,
+        resolve_output_format(config, transcode_mp3),
+        deep_search=deep_search,
+        workers=workers,
+        present=present_tracks(output_dir),
+    )
+
+
+def preflight(job, tracks, executor=None, present=()):
+    """Print the run's cost estimate; raise InsufficientSpace if it won't fit."""
+    config = job["config"]
+    if not config_flag(config, "preflight", True):
+        return None
+    plan = estimate_tracks(
+        tracks,
+        job["output_dir"],
+        config,
+        job["output_format"],
+        deep_search=job["deep_search"],
+        workers=int(config.get("workers") or 1) if executor is not None else 1,
+        present=present,
+    )
+    print(
+        f"Plan: {plan['to_fetch']} of {plan['tracks']} tracks to fetch, "
+        f"~{format_size(plan['download_bytes'])} to download, "
+        f"~{format_size(plan['output_bytes'])} on disk, "
+        f"~{plan['requests']} requests (at most {plan['max_requests']})"
+    )
+    if not plan["fits"]:
+        raise InsufficientSpace(
+            f"Not enough disk space in {job['output_dir']}: the run needs about "
+            f"{format_size(plan['required_bytes'])}, "
+            f"{format_size(plan['free_bytes'])} is free"
+        )
+    return plan
+
+
+def emit(job, i, state, **fields):
+    """Report a per-track state change to the job's ETA model and event_callback."""
+    event = {"track": i, "state": state, **fields}
+    if job["eta"] is not None:
+        job["eta"].observe(event)
+    if job["event_callback"]:
+        job["event_callback"](event)
+
+
+def start_eta(job, tracks, executor=None, hosts=None):
+    """
+    Attach an EtaModel for the (track number, row) pairs about to run and
+    return it; its ``remaining()`` feeds the progress_callback ETA.
+
+    ``hosts`` is set for distributed runs: the number of worker machines,
+    each assumed to run ``workers`` tracks at a time like this one.
+    """
+    config = job["config"]
+    parallel = executor is not None or hosts
+    job["eta"] = EtaModel(
+        {i: track_info(row, "")["spotify_sec"] for i, row in tracks},
+        workers=(hosts or 1) * (int(config.get("workers") or 1) if parallel else 1),
+        post_workers=(hosts or 1) * transcode_workers(config),
+        transcoding=OUTPUT_FORMATS[job["output_format"]]["codec"] is not None,
+    )
+    return job["eta"]
+
+
+def format_eta(eta):
+    return str(timedelta(seconds=int(eta.remaining())))
+
+
+def process_track(job, i, row):
+    """
+    Search for and download a single CSV row as track number ``i``.
+
+    Returns:
+        dict: manifest entry; ``file`` is None and ``error`` is set on failure
+    """
+    config = job["config"]
+    output_dir = job["output_dir"]
+    creationflags = job["creationflags"]
+    progress_callback = job["progress_callback"]
+    total = job["total"]
+    duration_min = config.get("duration_min", 0)
+    duration_max = config.get("duration_max", float("inf"))
+    duration_tolerance = float(config.get("duration_tolerance") or 10)
+    candidates = int(config.get("search_candidates") or 3)
+
+    info_row = track_info(row, job["playlist_name"])
+    title = info_row["title"]
+    artist_primary = info_row["artist"]
+    safe_artist = info_row["safe_artist"]
+    safe_title = info_row["safe_title"]
+    album = info_row["album"]
+    spotify_sec = info_row["spotify_sec"]
+
+    entry = {
+        "key": info_row["key"],
+        "number": i,
+        "title": title,
+        "artist": artist_primary,
+        "album": album,
+        "duration_ms": row.get("Duration (ms)"),
+        "file": None,
+        "video_id": None,
+        "error": None,
+    }
+
+    def yt_cmd(extra_args, search_spec):
+        cmd = [
+            job["yt_dlp_exe"],
+            f"--ffmpeg-location={os.path.dirname(job['ffmpeg_exe'])}",
+            "--no-config",
+        ]
+        if config.get("cookies_path"):
+            cmd += ["--cookies", config["cookies_path"]]
+        cmd += extra_args + [search_spec]
+        return cmd
+
+    shapes = list(config.get("variants") or [""])
+    if job["deep_search"] and config_flag(config, "fallback_query_shapes", True):
+        shapes += [s for s in FALLBACK_SHAPES if s not in shapes]
+    query_stats = job["query_stats"]
+    if query_stats is not None:
+        shapes = query_stats.plan(artist_primary, shapes)
+    if "instrumental" in title.lower():
+        shapes = ["instrumental"] + [s for s in shapes if s != "instrumental"]
+
+    negative_cache = job["negative_cache"]
+    known_failure = (
+        negative_cache.get(entry["key"])
+        if negative_cache and not job.get("retry")
+        else None
+    )
+    known_failed = set(known_failure["tried"]) if known_failure else set()
+    mode = "deep" if job["deep_search"] else "flat"
+    channel_index = job["channel_index"]
+    known_channels = (
+        channel_index.channels(artist_primary)
+        if channel_index is not None and job["deep_search"]
+        else set()
+    )
+    attempted = []
+    # Network failures seen while searching or downloading this track
+    transient = []
+
+    def note(proc):
+        if proc.returncode != 0 and is_transient_error(proc.stderr):
+            last_line = proc.stderr.strip().splitlines()[-1]
+            transient.append(re.sub(r"^ERROR:\s*", "", last_line))
+        return proc
+
+    def record(success):
+        # A network failure says nothing about how good the query is
+        if not success and len(transient) > attempt_transient:
+            return
+        if query_stats is not None:
+            query_stats.record(artist_primary, shape, success)
+
+    for shape in shapes:
+        strategy = f"{mode}:{shape}"
+        if strategy in known_failed:
+            continue
+        attempted.append(strategy)
+        attempt_transient = len(transient)
+        # Fallback shapes change the query but not the file name or filters
+        variant = "" if shape.startswith("@") else shape
+        parts = [safe_title]
+        if shape != "@title" and safe_artist and safe_artist.lower() != "unknown":
+            parts.append(safe_artist)
+        if variant:
+            parts.append(variant)
+        elif shape == "@topic":
+            parts.append("topic")
+        q = " ".join(parts)
+        print(f"Searching for → {q!r}")
+
+        job["cancel_token"].check()
+        emit(job, i, "searching", title=title, query=q)
+        if progress_callback:
+            progress_callback(i, total, f"Searching: {q}")
+
+        search_cache = job["search_cache"]
+        cache_key = (q, spotify_sec, job["deep_search"])
+        download_spec = search_cache.get(cache_key) if search_cache else None
+        match_channel = None
+
+        if download_spec:
+            print(f"Using cached match for {q!r}")
+        elif job["deep_search"]:
+            # Deep search logic. With known channels for this artist, list
+            # all candidates up front: it is still one request, it is reused
+            # for the deep phase and a known channel may be further down.
+            listing = candidates if known_channels else 1
+            proc_q = note(
+                job["cancel_token"].run(
                     yt_cmd(
                         ["--flat-playlist", "--dump-single-json", "--no-playlist"],
-                        f"ytsearch1:{q}",
+                        f"ytsearch{listing}:{q}",
                     ),
                     capture_output=True,
                     text=True,
                     creationflags=creationflags,
                 )
-                try:
-                    data_q = json.loads(proc_q.stdout) or {}
-                except Exception:
-                    data_q = {}
-                if not isinstance(data_q, dict):
-                    data_q = {}
-                entries_q = (
-                    data_q.get("entries")
-                    if isinstance(data_q.get("entries"), list)
-                    else []
-                )
-                top = entries_q[0] if entries_q else {}
-
-                vid_title = top.get("title", "")
-                upl = (top.get("uploader") or "").lower()
-                duration = top.get("duration") or 0
-                passes = (
-                    safe_title.lower() in vid_title.lower()
-                    and (not safe_artist or safe_artist.lower() in upl)
-                    and (not spotify_sec or abs(duration - spotify_sec) <= 10)
+            )
+            try:
+                data_q = json.loads(proc_q.stdout) or {}
+            except Exception:
+                data_q = {}
+            if not isinstance(data_q, dict):
+                data_q = {}
+            entries_q = (
+                data_q.get("entries") if isinstance(data_q.get("entries"), list) else []
+            )
+            entries_q = [e for e in entries_q if isinstance(e, dict)]
+            top = entries_q[0] if entries_q else {}
+
+            def listing_passes(e, trusted):
+                duration = e.get("duration") or 0
+                return (
+                    safe_title.lower() in (e.get("title") or "").lower()
+                    and (
+                        trusted
+                        or not safe_artist
+                        or safe_artist.lower() in (e.get("uploader") or "").lower()
+                    )
+                    and (
+                        not spotify_sec
+                        or abs(duration - spotify_sec) <= duration_tolerance
+                    )
                     and (duration >= duration_min and duration <= duration_max)
                 )
-                if passes:
-                    download_spec = top.get(
-                        "webpage_url",
-                        f"https://www.youtube.com/watch?v={top.get('id','')}",
-                    )
+
+            pick = next(
+                (
+                    e
+                    for e in entries_q
+                    if channel_key(e) in known_channels and listing_passes(e, True)
+                ),
+                None,
+            )
+            if pick is None and listing_passes(top, False):
+                pick = top
+            if pick is not None:
+                download_spec = pick.get(
+                    "webpage_url",
+                    f"https://www.youtube.com/watch?v={pick.get('id','')}",
+                )
+                match_channel = channel_key(pick)
+            else:
+                # Phase 2: deep search
+                if listing > 1:
+                    entries_ids = entries_q
                 else:
-                    # Phase 2: deep search
-                    proc_ids = subprocess.run(
-                        yt_cmd(
-                            ["--flat-playlist", "--dump-single-json", "--no-playlist"],
-                            f"ytsearch3:{q}",
-                        ),
-                        capture_output=True,
-                        text=True,
-                        creationflags=creationflags,
+                    proc_ids = note(
+                        job["cancel_token"].run(
+                            yt_cmd(
+                                [
+                                    "--flat-playlist",
+                                    "--dump-single-json",
+                                    "--no-playlist",
+                                ],
+                                f"ytsearch{candidates}:{q}",
+                            ),
+                            capture_output=True,
+                            text=True,
+                            creationflags=creationflags,
+                        )
                     )
                     try:
                         tmp = json.loads(proc_ids.stdout) or {}
@@ -415,192 +1478,890 @@ def convert_playlist(
                         if isinstance(data_ids.get("entries"), list)
                         else []
                     )
-                    ids = [e for e in entries_ids if isinstance(e, dict)][:3]
-
-                    scored = []
-                    first_words = normalize(title).split()[:5]
-                    for entry in ids:
-                        vid = entry.get("id")
-                        url = f"https://www.youtube.com/watch?v={vid}"
-                        proc_i = subprocess.run(
+                ids = [e for e in entries_ids if isinstance(e, dict)][:candidates]
+                # Probe candidates from known channels first
+                ids.sort(key=lambda e: channel_key(e) not in known_channels)
+
+                scored = []
+                first_words = normalize(title).split()[:5]
+                for entry_id in ids:
+                    vid = entry_id.get("id")
+                    url = f"https://www.youtube.com/watch?v={vid}"
+                    proc_i = note(
+                        job["cancel_token"].run(
                             yt_cmd(["--dump-single-json", "--no-playlist"], url),
                             capture_output=True,
                             text=True,
                             creationflags=creationflags,
                         )
-                        if "Sign in to confirm your age" in (proc_i.stderr or ""):
-                            continue
-                        try:
-                            info = json.loads(proc_i.stdout) or {}
-                        except Exception:
-                            continue
-
-                        raw_title = info.get("title", "")
-                        low = raw_title.lower()
-                        up2 = (info.get("uploader") or "").lower()
-                        dur2 = info.get("duration") or 0
-
-                        if dur2 < duration_min or dur2 > duration_max:
-                            continue
-                        if "shorts/" in info.get("webpage_url", "") or "#shorts" in low:
-                            continue
-                        if safe_artist.lower() and safe_artist.lower() not in up2:
-                            continue
-                        if variant and variant.lower() not in low:
-                            continue
-                        if not contains_keywords_in_order(raw_title, first_words):
-                            continue
-
-                        score = 100 if low.startswith(safe_title.lower()) else 80
-                        if spotify_sec:
-                            score -= abs(dur2 - spotify_sec)
-                        scored.append((score, url))
-
-                    download_spec = (
-                        scored
-                        and max(scored, key=lambda x: x[0])[1]
-                        or f"ytsearch1:{q}"
                     )
+                    if "Sign in to confirm your age" in (proc_i.stderr or ""):
+                        continue
+                    try:
+                        info = json.loads(proc_i.stdout) or {}
+                    except Exception:
+                        continue
+
+                    raw_title = info.get("title", "")
+                    low = raw_title.lower()
+                    up2 = (info.get("uploader") or "").lower()
+                    dur2 = info.get("duration") or 0
+                    channel = channel_key(info) or channel_key(entry_id)
+                    trusted = channel in known_channels
+
+                    if dur2 < duration_min or dur2 > duration_max:
+                        continue
+                    if "shorts/" in info.get("webpage_url", "") or "#shorts" in low:
+                        continue
+                    if (
+                        not trusted
+                        and safe_artist.lower()
+                        and safe_artist.lower() not in up2
+                    ):
+                        continue
+                    if variant and variant.lower() not in low:
+                        continue
+                    if not contains_keywords_in_order(raw_title, first_words):
+                        continue
+
+                    score = 100 if low.startswith(safe_title.lower()) else 80
+                    if spotify_sec:
+                        score -= abs(dur2 - spotify_sec)
+                    scored.append((score, url, channel))
+                    if trusted:
+                        # A known channel's match beats probing the rest
+                        break
+
+                if scored:
+                    _, download_spec, match_channel = max(scored, key=lambda x: x[0])
+                else:
+                    download_spec = f"ytsearch1:{q}"
+        else:
+            download_spec = f"ytsearch1:{q}"
+
+        if search_cache is not None and download_spec.startswith("http"):
+            search_cache.put(cache_key, download_spec)
+
+        # Download
+        job["cancel_token"].check()
+        emit(job, i, "downloading", title=title, source=download_spec)
+        file_title = re.sub(r"[^\w\s]", "", title).strip()
+        base = f"{i:03d} - {file_title}" + (f" - {variant}" if variant else "")
+        tmpl = base + ".%(ext)s"
+        cmd_dl = yt_cmd(
+            [
+                "--download-archive",
+                job["archive_file"],
+                "-f",
+                OUTPUT_FORMATS[job["output_format"]]["select"],
+                "--output",
+                os.path.join(output_dir, tmpl),
+                "--no-playlist",
+                "--print",
+                "after_move:id",
+            ],
+            download_spec,
+        )
+
+        if job["embed_thumbnails"]:
+            # The thumbnail is embedded afterwards, normalized, by
+            # transcode_track or embed_artwork
+            cmd_dl += ["--write-thumbnail", "--convert-thumbnails", "jpg"]
+            cmd_dl += ["--add-metadata"]
+        if job["output_format"] == "m4a":
+            # yt-dlp leaves files that already are m4a alone
+            cmd_dl += ["--remux-video", "m4a"]
+        if job["exclude_instrumentals"]:
+            cmd_dl += ["--reject-title", "instrumental"]
+
+        budget = job["connection_budget"]
+        connections = job["connections"]
+        if budget is not None:
+            connections = budget.acquire(connections, job["cancel_token"])
+        try:
+            download_start = time.time()
+            ret = job["cancel_token"].run(
+                cmd_dl + download_args(job, connections),
+                capture_output=True,
+                text=True,
+                creationflags=creationflags,
+            )
+        finally:
+            if budget is not None:
+                budget.release(connections)
+        if note(ret).returncode != 0:
+            stderr = ret.stderr or ""
+            if "Sign in to confirm your age" in stderr:
+                entry["error"] = "Age-restricted video"
+                break
             else:
-                download_spec = f"ytsearch1:{q}"
-
-            # Download
-            file_title = re.sub(r"[^\w\s]", "", title).strip()
-            base = f"{i:03d} - {file_title}" + (f" - {variant}" if variant else "")
-            tmpl = base + ".%(ext)s"
-            cmd_dl = yt_cmd(
-                [
-                    "--download-archive",
-                    archive_file,
-                    "-f",
-                    "bestaudio[ext=m4a]/bestaudio",
-                    "--output",
-                    os.path.join(output_dir, tmpl),
-                    "--no-playlist",
-                ],
-                download_spec,
+                record(False)
+                continue
+
+        policy = OUTPUT_FORMATS[job["output_format"]]
+        target = os.path.join(output_dir, base + (policy["ext"] or ""))
+        if policy["ext"] and (os.path.isfile(target) or not policy["codec"]):
+            # Finished on an earlier run, or a format that is never transcoded
+            candidate_path = target
+        else:
+            # Still in the container it was downloaded in
+            raw = [
+                p
+                for p in glob.glob(glob.escape(os.path.join(output_dir, base)) + ".*")
+                if p.lower().endswith(RAW_AUDIO_EXTS)
+            ]
+            candidate_path = raw[0] if raw else ""
+        if os.path.isfile(candidate_path):
+            size = os.path.getsize(candidate_path)
+            emit(
+                job,
+                i,
+                "downloaded",
+                title=title,
+                size=size,
+                speed=size / max(time.time() - download_start, 0.001),
             )
-
-            if embed_thumbnails:
-                cmd_dl += ["--embed-thumbnail", "--add-metadata"]
-            if transcode_mp3:
-                cmd_dl += [
-                    "--extract-audio",
-                    "--audio-format",
-                    "mp3",
-                    "--audio-quality",
-                    "0",
-                ]
+            entry["file"] = os.path.basename(candidate_path)
+            if not needs_transcode(job, entry):
+                tag_audio(
+                    candidate_path,
+                    title,
+                    artist_primary,
+                    album,
+                    tracknumber=i,
+                )
+                thumb = os.path.join(output_dir, base + ".jpg")
+                if os.path.isfile(thumb):
+                    embed_artwork(candidate_path, thumb, config)
+                    os.remove(thumb)
+            printed = (ret.stdout or "").split()
+            if printed:
+                entry["video_id"] = printed[-1]
             else:
-                cmd_dl += ["--remux-video", "m4a"]
-            if exclude_instrumentals:
-                cmd_dl += ["--reject-title", "instrumental"]
+                # Skipped as already in the archive: keep the ID it is under
+                in_url = re.search(r"[?&]v=([\w-]+)", download_spec)
+                entry["video_id"] = (
+                    in_url.group(1) if in_url else job["known_ids"].get(entry["key"])
+                )
+            if negative_cache is not None:
+                negative_cache.clear(entry["key"])
+            if channel_index is not None and match_channel:
+                channel_index.record(artist_primary, match_channel)
+            record(True)
+            return entry
+        record(False)
+
+    if known_failure and not attempted:
+        print(f"Skipping {title!r}: no match with these settings on an earlier run")
+        entry["error"] = known_failure["error"]
+        return entry
+    if transient and not entry["error"]:
+        # Not a verdict on the track: leave it out of the negative cache
+        entry["error"] = f"Network error: {transient[-1]}"
+        return entry
+    entry["error"] = entry["error"] or "No valid download"
+    if negative_cache is not None:
+        negative_cache.record_failure(entry["key"], attempted, entry["error"])
+    return entry
+
+
+def needs_transcode(job, entry):
+    """Whether a downloaded track still has to go through transcode_track."""
+    target = OUTPUT_FORMATS[job["output_format"]]["ext"]
+    return bool(
+        OUTPUT_FORMATS[job["output_format"]]["codec"]
+        and entry["file"]
+        and not entry["file"].lower().endswith(target)
+    )
+
+
+def transcode_track(job, entry):
+    """
+    Convert a downloaded track to the job's output format and tag it; the CPU
+    stage of a run.
 
-            ret = subprocess.run(
-                cmd_dl, capture_output=True, text=True, creationflags=creationflags
-            )
-            if ret.returncode != 0:
-                stderr = ret.stderr or ""
-                if "Sign in to confirm your age" in stderr:
-                    not_found_songs.append(
-                        {
-                            "Track Name": title,
-                            "Artist Name(s)": artist_primary,
-                            "Album Name": album,
-                            "Track Number": i,
-                            "Error": "Age-restricted video",
-                        }
-                    )
-                    break
-                else:
-                    continue
-
-            out_ext = ".mp3" if transcode_mp3 else ".m4a"
-            candidate_path = os.path.join(output_dir, base + out_ext)
-            if os.path.isfile(candidate_path):
-                best_file = candidate_path
-                if out_ext == ".m4a":
-                    audio = MP4(best_file)
-                    tags = audio.tags or MP4Tags()
-                    tags["\xa9nam"] = [title]
-                    tags["\xa9ART"] = [artist_primary]
-                    tags["\xa9alb"] = [album]
-                    audio.save()
+    Opus sources going to .opus are only remuxed (stream copy); anything
+    else is encoded. On failure the downloaded file is kept as it is.
+    """
+    output_dir = job["output_dir"]
+    token = job["cancel_token"]
+    token.check()
+    policy = OUTPUT_FORMATS[job["output_format"]]
+    src = os.path.join(output_dir, entry["file"])
+    stem = os.path.splitext(entry["file"])[0]
+    name = stem + policy["ext"]
+    tmp = os.path.join(output_dir, f"temp_{name}")
+    thumb = os.path.join(output_dir, stem + ".jpg")
+    # The thumbnail is embedded afterwards as normalized tag bytes
+    cmd = [job["ffmpeg_exe"], "-y", "-loglevel", "error", "-i", src]
+    cmd += ["-map", "0:a:0"]
+    codecs = [policy["codec"]]
+    if policy["ext"] == ".opus" and src.lower().endswith((".webm", ".ogg", ".mka")):
+        codecs.insert(0, ["copy"])
+    emit(job, entry["number"], "transcoding", title=entry["title"])
+    for codec in codecs:
+        ret = token.run(
+            cmd + ["-c:a"] + codec + [tmp],
+            capture_output=True,
+            text=True,
+            creationflags=job["creationflags"],
+        )
+        if ret.returncode == 0 and os.path.isfile(tmp):
+            break
+    if ret.returncode != 0 or not os.path.isfile(tmp):
+        print(f"Transcode failed for {entry['file']}, keeping it: {ret.stderr}")
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        name = entry["file"]
+    else:
+        os.replace(tmp, os.path.join(output_dir, name))
+        os.remove(src)
+    tag_audio(
+        os.path.join(output_dir, name),
+        entry["title"],
+        entry["artist"],
+        entry["album"],
+        tracknumber=entry["number"],
+    )
+    if os.path.isfile(thumb):
+        embed_artwork(os.path.join(output_dir, name), thumb, job["config"])
+        os.remove(thumb)
+    entry["file"] = name
+    return entry
+
+
+def run_tracks(job, tracks, executor=None):
+    """
+    Process (track number, row) pairs, yielding manifest entries as they finish.
+
+    With an executor the tracks run concurrently and are yielded in completion
+    order; each entry carries its own ``number``. When transcoding, downloads
+    hand their files to ``transcode_pool`` and move on to the next track, so
+    network and CPU work overlap even without an executor.
+    """
+
+    def finished(entry):
+        emit(
+            job,
+            entry["number"],
+            "done" if entry["file"] else "not_found",
+            title=entry["title"],
+            file=entry["file"],
+            error=entry["error"],
+        )
+        return entry
+
+    pool = transcode_pool(job["config"])
+    downloads = set()
+    transcodes = set()
+    if executor is not None:
+        downloads = {executor.submit(process_track, job, i, row) for i, row in tracks}
+        tracks = ()
+    try:
+        for i, row in tracks:
+            entry = process_track(job, i, row)
+            if needs_transcode(job, entry):
+                transcodes.add(pool.submit(transcode_track, job, entry))
+            else:
+                yield finished(entry)
+            for future in [f for f in transcodes if f.done()]:
+                transcodes.discard(future)
+                yield finished(future.result())
+        while downloads or transcodes:
+            done, _ = wait(downloads | transcodes, return_when=FIRST_COMPLETED)
+            for future in done:
+                entry = future.result()
+                if future in downloads:
+                    downloads.discard(future)
+                    if needs_transcode(job, entry):
+                        transcodes.add(pool.submit(transcode_track, job, entry))
+                        continue
                 else:
-                    audio = EasyID3()
-                    try:
-                        audio.load(best_file)
-                    except:
-                        pass
-                    audio.update(
-                        {
-                            "artist": artist_primary,
-                            "title": title,
-                            "album": album,
-                            "tracknumber": str(i),
-                        }
-                    )
-                    audio.save()
-                downloaded.append(os.path.basename(best_file))
-                break
+                    transcodes.discard(future)
+                yield finished(entry)
+    finally:
+        for future in downloads | transcodes:
+            future.cancel()
+        wait(downloads | transcodes)
+
+
+def abort_playlist(job, entries):
+    """Leave a cancelled run resumable: record finished tracks, drop partials."""
+    save_manifest(job["output_dir"], job["playlist_name"], [e for e in entries if e])
+    for store in (job["negative_cache"], job["query_stats"], job["channel_index"]):
+        if store is not None:
+            store.save()
+    remove_partial_files(job["output_dir"])
+    print("Conversion cancelled")
+
+
+def finish_playlist(job, entries, generate_m3u=True, spotify_art=False):
+    """Write the manifest, not-found report, M3U and artwork for a playlist."""
+    output_dir = job["output_dir"]
+    playlist_name = job["playlist_name"]
+    save_manifest(output_dir, playlist_name, entries)
+    for store in (job["negative_cache"], job["query_stats"], job["channel_index"]):
+        if store is not None:
+            store.save()
+
+    not_found_songs = [not_found_entry(e) for e in entries if not e["file"]]
+    write_not_found(output_dir, playlist_name, not_found_songs)
+
+    if generate_m3u:
+        write_m3u(output_dir, playlist_name, [e["file"] for e in entries if e["file"]])
+
+    if spotify_art and not embed_playlist_art(job, entries):
+        # CSVs without cover links: covers saved next to the tracks by hand
+        rename_album_art(output_dir, not_found_songs)
+        embed_all_artwork(job["csv_path"], output_dir, not_found_songs, job["config"])
+
+    if config_flag(job["config"], "replaygain"):
+        apply_replaygain(job, entries)
+    if config_flag(job["config"], "fingerprint"):
+        fingerprint_folder(
+            output_dir, [e["file"] for e in entries if e["file"]], job["config"]
+        )
+    return not_found_songs
+
 
-        if not best_file:
-            not_found_songs.append(
-                {
-                    "Track Name": title,
-                    "Artist Name(s)": artist_primary,
-                    "Album Name": album,
-                    "Track Number": i,
-                    "Error": "No valid download",
-                }
+def apply_replaygain(job, entries):
+    """Tag the playlist's tracks with gain values, the playlist as the album."""
+    paths = [os.path.join(job["output_dir"], e["file"]) for e in entries if e["file"]]
+    if paths:
+        print(f"Measuring loudness of {len(paths)} tracks")
+        replaygain_files(paths, job["config"])
+
+
+def replaygain_files(paths, config):
+    """
+    Measure ``paths`` as one album and tag each with track and album gain.
+
+    Each file is decoded once, in a process pool sized by the
+    ``replaygain_workers`` config key (default: one per CPU).
+
+    Returns:
+        tuple: (files tagged, album loudness in LUFS or None)
+    """
+    # NumPy is only needed, and only imported, when the stage is used
+    import loudness
+
+    workers = config.get("replaygain_workers")
+    results, album, album_peak = loudness.analyze_album(
+        paths, find_executables(config)[0], int(workers) if workers else None
+    )
+    tagged = 0
+    for result in results:
+        if "error" in result:
+            print(f"Could not measure {result['path']}: {result['error']}")
+            continue
+        if result["loudness"] is None:
+            continue
+        try:
+            write_gain_tags(
+                result["path"],
+                loudness.replaygain_tags(
+                    result["path"],
+                    result["loudness"],
+                    result["peak"],
+                    album,
+                    album_peak,
+                ),
             )
+            tagged += 1
+        except Exception as e:
+            print(f"Error tagging {result['path']}: {e}")
+    if album is not None:
+        print(f"ReplayGain: tagged {tagged} tracks, album loudness {album:.1f} LUFS")
+    return tagged, album
 
-        elapsed = time.time() - start_time
-        eta = timedelta(seconds=int((elapsed / i) * (total - i)))
 
-        if progress_callback:
-            progress_callback(i, total, f"Downloaded {i}/{total}, ETA: {eta}")
-
-    # Save not found songs
-    if not_found_songs:
-        nf_path = os.path.join(output_dir, f"{playlist_name}_not_found.csv")
-        with open(nf_path, "w", newline="", encoding="utf-8") as cf:
-            writer = csv.DictWriter(
-                cf,
-                fieldnames=[
-                    "Track Name",
-                    "Artist Name(s)",
-                    "Album Name",
-                    "Track Number",
-                    "Error",
-                ],
+def fingerprint_folder(folder, names, config):
+    """
+    Acoustic fingerprints of the files ``names`` in ``folder``, from its
+    FingerprintStore, computing (in a process pool sized by the
+    ``fingerprint_workers`` config key) those missing or outdated.
+
+    Returns:
+        dict: file name -> (vector, sequence) as from fingerprint.compute
+    """
+    # NumPy is only needed, and only imported, when fingerprints are used
+    import fingerprint
+
+    store = FingerprintStore.for_folder(folder)
+    stats = {}
+    for name in names:
+        try:
+            stats[name] = os.stat(os.path.join(folder, name))
+        except OSError:
+            pass
+    missing = [name for name, st in stats.items() if store.get(name, st) is None]
+    if missing:
+        print(f"Fingerprinting {len(missing)} tracks in {folder}")
+        workers = config.get("fingerprint_workers")
+        results = fingerprint.fingerprint_files(
+            [os.path.join(folder, name) for name in missing],
+            find_executables(config)[0],
+            int(workers) if workers else None,
+        )
+        for name, result in zip(missing, results):
+            if "error" in result:
+                print(f"Could not fingerprint {result['path']}: {result['error']}")
+                continue
+            store.put(
+                name,
+                stats[name],
+                fingerprint.encode(result["vector"], result["sequence"]),
             )
-            writer.writeheader()
-            writer.writerows(not_found_songs)
+    store.prune(stats)
+    store.save()
+    prints = {}
+    for name, st in stats.items():
+        data = store.get(name, st)
+        if data is not None:
+            prints[name] = fingerprint.decode(data)
+    return prints
+
+
+def write_gain_tags(audio_file, tags):
+    """Write gain tags as ID3 TXXX frames, MP4 freeform atoms or Vorbis comments."""
+    from mutagen import File
+    from mutagen.id3 import ID3, TXXX, ID3NoHeaderError
+    from mutagen.mp4 import MP4, MP4FreeForm
 
-    # Generate M3U playlist
-    if generate_m3u:
-        m3u_filename = playlist_name.replace("_", " ")
-        m3u_path = os.path.join(output_dir, f"{m3u_filename}.m3u")
-        with open(m3u_path, "w", encoding="utf-8") as m3u:
-            m3u.write("#EXTM3U\n")
-            audio_files = sorted(
-                [
-                    f
-                    for f in os.listdir(output_dir)
-                    if f.lower().endswith((".mp3", ".m4a"))
-                ],
-                key=lambda x: os.path.getctime(os.path.join(output_dir, x)),
+    timestamps = get_file_timestamps(audio_file)
+    ext = os.path.splitext(audio_file)[1].lower()
+    if ext == ".webm":
+        return
+    if ext in OGG_AUDIO_EXTS:
+        audio = File(audio_file)
+        for key, value in tags.items():
+            audio[key.lower()] = [value]
+        audio.save()
+    elif ext in (".m4a", ".mp4"):
+        audio = MP4(audio_file)
+        if audio.tags is None:
+            audio.add_tags()
+        for key, value in tags.items():
+            atom = f"----:com.apple.iTunes:{key.lower()}"
+            audio.tags[atom] = [MP4FreeForm(value.encode("utf-8"))]
+        audio.save()
+    else:
+        try:
+            id3 = ID3(audio_file)
+        except ID3NoHeaderError:
+            id3 = ID3()
+        for key, value in tags.items():
+            id3.delall(f"TXXX:{key}")
+            id3.add(TXXX(encoding=3, desc=key, text=[value]))
+        id3.save(audio_file)
+    set_file_timestamps(audio_file, timestamps)
+
+
+def embed_playlist_art(job, entries):
+    """
+    Embed album covers from the CSV's image links into the found tracks.
+
+    Returns False, doing nothing, when the CSV has no image links.
+    """
+    rows = read_rows(job["csv_path"])
+    tracks = [
+        (e["number"], rows[e["number"] - 1])
+        for e in entries
+        if e["file"] and e["number"] <= len(rows)
+    ]
+    if not any(artwork.cover_url(row) for _, row in tracks):
+        return False
+    covers = artwork.shared_fetcher(job["config"]).fetch_rows(tracks)
+    print(f"Embedding album art: {len(set(covers.values()))} covers")
+    for e in entries:
+        if e["file"] and e["number"] in covers:
+            embed_artwork(
+                os.path.join(job["output_dir"], e["file"]),
+                covers[e["number"]],
+                job["config"],
             )
-            for fn in audio_files:
-                m3u.write(f"#EXTINF:-1,{os.path.splitext(fn)[0]}\n")
-                m3u.write(f"{fn}\n")
+    return True
 
-    # Handle Spotify artwork
-    if spotify_art:
-        rename_album_art(output_dir, not_found_songs)
-        embed_all_artwork(csv_path, output_dir, not_found_songs)
+
+def convert_playlist(
+    csv_path,
+    output_folder,
+    config,
+    deep_search=True,
+    transcode_mp3=False,
+    generate_m3u=True,
+    exclude_instrumentals=False,
+    embed_thumbnails=False,
+    spotify_art=False,
+    progress_callback=None,
+    search_cache=None,
+    executor=None,
+    cancel_token=None,
+    event_callback=None,
+):
+    """
+    Core conversion function
+
+    Args:
+        csv_path: Path to CSV file with playlist
+        output_folder: Folder to save downloaded files
+        config: Configuration dictionary
+        deep_search: Enable deep search mode
+        transcode_mp3: Convert to MP3 format
+        generate_m3u: Generate M3U playlist file
+        exclude_instrumentals: Filter out instrumental versions
+        embed_thumbnails: Embed video thumbnails as artwork
+        spotify_art: Use Spotify album art
+        progress_callback: Optional callback function(current, total, status_text)
+        search_cache: Optional SearchCache shared between runs
+        executor: Optional concurrent.futures executor to process tracks in
+            parallel; runs sequentially when omitted
+        cancel_token: Optional CancelToken; cancelling it raises Cancelled
+        event_callback: Optional callback function(event) receiving per-track
+            dicts with "track", "state" and details
+
+    Returns:
+        tuple: (downloaded_files, not_found_songs)
+    """
+    start_time = time.time()
+    job = make_job(
+        csv_path,
+        output_folder,
+        config,
+        deep_search=deep_search,
+        transcode_mp3=transcode_mp3,
+        exclude_instrumentals=exclude_instrumentals,
+        embed_thumbnails=embed_thumbnails,
+        progress_callback=progress_callback,
+        search_cache=search_cache,
+        cancel_token=cancel_token,
+        event_callback=event_callback,
+    )
+
+    rows = read_rows(csv_path)
+    total = job["total"] = len(rows)
+    entries = [None] * total
+
+    tracks = list(enumerate(rows, start=1))
+    preflight(job, tracks, executor, present=present_tracks(job["output_dir"]))
+    eta = start_eta(job, tracks, executor)
+    try:
+        for n, entry in enumerate(run_tracks(job, tracks, executor), start=1):
+            entries[entry["number"] - 1] = entry
+
+            if progress_callback:
+                progress_callback(
+                    n, total, f"Downloaded {n}/{total}, ETA: {format_eta(eta)}"
+                )
+    except Cancelled:
+        abort_playlist(job, entries)
+        raise
+
+    not_found_songs = finish_playlist(
+        job, entries, generate_m3u=generate_m3u, spotify_art=spotify_art
+    )
 
     print(f"✅ Completed in {timedelta(seconds=int(time.time()-start_time))}")
 
+    downloaded = [e["file"] for e in entries if e["file"]]
+    return downloaded, not_found_songs
+
+
+def sync_playlist(
+    csv_path,
+    output_folder,
+    config,
+    removed_action="archive",
+    deep_search=True,
+    transcode_mp3=False,
+    generate_m3u=True,
+    exclude_instrumentals=False,
+    embed_thumbnails=False,
+    spotify_art=False,
+    progress_callback=None,
+    search_cache=None,
+    executor=None,
+    cancel_token=None,
+    event_callback=None,
+):
+    """
+    Bring an existing playlist folder in line with a new CSV export.
+
+    Rows are matched to the previous run's manifest by track URI. Only added
+    tracks are searched and downloaded; kept tracks are renamed and retagged
+    in place when their position changed. Falls back to a full
+    ``convert_playlist`` when the folder has no manifest yet.
+
+    Args:
+        removed_action: What to do with files of tracks dropped from the
+            playlist: "archive" (move to ``removed/``), "delete" or "keep"
+        Other arguments are as for ``convert_playlist``.
+
+    Returns:
+        tuple: (downloaded_files, not_found_songs)
+    """
+    start_time = time.time()
+    job = make_job(
+        csv_path,
+        output_folder,
+        config,
+        deep_search=deep_search,
+        transcode_mp3=transcode_mp3,
+        exclude_instrumentals=exclude_instrumentals,
+        embed_thumbnails=embed_thumbnails,
+        progress_callback=progress_callback,
+        search_cache=search_cache,
+        cancel_token=cancel_token,
+        event_callback=event_callback,
+    )
+    output_dir = job["output_dir"]
+    manifest = load_manifest(output_dir)
+    if manifest is None:
+        print("No manifest found, running a full conversion")
+        return convert_playlist(
+            csv_path,
+            output_folder,
+            config,
+            deep_search=deep_search,
+            transcode_mp3=transcode_mp3,
+            generate_m3u=generate_m3u,
+            exclude_instrumentals=exclude_instrumentals,
+            embed_thumbnails=embed_thumbnails,
+            spotify_art=spotify_art,
+            progress_callback=progress_callback,
+            search_cache=search_cache,
+            executor=executor,
+            cancel_token=cancel_token,
+            event_callback=event_callback,
+        )
+
+    rows = read_rows(csv_path)
+    total = job["total"] = len(rows)
+    previous = {e["key"]: e for e in manifest["tracks"]}
+    new_keys = {track_key(row) for row in rows}
+
+    # Dropped tracks
+    removed = [e for k, e in previous.items() if k not in new_keys]
+    for e in removed:
+        if not e.get("file"):
+            continue
+        path = os.path.join(output_dir, e["file"])
+        if not os.path.isfile(path):
+            continue
+        if removed_action == "delete":
+            os.remove(path)
+        elif removed_action == "archive":
+            removed_dir = os.path.join(output_dir, REMOVED_DIR)
+            os.makedirs(removed_dir, exist_ok=True)
+            os.replace(path, os.path.join(removed_dir, e["file"]))
+    forget_archived_ids(job["archive_file"], [e.get("video_id") for e in removed])
+
+    # Kept tracks: move out of the way first so renumbering never collides
+    entries = [None] * total
+    pending = []
+    renames = []
+    claimed = set()
+    # Kept tracks whose file was deleted; the archive would skip them
+    lost_ids = []
+    for i, row in enumerate(rows, start=1):
+        key = track_key(row)
+        old = previous.get(key)
+        if old is None or key in claimed:
+            pending.append((i, row))
+            continue
+        if old.get("file") and not os.path.isfile(
+            os.path.join(output_dir, old["file"])
+        ):
+            lost_ids.append(old.get("video_id"))
+            pending.append((i, row))
+            continue
+        claimed.add(key)
+        entry = dict(old, number=i)
+        if entry.get("file") and old["number"] != i:
+            new_name = renumber_filename(old["file"], i)
+            renames.append((old["file"], new_name, entry))
+            entry["file"] = new_name
+        entries[i - 1] = entry
+
+    # Before touching files, so a run that cannot fit leaves the folder as is
+    preflight(job, pending, executor)
+    forget_archived_ids(job["archive_file"], lost_ids)
+    for old_name, new_name, entry in renames:
+        os.replace(
+            os.path.join(output_dir, old_name),
+            os.path.join(output_dir, f".sync_{old_name}"),
+        )
+    for entry in entries:
+        if entry is not None:
+            emit(
+                job,
+                entry["number"],
+                "kept",
+                title=entry["title"],
+                file=entry.get("file"),
+            )
+
+    for old_name, new_name, entry in renames:
+        tmp_name = f".sync_{old_name}"
+        new_path = os.path.join(output_dir, new_name)
+        os.replace(os.path.join(output_dir, tmp_name), new_path)
+        try:
+            tag_audio(
+                new_path,
+                entry["title"],
+                entry["artist"],
+                entry["album"],
+                tracknumber=entry["number"],
+            )
+        except Exception as e:
+            print(f"Error retagging {new_name}: {e}")
+
+    print(
+        f"Sync: {len(pending)} to fetch, {len(removed)} removed, "
+        f"{len(renames)} renumbered"
+    )
+
+    # Added tracks
+    downloaded = []
+    eta = start_eta(job, pending, executor)
+    try:
+        for n, entry in enumerate(run_tracks(job, pending, executor), start=1):
+            entries[entry["number"] - 1] = entry
+            if entry["file"]:
+                downloaded.append(entry["file"])
+
+            if progress_callback:
+                progress_callback(
+                    n,
+                    len(pending),
+                    f"Synced {n}/{len(pending)}, ETA: {format_eta(eta)}",
+                )
+    except Cancelled:
+        abort_playlist(job, entries)
+        raise
+
+    not_found_songs = finish_playlist(
+        job, entries, generate_m3u=generate_m3u, spotify_art=spotify_art
+    )
+
+    print(f"✅ Synced in {timedelta(seconds=int(time.time()-start_time))}")
+
+    return downloaded, not_found_songs
+
+
+def retry_failures(
+    csv_path,
+    output_folder,
+    config,
+    not_found_csv=None,
+    generate_m3u=True,
+    exclude_instrumentals=False,
+    embed_thumbnails=False,
+    transcode_mp3=False,
+    progress_callback=None,
+    search_cache=None,
+    executor=None,
+    cancel_token=None,
+    event_callback=None,
+):
+    """
+    Reprocess only the tracks that failed in an earlier run of a playlist.
+
+    The failed track numbers come from ``not_found_csv`` when given, else from
+    the folder's manifest, else from its ``<playlist>_not_found.csv``. They
+    are searched again with deep search and a wider net: more candidates
+    (``retry_search_candidates``), a looser duration match
+    (``retry_duration_tolerance`` seconds) and the ``retry_variants`` on top
+    of the configured variants, ignoring the negative cache. Results keep
+    their CSV numbering and are merged into the manifest, not-found report
+    and M3U. Runs in parallel on ``executor``, or on a pool of ``workers``
+    threads when none is given.
+
+    Returns:
+        tuple: (downloaded_files, not_found_songs)
+    """
+    start_time = time.time()
+    variants = list(config.get("variants") or [""])
+    for v in config.get("retry_variants") or RETRY_VARIANTS:
+        if v not in variants:
+            variants.append(v)
+    wide = dict(
+        config,
+        variants=variants,
+        search_candidates=int(config.get("retry_search_candidates") or 10),
+        duration_tolerance=float(config.get("retry_duration_tolerance") or 30),
+    )
+    job = make_job(
+        csv_path,
+        output_folder,
+        wide,
+        deep_search=True,
+        transcode_mp3=transcode_mp3,
+        exclude_instrumentals=exclude_instrumentals,
+        embed_thumbnails=embed_thumbnails,
+        progress_callback=progress_callback,
+        search_cache=search_cache,
+        cancel_token=cancel_token,
+        event_callback=event_callback,
+    )
+    job["retry"] = True
+    output_dir = job["output_dir"]
+    playlist_name = job["playlist_name"]
+    rows = read_rows(csv_path)
+    total = job["total"] = len(rows)
+
+    manifest = load_manifest(output_dir)
+    entries = [None] * total
+    if manifest is not None:
+        for e in manifest["tracks"]:
+            if 1 <= e["number"] <= total:
+                entries[e["number"] - 1] = e
+    else:
+        entries = recover_entries(rows, output_dir, playlist_name)
+
+    report = not_found_csv
+    if report is None and manifest is None:
+        report = os.path.join(output_dir, f"{playlist_name}_not_found.csv")
+    if report is not None:
+        with open(report, "r", encoding="utf-8") as f:
+            numbers = {int(r["Track Number"]) for r in csv.DictReader(f)}
+    else:
+        numbers = {e["number"] for e in entries if e and not e.get("file")}
+    numbers |= {i for i, e in enumerate(entries, start=1) if e is None}
+    pending = [(i, rows[i - 1]) for i in sorted(numbers) if 1 <= i <= total]
+    for e in entries:
+        if e and e["number"] not in numbers:
+            emit(job, e["number"], "kept", title=e["title"], file=e.get("file"))
+    print(f"Retrying {len(pending)} of {total} tracks")
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=int(config.get("workers") or 1))
+    downloaded = []
+    eta = start_eta(job, pending, executor)
+    try:
+        for n, entry in enumerate(run_tracks(job, pending, executor), start=1):
+            entries[entry["number"] - 1] = entry
+            if entry["file"]:
+                downloaded.append(entry["file"])
+            if progress_callback:
+                progress_callback(
+                    n,
+                    len(pending),
+                    f"Retried {n}/{len(pending)}, {len(downloaded)} found, "
+                    f"ETA: {format_eta(eta)}",
+                )
+    except Cancelled:
+        abort_playlist(job, entries)
+        raise
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    not_found_songs = finish_playlist(job, entries, generate_m3u=generate_m3u)
+
+    print(
+        f"✅ Retried in {timedelta(seconds=int(time.time()-start_time))}: "
+        f"{len(downloaded)} of {len(pending)} found"
+    )
     return downloaded, not_found_songs
@@ -0,0 +1,512 @@
+import argparse
+import hmac
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import core
+
+DEFAULT_PORT = 9100
+CHUNK_SIZE = 1 << 16
+# Track states the coordinator reports itself, once the file has arrived
+FINAL_STATES = ("done", "not_found", "kept")
+TOKEN_ENV = "SPOTDOWN_WORKER_TOKEN"
+# Settings that only make sense on the machine that wrote them
+LOCAL_CONFIG_KEYS = (
+    "ffmpeg_path",
+    "yt_dlp_path",
+    "cookies_path",
+    "external_downloader",
+)
+
+
+def send_message(wfile, header, path=None):
+    """
+    Write one framed message: a 4-byte length, a JSON header, then the
+    contents of ``path`` (announced as ``header["size"]``) if given.
+    """
+    if path:
+        header = dict(header, size=os.path.getsize(path))
+    data = json.dumps(header).encode("utf-8")
+    wfile.write(struct.pack(">I", len(data)) + data)
+    if path:
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, wfile, CHUNK_SIZE)
+    wfile.flush()
+
+
+def read_exact(rfile, size):
+    data = rfile.read(size)
+    if len(data) != size:
+        raise ConnectionError("connection closed mid-message")
+    return data
+
+
+def receive_header(rfile):
+    (length,) = struct.unpack(">I", read_exact(rfile, 4))
+    return json.loads(read_exact(rfile, length).decode("utf-8"))
+
+
+def receive_file(rfile, size, path):
+    """Stream ``size`` payload bytes to ``path`` without holding them in memory."""
+    tmp = path + ".part"
+    with open(tmp, "wb") as f:
+        remaining = size
+        while remaining:
+            chunk = rfile.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise ConnectionError("connection closed mid-file")
+            f.write(chunk)
+            remaining -= len(chunk)
+    os.replace(tmp, path)
+
+
+def safe_file_name(name):
+    """
+    ``name`` if it is a plain file name; a worker must not be able to write
+    outside the output folder.
+    """
+    base = os.path.basename(name)
+    if base != name or base in ("", ".", "..") or os.path.isabs(name):
+        raise ValueError(f"unsafe file name from worker: {name!r}")
+    return base
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    """
+    Serves shards for one coordinator connection.
+
+    Each shard runs the search and download stages of ``convert_playlist`` in
+    a scratch folder; every finished track is sent back as its manifest entry
+    followed by the audio file, which is then deleted locally.
+    """
+
+    def handle(self):
+        expected = self.server.token
+        scratch = tempfile.mkdtemp(prefix="spotdown_worker_")
+        try:
+            while True:
+                try:
+                    shard = receive_header(self.rfile)
+                except (ConnectionError, struct.error):
+                    return
+                if shard.get("type") != "shard":
+                    continue
+                if expected and not hmac.compare_digest(
+                    str(shard.get("token") or ""), expected
+                ):
+                    print(f"Rejected shard from {self.client_address[0]}: bad token")
+                    return
+                if not self.run_shard(shard, scratch):
+                    return
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def run_shard(self, shard, scratch):
+        options = shard["options"]
+        send_lock = threading.Lock()
+        token = core.CancelToken()
+
+        def send(header, path=None):
+            with send_lock:
+                send_message(self.wfile, header, path)
+
+        def forward(event):
+            # Search and download progress, for the coordinator's ETA and UI
+            if event["state"] in FINAL_STATES:
+                return
+            try:
+                send({"type": "event", "event": event})
+            except OSError:
+                token.cancel()
+
+        # The coordinator must not choose which binaries or files this host uses
+        remote = {
+            k: v for k, v in shard["config"].items() if k not in LOCAL_CONFIG_KEYS
+        }
+        config = dict(core.load_config(), **remote)
+        job = core.make_job(
+            shard["playlist"] + ".csv",
+            scratch,
+            config,
+            deep_search=options.get("deep_search", True),
+            transcode_mp3=options.get("transcode_mp3", False),
+            exclude_instrumentals=options.get("exclude_instrumentals", False),
+            embed_thumbnails=options.get("embed_thumbnails", False),
+            search_cache=self.server.search_cache,
+            cancel_token=token,
+            event_callback=forward,
+        )
+        job["total"] = shard["total"]
+        tracks = [(i, row) for i, row in shard["tracks"]]
+        results = core.run_tracks(job, tracks, self.server.executor)
+        try:
+            for entry in results:
+                path = os.path.join(job["output_dir"], entry["file"] or "")
+                if entry["file"] and os.path.isfile(path):
+                    send({"type": "track", "entry": entry}, path)
+                    os.remove(path)
+                else:
+                    send({"type": "track", "entry": dict(entry, file=None)})
+            send({"type": "shard_done"})
+            return True
+        except OSError:
+            print("Coordinator went away, cancelling shard")
+            token.cancel()
+            return False
+        except core.Cancelled:
+            return False
+        finally:
+            results.close()
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, threads=None, token=None):
+        super().__init__(address, WorkerHandler)
+        self.token = token
+        config = core.load_config()
+        self.search_cache = core.SearchCache()
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads or int(config.get("workers") or 1)
+        )
+
+
+def serve_worker(
+    host="127.0.0.1", port=DEFAULT_PORT, threads=None, ready=None, token=None
+):
+    """
+    Serve shards until interrupted. Bind ``host`` to a reachable address to
+    take work from other machines; with ``token`` set, shards that do not
+    carry the same token are refused.
+    """
+    server = WorkerServer((host, port), threads=threads, token=token)
+    address = server.server_address
+    print(f"Worker listening on {address[0]}:{address[1]}")
+    if ready is not None:
+        ready.put(address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.executor.shutdown(wait=False)
+
+
+def start_local_workers(count, threads=None, token=None):
+    """
+    Start ``count`` worker processes on localhost.
+
+    Returns:
+        tuple: (processes, [(host, port), ...])
+    """
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Queue()
+    procs = []
+    for _ in range(count):
+        proc = ctx.Process(
+            target=serve_worker,
+            args=("127.0.0.1", 0, threads, ready, token),
+            daemon=True,
+        )
+        proc.start()
+        procs.append(proc)
+    addresses = [("127.0.0.1", ready.get(timeout=30)) for _ in procs]
+    return procs, addresses
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return (host or "127.0.0.1", int(port or DEFAULT_PORT))
+
+
+def distribute_playlist(
+    csv_path,
+    output_folder,
+    config,
+    workers,
+    shard_size=25,
+    deep_search=True,
+    transcode_mp3=False,
+    generate_m3u=True,
+    exclude_instrumentals=False,
+    embed_thumbnails=False,
+    spotify_art=False,
+    progress_callback=None,
+    cancel_token=None,
+    event_callback=None,
+    worker_token=None,
+):
+    """
+    Convert a playlist by sharding its tracks across worker hosts.
+
+    Workers pull shards of ``shard_size`` rows from a shared queue, so fast
+    hosts take more of the playlist. Tracks keep their CSV numbering; the
+    coordinator writes the received files, the manifest, the download
+    archive, the not-found report, the M3U and the artwork. Shards of a
+    worker that disconnects are put back for the remaining workers.
+
+    Args:
+        workers: List of (host, port) worker addresses
+        worker_token: Shared secret the workers were started with, if any
+        Other arguments are as for ``core.convert_playlist``.
+
+    Returns:
+        tuple: (downloaded_files, not_found_songs)
+    """
+    start_time = time.time()
+    job = core.make_job(
+        csv_path,
+        output_folder,
+        config,
+        transcode_mp3=transcode_mp3,
+        progress_callback=progress_callback,
+        cancel_token=cancel_token,
+        event_callback=event_callback,
+    )
+    token = job["cancel_token"]
+    output_dir = job["output_dir"]
+    rows = core.read_rows(csv_path)
+    total = job["total"] = len(rows)
+    entries = [None] * total
+
+    tracks = list(enumerate(rows, start=1))
+    eta = core.start_eta(job, tracks, hosts=len(workers))
+    shards = deque(
+        tracks[start : start + shard_size] for start in range(0, total, shard_size)
+    )
+    # Shards being worked on; a worker failing requeues the rest of its shard,
+    # so drivers only stop once the queue is empty and nothing is in flight
+    in_flight = [0]
+    shards_changed = threading.Condition()
+
+    shard_message = {
+        "type": "shard",
+        "playlist": job["playlist_name"],
+        "total": total,
+        "token": worker_token,
+        "config": {k: v for k, v in config.items() if k not in LOCAL_CONFIG_KEYS},
+        "options": {
+            "deep_search": deep_search,
+            "transcode_mp3": transcode_mp3,
+            "exclude_instrumentals": exclude_instrumentals,
+            "embed_thumbnails": embed_thumbnails,
+        },
+    }
+    lock = threading.Lock()
+    done = [0]
+    sockets = []
+
+    def record(entry):
+        with lock:
+            entries[entry["number"] - 1] = entry
+            done[0] += 1
+            n = done[0]
+        core.emit(
+            job,
+            entry["number"],
+            "done" if entry["file"] else "not_found",
+            title=entry["title"],
+            file=entry["file"],
+            error=entry["error"],
+        )
+        if progress_callback:
+            progress_callback(
+                n, total, f"Downloaded {n}/{total}, ETA: {core.format_eta(eta)}"
+            )
+
+    def next_shard():
+        with shards_changed:
+            while not token.cancelled:
+                if shards:
+                    in_flight[0] += 1
+                    return shards.popleft()
+                if not in_flight[0]:
+                    return None
+                shards_changed.wait(timeout=0.5)
+            return None
+
+    def end_shard(requeue=None):
+        with shards_changed:
+            if requeue:
+                shards.append(requeue)
+            in_flight[0] -= 1
+            shards_changed.notify_all()
+
+    def drive(address):
+        try:
+            sock = socket.create_connection(address, timeout=30)
+        except OSError as e:
+            print(f"Could not reach worker {address[0]}:{address[1]}: {e}")
+            return
+        sock.settimeout(None)
+        sockets.append(sock)
+        rfile = sock.makefile("rb")
+        wfile = sock.makefile("wb")
+        try:
+            while True:
+                shard = next_shard()
+                if shard is None:
+                    return
+                pending = {i: (i, row) for i, row in shard}
+                try:
+                    send_message(wfile, dict(shard_message, tracks=shard))
+                    while True:
+                        header = receive_header(rfile)
+                        if header["type"] == "shard_done":
+                            break
+                        if header["type"] == "event":
+                            event = dict(header["event"])
+                            core.emit(
+                                job, event.pop("track"), event.pop("state"), **event
+                            )
+                            continue
+                        entry = header["entry"]
+                        if entry["number"] not in pending:
+                            raise ValueError(f"unexpected track {entry['number']!r}")
+                        if entry["file"]:
+                            entry["file"] = safe_file_name(entry["file"])
+                        if header.get("size") is not None:
+                            if not entry["file"]:
+                                raise ValueError("file data for a track without a file")
+                            receive_file(
+                                rfile,
+                                header["size"],
+                                os.path.join(output_dir, entry["file"]),
+                            )
+                        pending.pop(entry["number"])
+                        record(entry)
+                # KeyError and TypeError mean a malformed message
+                except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+                    if pending and not token.cancelled:
+                        print(f"Worker {address[0]}:{address[1]} failed: {e!r}")
+                    return
+                finally:
+                    # However the shard ended, other workers take what is left
+                    end_shard(None if token.cancelled else list(pending.values()))
+        finally:
+            sock.close()
+
+    threads = [threading.Thread(target=drive, args=(a,), daemon=True) for a in workers]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        if token.cancelled:
+            for sock in list(sockets):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        for t in threads:
+            t.join(timeout=0.5)
+
+    if token.cancelled:
+        core.abort_playlist(job, entries)
+        raise core.Cancelled()
+    if shards:
+        core.abort_playlist(job, entries)
+        raise RuntimeError("All workers disconnected before the playlist finished")
+
+    video_ids = [e["video_id"] for e in entries if e["video_id"]]
+    if video_ids:
+        with open(job["archive_file"], "a", encoding="utf-8") as f:
+            f.writelines(f"youtube {v}\n" for v in video_ids)
+
+    not_found_songs = core.finish_playlist(
+        job, entries, generate_m3u=generate_m3u, spotify_art=spotify_art
+    )
+
+    print(f"✅ Completed in {timedelta(seconds=int(time.time()-start_time))}")
+
+    downloaded = [e["file"] for e in entries if e["file"]]
+    return downloaded, not_found_songs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Spread a playlist conversion across worker processes or hosts"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    worker = sub.add_parser("worker", help="Run a worker that serves shards")
+    worker.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on; 0.0.0.0 to serve other machines",
+    )
+    worker.add_argument("--port", type=int, default=DEFAULT_PORT)
+    worker.add_argument(
+        "--threads", type=int, help="Parallel tracks (default: config 'workers')"
+    )
+    worker.add_argument(
+        "--token",
+        default=os.environ.get(TOKEN_ENV),
+        help=f"Only accept shards carrying this secret (default: ${TOKEN_ENV})",
+    )
+
+    coord = sub.add_parser("coordinate", help="Convert a CSV using workers")
+    coord.add_argument("csv_path")
+    coord.add_argument("output_folder")
+    coord.add_argument(
+        "--worker",
+        action="append",
+        default=[],
+        metavar="HOST:PORT",
+        help="Worker address (repeatable)",
+    )
+    coord.add_argument(
+        "--local", type=int, default=0, help="Also start N workers on localhost"
+    )
+    coord.add_argument("--shard-size", type=int, default=25)
+    coord.add_argument(
+        "--token",
+        default=os.environ.get(TOKEN_ENV),
+        help=f"Secret the workers were started with (default: ${TOKEN_ENV})",
+    )
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        serve_worker(args.host, args.port, threads=args.threads, token=args.token)
+        return
+
+    config = core.load_config()
+    workers = [parse_address(w) for w in args.worker]
+    procs = []
+    if args.local:
+        procs, local = start_local_workers(args.local, token=args.token)
+        workers += local
+    if not workers:
+        parser.error("give at least one --worker or --local N")
+    try:
+        distribute_playlist(
+            args.csv_path,
+            args.output_folder,
+            config,
+            workers,
+            shard_size=args.shard_size,
+            deep_search=core.config_flag(config, "deep_search", True),
+            transcode_mp3=core.config_flag(config, "transcode_mp3"),
+            generate_m3u=core.config_flag(config, "generate_m3u", True),
+            exclude_instrumentals=core.config_flag(config, "exclude_instrumentals"),
+            worker_token=args.token,
+        )
+    finally:
+        for proc in procs:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import threading
+import time
+
+# Used until a run has measured its own: a search, a 128 kbit/s stream
+# over a 1 MB/s connection, and post-processing per second of audio
+PRIORS = {
+    "search": 3.0,
+    "bytes_per_sec": 1024.0**2,
+    "bytes_per_audio_sec": 16000.0,
+    "post": 0.02,
+}
+DEFAULT_DURATION = 210.0
+
+
+class EtaModel:
+    """
+    Remaining-time estimate for a run, fed the same per-track events as
+    the track table.
+
+    Each stage keeps a moving average: seconds spent searching a track
+    (deep search probes and failed download attempts included), download
+    speed, bytes per second of audio, and post-processing (tagging or
+    transcoding) per second of audio. The work left is priced from each
+    unfinished track's CSV duration and the share of tracks found so far,
+    then spread over the download workers and, when transcoding, the
+    transcode workers running alongside them.
+    """
+
+    def __init__(
+        self, durations, workers=1, post_workers=1, transcoding=False, alpha=0.2
+    ):
+        known = [d for d in durations.values() if d]
+        fallback = sum(known) / len(known) if known else DEFAULT_DURATION
+        self.durations = {n: d or fallback for n, d in durations.items()}
+        self.mean_duration = fallback
+        self.workers = max(1, workers)
+        self.post_workers = max(1, post_workers)
+        self.transcoding = transcoding
+        self.alpha = alpha
+        self.averages = {}
+        self.found = 0
+        self.finished = 0
+        # track number -> (stage, stage start, seconds spent searching)
+        self.tracks = {}
+        self._lock = threading.Lock()
+
+    def average(self, name):
+        return self.averages.get(name, PRIORS[name])
+
+    def update(self, name, value):
+        if name in self.averages:
+            value = self.alpha * value + (1 - self.alpha) * self.averages[name]
+        self.averages[name] = value
+
+    def observe(self, event):
+        n, state = event["track"], event["state"]
+        if n not in self.durations:
+            return
+        now = time.monotonic()
+        with self._lock:
+            stage, since, searched = self.tracks.get(n) or (None, now, 0.0)
+            if stage in ("searching", "downloading") and state != "downloaded":
+                searched += now - since
+            if state == "downloaded":
+                self.update("search", searched)
+                if event.get("speed"):
+                    self.update("bytes_per_sec", event["speed"])
+                if event.get("size"):
+                    self.update(
+                        "bytes_per_audio_sec", event["size"] / self.durations[n]
+                    )
+            elif state in ("done", "not_found", "kept"):
+                if stage in ("downloaded", "transcoding") and state == "done":
+                    self.update("post", (now - since) / self.durations[n])
+                elif state == "not_found":
+                    self.update("search", searched)
+                self.finished += 1
+                self.found += state != "not_found"
+                self.tracks[n] = ("finished", now, searched)
+                return
+            self.tracks[n] = (state, now, searched)
+
+    def remaining(self):
+        """Estimated seconds until every track has finished."""
+        now = time.monotonic()
+        with self._lock:
+            hit_rate = (self.found + 1) / (self.finished + 1)
+            search = self.average("search")
+            download = self.average("bytes_per_audio_sec") / self.average(
+                "bytes_per_sec"
+            )
+            post = self.average("post")
+            fetch_work = post_work = 0.0
+            for n, duration in self.durations.items():
+                stage, since, searched = self.tracks.get(n) or (None, now, 0.0)
+                if stage == "finished":
+                    continue
+                elapsed = now - since
+                if stage in (None, "queued", "searching"):
+                    fetch_work += max(search - searched - elapsed, 0.0)
+                    fetch_work += hit_rate * duration * download
+                    post_work += hit_rate * duration * post
+                elif stage == "downloading":
+                    fetch_work += max(duration * download - elapsed, 0.0)
+                    post_work += duration * post
+                elif stage == "downloaded":
+                    post_work += duration * post
+                else:
+                    post_work += max(duration * post - elapsed, 0.0)
+        if not self.transcoding:
+            return (fetch_work + post_work) / self.workers
+        # Transcodes overlap with downloads; the last one starts after the
+        # last download finishes
+        fetch_time = fetch_work / self.workers
+        if fetch_work:
+            fetch_time += post * self.mean_duration
+        return max(fetch_time, post_work / self.post_workers)
@@ -0,0 +1,257 @@
+import base64
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+RATE = 11025
+# Only the start of each track is decoded; enough to tell songs apart
+SECONDS = 120
+WINDOW = 4096
+HOP = 2048
+# Frames summed into one step of the chroma sequence (about 1.1 s)
+STEP_FRAMES = 6
+LOW_HZ, HIGH_HZ = 55.0, 5000.0
+BANDS = 16
+# Uploads may start up to this many steps (about 30 s) apart
+MAX_SHIFT = 27
+MIN_OVERLAP = 18
+
+
+def _mappings():
+    freqs = np.fft.rfftfreq(WINDOW, 1 / RATE)
+    used = (freqs >= LOW_HZ) & (freqs <= HIGH_HZ)
+    pitch = np.round(12 * np.log2(np.maximum(freqs, 1) / 440.0)).astype(int) % 12
+    chroma = np.zeros((len(freqs), 12), dtype=np.float32)
+    chroma[used, pitch[used]] = 1
+    edges = np.geomspace(LOW_HZ, HIGH_HZ, BANDS + 1)
+    band = np.searchsorted(edges, freqs, side="right") - 1
+    bands = np.zeros((len(freqs), BANDS), dtype=np.float32)
+    bands[used, np.clip(band[used], 0, BANDS - 1)] = 1
+    return chroma, bands
+
+
+_CHROMA, _BANDS = _mappings()
+_HANN = np.hanning(WINDOW).astype(np.float32)
+_UPPER = np.triu_indices(12)
+
+
+def unit_rows(x):
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norms > 0, norms, 1)
+
+
+def compute(samples):
+    """
+    Fingerprint of mono ``samples`` at RATE Hz, or None if too short or silent.
+
+    Returns:
+        tuple: (vector, sequence). The vector (float32) summarises the
+            whole excerpt: mean chroma, chroma covariance and spectral
+            envelope, all independent of level and of where the song
+            starts. The sequence (int8, steps x 12) is the centred,
+            normalised chroma of each ~1 s step, for aligned comparison.
+    """
+    if len(samples) < WINDOW * STEP_FRAMES:
+        return None
+    frames = np.lib.stride_tricks.sliding_window_view(samples, WINDOW)[::HOP]
+    power = np.abs(np.fft.rfft(frames * _HANN, axis=1)) ** 2
+    steps = len(power) // STEP_FRAMES
+    chroma = (power @ _CHROMA)[: steps * STEP_FRAMES]
+    chroma = chroma.reshape(steps, STEP_FRAMES, 12).sum(axis=1)
+    bands = (power @ _BANDS)[: steps * STEP_FRAMES]
+    bands = bands.reshape(steps, STEP_FRAMES, BANDS).sum(axis=1)
+    loud = chroma.sum(axis=1) > chroma.sum() * 1e-4 / steps
+    if loud.sum() < MIN_OVERLAP:
+        return None
+
+    chroma = chroma / np.maximum(chroma.sum(axis=1, keepdims=True), 1e-12)
+    centred = unit_rows(chroma - chroma.mean(axis=1, keepdims=True)) * loud[:, None]
+    envelope = np.log10(bands[loud] + 1e-9)
+    envelope -= envelope.mean(axis=1, keepdims=True)
+    vector = np.concatenate(
+        [
+            chroma[loud].mean(axis=0),
+            np.cov(centred[loud], rowvar=False)[_UPPER],
+            envelope.mean(axis=0),
+            envelope.std(axis=0),
+        ]
+    ).astype(np.float32)
+    return vector, np.round(centred * 127).astype(np.int8)
+
+
+def fingerprint_file(path, ffmpeg_exe="ffmpeg"):
+    """
+    Decode the start of one file with ffmpeg and fingerprint it.
+
+    Runs in a worker process.
+
+    Returns:
+        dict: "path", "vector" and "sequence" (see compute); or "path" and
+            "error"
+    """
+    result = subprocess.run(
+        [
+            ffmpeg_exe,
+            "-nostdin",
+            "-v",
+            "error",
+            "-t",
+            str(SECONDS),
+            "-i",
+            path,
+            "-map",
+            "0:a:0",
+            "-ac",
+            "1",
+            "-ar",
+            str(RATE),
+            "-f",
+            "f32le",
+            "-",
+        ],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        return {"path": path, "error": result.stderr.decode("utf-8", "replace")}
+    fingerprint = compute(np.frombuffer(result.stdout, dtype="<f4"))
+    if fingerprint is None:
+        return {"path": path, "error": "too short or silent"}
+    return {"path": path, "vector": fingerprint[0], "sequence": fingerprint[1]}
+
+
+def fingerprint_files(paths, ffmpeg_exe="ffmpeg", workers=None):
+    """fingerprint_file for each of ``paths``, in a process pool."""
+    if not paths:
+        return []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        return list(
+            pool.map(fingerprint_file, paths, [ffmpeg_exe] * len(paths), chunksize=4)
+        )
+
+
+def encode(vector, sequence):
+    """JSON-friendly form of a fingerprint (about 2 KB)."""
+    return {
+        "vector": base64.b64encode(vector.astype("<f2").tobytes()).decode("ascii"),
+        "sequence": base64.b64encode(sequence.tobytes()).decode("ascii"),
+    }
+
+
+def decode(data):
+    vector = np.frombuffer(base64.b64decode(data["vector"]), dtype="<f2")
+    sequence = np.frombuffer(base64.b64decode(data["sequence"]), dtype=np.int8)
+    return vector.astype(np.float32), sequence.reshape(-1, 12)
+
+
+def similarity(a, b):
+    """
+    How alike two chroma sequences are, from -1 to 1: the mean cosine of
+    aligned steps at the best offset within MAX_SHIFT steps.
+    """
+    a = unit_rows(a.astype(np.float32))
+    b = unit_rows(b.astype(np.float32))
+    dots = a @ b.T
+    best = -1.0
+    for shift in range(-MAX_SHIFT, MAX_SHIFT + 1):
+        diagonal = np.diagonal(dots, offset=shift)
+        if len(diagonal) >= MIN_OVERLAP:
+            best = max(best, float(diagonal.mean()))
+    return best
+
+
+class LshIndex:
+    """
+    Nearest-neighbour index over fingerprint vectors.
+
+    Vectors are standardised across the library and hashed with random
+    hyperplanes into ``tables`` tables of ``bits``-bit codes, so similar
+    vectors share a bucket in at least one table with high probability and
+    a lookup only compares against its buckets, not the whole library.
+    """
+
+    def __init__(self, vectors, tables=24, bits=10, seed=0):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        self.mean = vectors.mean(axis=0)
+        std = vectors.std(axis=0)
+        self.std = np.where(std > 0, std, 1)
+        self.unit = self.standardise(vectors)
+        rng = np.random.default_rng(seed)
+        self.tables = tables
+        self.bits = bits
+        self.planes = rng.standard_normal((vectors.shape[1], tables * bits))
+        self.planes = self.planes.astype(np.float32)
+        self.buckets = []
+        codes = self.codes(self.unit)
+        for table in range(tables):
+            order = np.argsort(codes[:, table], kind="stable")
+            keys, starts = np.unique(codes[order, table], return_index=True)
+            self.buckets.append(dict(zip(keys.tolist(), np.split(order, starts[1:]))))
+
+    def standardise(self, vectors):
+        return unit_rows((vectors - self.mean) / self.std)
+
+    def codes(self, unit):
+        signs = (unit @ self.planes > 0).reshape(len(unit), self.tables, self.bits)
+        return signs @ (1 << np.arange(self.bits))
+
+    def __len__(self):
+        return len(self.unit)
+
+    def nearest(self, vector, k=5):
+        """
+        Up to ``k`` (index, cosine) pairs of the indexed vectors nearest to
+        ``vector``, best first.
+        """
+        query = self.standardise(np.asarray(vector, dtype=np.float32)[None])
+        found = [
+            self.buckets[t].get(code)
+            for t, code in enumerate(self.codes(query)[0].tolist())
+        ]
+        found = [ids for ids in found if ids is not None]
+        if not found:
+            return []
+        ids = np.unique(np.concatenate(found))
+        cosines = self.unit[ids] @ query[0]
+        best = np.argsort(-cosines)[:k]
+        return [(int(ids[i]), float(cosines[i])) for i in best]
+
+    def candidate_pairs(self, min_cosine):
+        """Pairs (i, j), i < j, sharing a bucket with cosine >= ``min_cosine``."""
+        pairs = set()
+        for table in self.buckets:
+            for ids in table.values():
+                if len(ids) < 2:
+                    continue
+                # Row blocks keep an unusually full bucket's matrix small
+                for start in range(0, len(ids), 1024):
+                    rows = ids[start : start + 1024]
+                    cosines = self.unit[rows] @ self.unit[ids].T
+                    r, c = np.nonzero(cosines >= min_cosine)
+                    for i, j in zip(rows[r].tolist(), ids[c].tolist()):
+                        if i < j:
+                            pairs.add((i, j))
+        return pairs
+
+
+def find_duplicates(vectors, sequences, threshold=0.75, min_cosine=0.5):
+    """
+    Near-duplicate pairs among fingerprints.
+
+    Candidates come from the LSH index (vector cosine of at least
+    ``min_cosine``) and are confirmed by aligned sequence similarity.
+
+    Returns:
+        list: (i, j, similarity) with similarity >= ``threshold``, most
+            similar first
+    """
+    if len(vectors) < 2:
+        return []
+    index = LshIndex(vectors)
+    duplicates = []
+    for i, j in index.candidate_pairs(min_cosine):
+        score = similarity(sequences[i], sequences[j])
+        if score >= threshold:
+            duplicates.append((i, j, score))
+    return sorted(duplicates, key=lambda d: -d[2])
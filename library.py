@@ -0,0 +1,897 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import core
+
+# Where each tag family keeps title, artist and album, and its cover art
+TAG_FIELDS = {
+    "id3": {"title": "TIT2", "artist": "TPE1", "album": "TALB"},
+    "mp4": {"title": "\xa9nam", "artist": "\xa9ART", "album": "\xa9alb"},
+    "vorbis": {"title": "title", "artist": "artist", "album": "album"},
+}
+ART_KEYS = {"id3": "APIC", "mp4": "covr", "vorbis": "metadata_block_picture"}
+# Fields written by retag, per tag family. Track number and total share
+# ID3's TRCK and MP4's trkn.
+RETAG_KEYS = {
+    "id3": {
+        "title": "TIT2",
+        "artist": "TPE1",
+        "albumartist": "TPE2",
+        "album": "TALB",
+        "date": "TDRC",
+        "isrc": "TSRC",
+        "spotify_uri": "TXXX:SPOTIFY_URI",
+    },
+    "mp4": {
+        "title": "\xa9nam",
+        "artist": "\xa9ART",
+        "albumartist": "aART",
+        "album": "\xa9alb",
+        "date": "\xa9day",
+        "isrc": "----:com.apple.iTunes:ISRC",
+        "spotify_uri": "----:com.apple.iTunes:SPOTIFY_URI",
+    },
+    "vorbis": {
+        "title": "title",
+        "artist": "artist",
+        "albumartist": "albumartist",
+        "album": "album",
+        "date": "date",
+        "isrc": "isrc",
+        "spotify_uri": "spotify_uri",
+        "tracknumber": "tracknumber",
+        "tracktotal": "tracktotal",
+    },
+}
+
+
+def imap_unordered(executor, fn, items, limit):
+    """
+    Run ``fn(*item)`` for each item on ``executor`` and yield results as they
+    finish. At most ``limit`` calls are queued at a time, so ``items`` can be
+    a lazy generator over any number of files.
+    """
+    pending = set()
+    for item in items:
+        pending.add(executor.submit(fn, *item))
+        if len(pending) >= limit:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+def playlist_folders(paths):
+    """
+    Playlist folders among ``paths``: each path that holds a manifest or
+    audio files itself, else its subfolders that do.
+    """
+
+    def is_playlist(path):
+        if os.path.isfile(os.path.join(path, core.MANIFEST_FILE)):
+            return True
+        with os.scandir(path) as it:
+            return any(e.name.endswith(core.AUDIO_EXTS) for e in it)
+
+    for path in paths:
+        if is_playlist(path):
+            yield path
+            continue
+        with os.scandir(path) as it:
+            subfolders = sorted(e.path for e in it if e.is_dir())
+        for sub in subfolders:
+            if is_playlist(sub):
+                yield sub
+
+
+def folder_entries(folder, csv_path=None):
+    """
+    The tracks a playlist folder should hold: its manifest, else the rows of
+    ``csv_path`` matched to files by number, else just the audio files.
+    """
+    manifest = core.load_manifest(folder)
+    if manifest is not None:
+        return manifest["tracks"]
+    playlist_name = os.path.basename(os.path.normpath(folder))
+    if csv_path:
+        return core.recover_entries(core.read_rows(csv_path), folder, playlist_name)
+    entries = []
+    for name in sorted(os.listdir(folder)):
+        if name.endswith(core.AUDIO_EXTS) and not name.startswith("temp_"):
+            match = re.match(r"(\d+) - ", name)
+            entries.append(
+                {"number": int(match.group(1)) if match else None, "file": name}
+            )
+    return entries
+
+
+def ffprobe_path(config):
+    ffmpeg_exe = core.find_executables(config)[0]
+    folder, name = os.path.split(ffmpeg_exe)
+    return os.path.join(folder, name.replace("ffmpeg", "ffprobe"))
+
+
+def probe_duration(path, config):
+    """Container duration in seconds according to ffprobe, or None if unreadable."""
+    try:
+        ret = subprocess.run(
+            [
+                ffprobe_path(config),
+                "-v",
+                "error",
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "default=noprint_wrappers=1:nokey=1",
+                path,
+            ],
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    try:
+        return float(ret.stdout.strip()) if ret.returncode == 0 else None
+    except ValueError:
+        return None
+
+
+def tag_family(audio):
+    from mutagen.id3 import ID3
+    from mutagen.mp4 import MP4Tags
+
+    if isinstance(audio.tags, ID3):
+        return "id3"
+    if isinstance(audio.tags, MP4Tags):
+        return "mp4"
+    return "vorbis"
+
+
+def read_tags(audio):
+    """Title, artist and album of an opened mutagen file, and whether it has art."""
+    if audio.tags is None:
+        return {}, False
+    family = tag_family(audio)
+    tags = {}
+    for field, key in TAG_FIELDS[family].items():
+        value = audio.tags.get(key)
+        if value is not None:
+            value = value.text if family == "id3" else value
+            tags[field] = str(value[0]) if value else ""
+    art_key = ART_KEYS[family]
+    if family == "id3":
+        has_art = any(k.startswith(art_key) for k in audio.tags.keys())
+    else:
+        has_art = bool(audio.tags.get(art_key))
+    return tags, has_art
+
+
+def check_file(folder, entry, config, check_art=True):
+    """
+    Verify one track file against its manifest entry.
+
+    Returns:
+        dict: "folder", "file", "number", "problems" (empty when the file is
+            fine) and "broken" (True when the audio itself is missing,
+            unreadable or truncated and only a new download fixes it)
+    """
+    from mutagen import File
+
+    path = os.path.join(folder, entry["file"])
+    result = {
+        "folder": folder,
+        "file": entry["file"],
+        "number": entry.get("number"),
+        "problems": [],
+        "broken": True,
+    }
+    problems = result["problems"]
+    if not os.path.isfile(path):
+        problems.append("missing")
+        return result
+    if os.path.getsize(path) == 0:
+        problems.append("empty file")
+        return result
+
+    audio = None
+    if not path.lower().endswith(".webm"):
+        try:
+            audio = File(path)
+        except Exception:
+            audio = None
+    if audio is not None and audio.info.length:
+        length = audio.info.length
+    else:
+        # mutagen cannot read Matroska, and gives up on damaged headers that
+        # ffprobe may still decode
+        length = probe_duration(path, config)
+    if not length:
+        problems.append("unreadable audio")
+        return result
+
+    expected = entry.get("duration_ms")
+    expected = int(expected) / 1000 if str(expected).isdigit() else None
+    tolerance = float(config.get("verify_duration_tolerance") or 30)
+    if expected and length < expected - tolerance:
+        problems.append(f"truncated ({length:.0f}s of {expected:.0f}s)")
+        return result
+    result["broken"] = False
+
+    if audio is None:
+        # WebM keeps yt-dlp's own metadata, and files only ffprobe can read
+        # have no tags mutagen could show
+        return result
+    tags, has_art = read_tags(audio)
+    missing = [f for f in ("title", "artist", "album") if not tags.get(f)]
+    if missing:
+        problems.append(f"missing tags: {', '.join(missing)}")
+    wrong = [
+        f
+        for f in ("title", "artist", "album")
+        if tags.get(f) and entry.get(f) and tags[f] != entry[f]
+    ]
+    if wrong:
+        problems.append(f"tags differ from playlist: {', '.join(wrong)}")
+    if check_art and not has_art:
+        problems.append("no cover art")
+    return result
+
+
+def verify_tasks(folders, config, csv_paths, check_art, leftovers):
+    """Lazily list (folder, entry, config, check_art) per expected track."""
+    for folder in folders:
+        playlist_name = os.path.basename(os.path.normpath(folder))
+        entries = folder_entries(folder, csv_paths.get(playlist_name))
+        tracked = set()
+        for entry in entries:
+            if entry.get("file"):
+                tracked.add(entry["file"])
+                yield folder, entry, config, check_art
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(core.AUDIO_EXTS) and name not in tracked:
+                if not name.startswith("temp_"):
+                    leftovers.append((folder, name, "not in manifest"))
+        for pattern in core.PARTIAL_FILE_PATTERNS:
+            for path in glob.glob(os.path.join(glob.escape(folder), pattern)):
+                leftovers.append(
+                    (folder, os.path.basename(path), "partial download or swap")
+                )
+
+
+def verify_library(paths, config=None, csv_paths=None, workers=None, check_art=True):
+    """
+    Check every track of the playlist folders under ``paths`` in parallel.
+
+    Files are opened once with mutagen, falling back to ffprobe, and compared
+    with the folder's manifest (or the matching CSV in ``csv_paths``, keyed
+    by playlist name, for folders without one). Results are yielded as they
+    finish (see check_file), followed by one result per leftover: partial
+    files and audio files the manifest does not list. Only a bounded window
+    of files is in flight, so libraries of any size stream through.
+    """
+    config = config or core.load_config()
+    workers = workers or (os.cpu_count() or 1) * 2
+    leftovers = []
+    tasks = verify_tasks(
+        playlist_folders(paths), config, csv_paths or {}, check_art, leftovers
+    )
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from imap_unordered(executor, check_file, tasks, workers * 4)
+    for folder, name, problem in leftovers:
+        yield {
+            "folder": folder,
+            "file": name,
+            "number": None,
+            "problems": [problem],
+            "broken": False,
+        }
+
+
+def refetch_broken(folder, csv_path, broken, config):
+    """
+    Delete the broken files of one playlist folder and download those tracks
+    again with core.retry_failures.
+    """
+    playlist_name = os.path.basename(os.path.normpath(folder))
+    entries = {e.get("number"): e for e in folder_entries(folder, csv_path)}
+    songs = []
+    video_ids = []
+    for result in broken:
+        path = os.path.join(folder, result["file"])
+        if os.path.isfile(path):
+            os.remove(path)
+        entry = entries.get(result["number"]) or {}
+        video_ids.append(entry.get("video_id"))
+        songs.append(
+            {
+                "Track Name": entry.get("title", result["file"]),
+                "Artist Name(s)": entry.get("artist", ""),
+                "Album Name": entry.get("album", ""),
+                "Track Number": result["number"],
+                "Error": "; ".join(result["problems"]),
+            }
+        )
+    # Otherwise yt-dlp's archive would skip the downloads
+    core.forget_archived_ids(os.path.join(folder, "downloaded.txt"), video_ids)
+    report = os.path.join(folder, f"{playlist_name}_broken.csv")
+    with open(report, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=core.NOT_FOUND_FIELDS)
+        writer.writeheader()
+        writer.writerows(songs)
+    # Keep the folder's format rather than the configured one
+    ext = os.path.splitext(broken[0]["file"])[1].lstrip(".").lower()
+    if ext in core.OUTPUT_FORMATS:
+        config = dict(config, output_format=ext)
+    try:
+        return core.retry_failures(
+            csv_path, os.path.dirname(os.path.normpath(folder)), config, report
+        )
+    finally:
+        os.remove(report)
+
+
+def split_artists(value):
+    return [a.strip() for a in re.split(r",|;", value or "") if a.strip()]
+
+
+def desired_tags(row, number, total, playlist_name, all_artists=False):
+    """
+    Tags a track should carry according to its CSV row, as lists of strings.
+    Fields the CSV has no value for are left out, and so left alone.
+    """
+    info = core.track_info(row, playlist_name)
+    artists = split_artists(row.get("Artist Name(s)") or row.get("Artist name"))
+    album_artists = split_artists(row.get("Album Artist Name(s)"))
+    fields = {
+        "title": [info["title"]],
+        "artist": artists if all_artists and artists else [info["artist"]],
+        "albumartist": album_artists[:1] if not all_artists else album_artists,
+        "album": [info["album"]],
+        "date": [row.get("Album Release Date") or row.get("Release Date") or ""],
+        "isrc": [row.get("ISRC") or ""],
+        "spotify_uri": [(row.get("Track URI") or "").strip()],
+        "tracknumber": [str(number)],
+        "tracktotal": [str(total)],
+    }
+    return {k: v for k, v in fields.items() if v and all(v)}
+
+
+def read_fields(audio, family):
+    """Current values of the RETAG_KEYS fields, as lists of strings."""
+    from mutagen.mp4 import MP4FreeForm
+
+    tags = audio.tags
+    fields = {}
+    for field, key in RETAG_KEYS[family].items():
+        value = tags.get(key)
+        if value is None:
+            continue
+        if family == "id3":
+            value = value.text
+        fields[field] = [
+            bytes(v).decode("utf-8") if isinstance(v, MP4FreeForm) else str(v)
+            for v in value
+        ]
+    if family == "id3" and tags.get("TRCK"):
+        number, _, total = str(tags["TRCK"].text[0]).partition("/")
+        fields["tracknumber"], fields["tracktotal"] = [number], [total]
+    elif family == "mp4" and tags.get("trkn"):
+        number, total = tags["trkn"][0]
+        fields["tracknumber"], fields["tracktotal"] = [str(number)], [str(total)]
+    return {k: v for k, v in fields.items() if v and all(v)}
+
+
+def write_fields(audio, family, fields):
+    """Set ``fields`` on an opened mutagen file without saving it."""
+    from mutagen.id3 import TRCK, TXXX, Frames
+    from mutagen.mp4 import MP4FreeForm
+
+    tags = audio.tags
+    for field, values in fields.items():
+        key = RETAG_KEYS[family].get(field)
+        if key is None:
+            continue
+        if family == "id3":
+            if key.startswith("TXXX:"):
+                frame = TXXX(encoding=3, desc=key[5:], text=values)
+            else:
+                frame = Frames[key](encoding=3, text=values)
+            tags.delall(key)
+            tags.add(frame)
+        elif family == "mp4" and key.startswith("----"):
+            tags[key] = [MP4FreeForm(v.encode("utf-8")) for v in values]
+        else:
+            tags[key] = values
+    if "tracknumber" in fields and family != "vorbis":
+        number = int(fields["tracknumber"][0])
+        total = int((fields.get("tracktotal") or ["0"])[0])
+        if family == "id3":
+            tags.setall("TRCK", [TRCK(encoding=3, text=[f"{number}/{total}"])])
+        else:
+            tags["trkn"] = [(number, total)]
+
+
+def retag_file(path, wanted, dry_run=False):
+    """
+    Bring one file's tags in line with ``wanted`` (see desired_tags), opening
+    and saving it at most once.
+
+    Returns:
+        tuple: (path, "updated", "unchanged", "skipped" or "error: ...",
+            changed field names)
+    """
+    from mutagen import File
+
+    if path.lower().endswith(".webm"):
+        return path, "skipped", []
+    try:
+        audio = File(path)
+        if audio is None:
+            return path, "error: unrecognised file", []
+        if audio.tags is None:
+            audio.add_tags()
+        family = tag_family(audio)
+        current = read_fields(audio, family)
+        changed = {k: v for k, v in wanted.items() if current.get(k) != v}
+        if family != "vorbis" and ("tracknumber" in changed or "tracktotal" in changed):
+            # Stored together, so both are rewritten
+            for field in ("tracknumber", "tracktotal"):
+                if field in wanted:
+                    changed[field] = wanted[field]
+        if not changed:
+            return path, "unchanged", []
+        if not dry_run:
+            write_fields(audio, family, changed)
+            audio.save()
+        return path, "updated", sorted(changed)
+    except Exception as e:
+        return path, f"error: {e}", []
+
+
+def retag_tasks(folders, csv_paths, all_artists, dry_run, skipped):
+    """Lazily list (path, wanted tags, dry_run) per track with a CSV row."""
+    for folder in folders:
+        playlist_name = os.path.basename(os.path.normpath(folder))
+        csv_path = csv_paths.get(playlist_name)
+        if csv_path is None:
+            skipped.append(folder)
+            continue
+        rows = core.read_rows(csv_path)
+        by_key = {core.track_key(row): (i, row) for i, row in enumerate(rows, 1)}
+        for entry in folder_entries(folder, csv_path):
+            if not entry.get("file"):
+                continue
+            number, row = by_key.get(entry.get("key"), (None, None))
+            if row is None and entry.get("number") and entry["number"] <= len(rows):
+                number, row = entry["number"], rows[entry["number"] - 1]
+            if row is None:
+                continue
+            wanted = desired_tags(row, number, len(rows), playlist_name, all_artists)
+            yield os.path.join(folder, entry["file"]), wanted, dry_run
+
+
+def retag_library(
+    paths, csv_paths, workers=None, all_artists=False, dry_run=False, skipped=None
+):
+    """
+    Reapply CSV metadata to the tracks of the playlist folders under
+    ``paths`` in parallel, without any network access.
+
+    ``csv_paths`` maps playlist (folder) names to their CSVs; folders
+    without one are appended to ``skipped``. Tracks are matched to rows by
+    their manifest key, so the CSV may have been reordered since the
+    download. Writes title, artist (the primary one, or all of them with
+    ``all_artists``), album artist, album, release date, ISRC, Spotify URI
+    and track number/total where the CSV has them. Yields retag_file
+    results as they finish.
+    """
+    workers = workers or (os.cpu_count() or 1) * 2
+    tasks = retag_tasks(
+        playlist_folders(paths),
+        csv_paths,
+        all_artists,
+        dry_run,
+        skipped if skipped is not None else [],
+    )
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from imap_unordered(executor, retag_file, tasks, workers * 4)
+
+
+def fingerprint_library(paths, config):
+    """
+    Fingerprint every track of the playlist folders under ``paths``.
+
+    Returns:
+        list: one dict per distinct file (hardlinked copies are listed
+            under "links"): path, folder, file, key (the CSV track, from
+            the manifest), size, vector and sequence
+    """
+    records = []
+    inodes = {}
+    for folder in playlist_folders(paths):
+        entries = [
+            e
+            for e in folder_entries(folder)
+            if e["file"] and os.path.isfile(os.path.join(folder, e["file"]))
+        ]
+        prints = core.fingerprint_folder(folder, [e["file"] for e in entries], config)
+        for entry in entries:
+            if entry["file"] not in prints:
+                continue
+            path = os.path.join(folder, entry["file"])
+            st = os.stat(path)
+            inode = (st.st_dev, st.st_ino)
+            if inode in inodes:
+                inodes[inode]["links"].append(path)
+                continue
+            vector, sequence = prints[entry["file"]]
+            inodes[inode] = {
+                "path": path,
+                "folder": folder,
+                "file": entry["file"],
+                "key": entry.get("key"),
+                "size": st.st_size,
+                "vector": vector,
+                "sequence": sequence,
+                "links": [],
+            }
+            records.append(inodes[inode])
+    return records
+
+
+def duplicate_groups(records, threshold):
+    """
+    Groups of records that sound alike, linked through pairs at least
+    ``threshold`` similar.
+
+    Returns:
+        list: (record indexes, lowest pair similarity) per group
+    """
+    import fingerprint
+
+    pairs = fingerprint.find_duplicates(
+        [r["vector"] for r in records], [r["sequence"] for r in records], threshold
+    )
+    parent = list(range(len(records)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j, _ in pairs:
+        parent[root(i)] = root(j)
+    groups = {}
+    for i, j, score in pairs:
+        group = groups.setdefault(root(i), [set(), score])
+        group[0].update((i, j))
+        group[1] = min(group[1], score)
+    return sorted(
+        ((sorted(members), score) for members, score in groups.values()),
+        key=lambda g: records[g[0][0]]["path"],
+    )
+
+
+def mismatched_tracks(records, threshold):
+    """
+    Records of CSV tracks downloaded more than once whose audio is less
+    than ``threshold`` similar to every other download of the same track:
+    likely a wrong match (if two copies disagree, either may be wrong).
+
+    Returns:
+        list: (record, best similarity, other downloads)
+    """
+    import fingerprint
+
+    by_key = {}
+    for record in records:
+        if record["key"]:
+            by_key.setdefault(record["key"], []).append(record)
+    suspects = []
+    for copies in by_key.values():
+        for record in copies:
+            others = [c for c in copies if c is not record]
+            if not others:
+                continue
+            best = max(
+                fingerprint.similarity(record["sequence"], c["sequence"])
+                for c in others
+            )
+            if best < threshold:
+                suspects.append((record, best, len(others)))
+    return suspects
+
+
+def link_duplicates(records, members):
+    """
+    Replace duplicates with hardlinks to the largest copy, among members
+    of a group that are the same CSV track in the same format. Tags are
+    stored in the file, so the linked copies share the kept copy's tags.
+
+    Returns:
+        int: files replaced
+    """
+    import fingerprint
+
+    kinds = {}
+    for i in members:
+        record = records[i]
+        if record["key"]:
+            ext = os.path.splitext(record["file"])[1].lower()
+            kinds.setdefault((record["key"], ext), []).append(record)
+    linked = 0
+    for copies in kinds.values():
+        keep = max(copies, key=lambda r: r["size"])
+        for record in copies:
+            if record is keep:
+                continue
+            tmp = record["path"] + ".part"
+            try:
+                os.link(keep["path"], tmp)
+                os.replace(tmp, record["path"])
+            except OSError as e:
+                print(f"Could not link {record['path']}: {e}")
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                continue
+            # The file changed, but not its sound: keep its fingerprint
+            store = core.FingerprintStore.for_folder(record["folder"])
+            store.put(
+                record["file"],
+                os.stat(record["path"]),
+                fingerprint.encode(keep["vector"], keep["sequence"]),
+            )
+            store.save()
+            linked += 1
+    return linked
+
+
+def format_result(result):
+    return (
+        f"{'BROKEN' if result['broken'] else 'WARN  '} "
+        f"{os.path.join(result['folder'], result['file'])}: "
+        f"{'; '.join(result['problems'])}"
+    )
+
+
+def cmd_verify(args, config):
+    csv_paths = {os.path.splitext(os.path.basename(p))[0]: p for p in args.csv}
+    checked = ok = 0
+    broken = {}
+    for result in verify_library(
+        args.paths,
+        config,
+        csv_paths=csv_paths,
+        workers=args.workers,
+        check_art=not args.no_art_check,
+    ):
+        checked += 1
+        if not result["problems"]:
+            ok += 1
+            continue
+        if result["broken"] and result["number"]:
+            broken.setdefault(result["folder"], []).append(result)
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+        else:
+            print(format_result(result), flush=True)
+    total_broken = sum(len(b) for b in broken.values())
+    print(
+        f"Checked {checked} files: {ok} OK, {total_broken} broken, "
+        f"{checked - ok - total_broken} with warnings"
+    )
+
+    if args.refetch:
+        for folder, results in broken.items():
+            playlist_name = os.path.basename(os.path.normpath(folder))
+            if playlist_name not in csv_paths:
+                print(f"Skipping re-fetch in {folder}: pass its CSV with --csv")
+                continue
+            print(f"Re-fetching {len(results)} broken tracks in {folder}")
+            refetch_broken(folder, csv_paths[playlist_name], results, config)
+    return 1 if total_broken else 0
+
+
+def cmd_retag(args, config):
+    csv_paths = {os.path.splitext(os.path.basename(p))[0]: p for p in args.csv}
+    counts = {}
+    errors = 0
+    skipped = []
+    for path, status, changed in retag_library(
+        args.paths,
+        csv_paths,
+        workers=args.workers,
+        all_artists=args.all_artists,
+        dry_run=args.dry_run,
+        skipped=skipped,
+    ):
+        if status.startswith("error"):
+            errors += 1
+            print(f"{path}: {status}", flush=True)
+            continue
+        counts[status] = counts.get(status, 0) + 1
+        if args.verbose and changed:
+            print(f"{path}: {', '.join(changed)}", flush=True)
+    for folder in skipped:
+        print(f"Skipped {folder}: no CSV named after it (pass it with --csv)")
+    print(
+        f"{'Would update' if args.dry_run else 'Updated'} "
+        f"{counts.get('updated', 0)} files, {counts.get('unchanged', 0)} "
+        f"already up to date, {errors} errors"
+    )
+    return 1 if errors else 0
+
+
+def cmd_replaygain(args, config):
+    if args.workers:
+        config = dict(config, replaygain_workers=args.workers)
+    total = 0
+    for folder in playlist_folders(args.paths):
+        paths = [
+            os.path.join(folder, e["file"])
+            for e in folder_entries(folder)
+            if e["file"] and os.path.isfile(os.path.join(folder, e["file"]))
+        ]
+        if paths:
+            print(f"{folder}: measuring {len(paths)} tracks", flush=True)
+            total += core.replaygain_files(paths, config)[0]
+    print(f"Tagged {total} files")
+    return 0
+
+
+def cmd_duplicates(args, config):
+    if args.workers:
+        config = dict(config, fingerprint_workers=args.workers)
+    records = fingerprint_library(args.paths, config)
+    groups = duplicate_groups(records, args.threshold)
+    suspects = mismatched_tracks(records, args.mismatch)
+    for members, score in groups:
+        paths = [records[i]["path"] for i in members]
+        if args.json:
+            print(json.dumps({"duplicates": paths, "similarity": round(score, 3)}))
+        else:
+            print(f"Duplicates (similarity {score:.2f}):")
+            for path in paths:
+                print(f"  {path}")
+    for record, best, others in suspects:
+        if args.json:
+            print(
+                json.dumps(
+                    {
+                        "mismatch": record["path"],
+                        "key": record["key"],
+                        "similarity": round(best, 3),
+                    }
+                )
+            )
+        else:
+            print(
+                f"Possible wrong match: {record['path']} (similarity {best:.2f} "
+                f"to {others} other download{'s' if others > 1 else ''} "
+                "of the same track)"
+            )
+    linked = 0
+    if args.link:
+        for members, _ in groups:
+            linked += link_duplicates(records, members)
+    print(
+        f"Fingerprinted {len(records)} files: {len(groups)} groups of duplicates, "
+        f"{len(suspects)} possible wrong matches"
+        + (f", {linked} files replaced by hardlinks" if args.link else "")
+    )
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check and maintain playlist folders written by Spotify2MP3"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Parallel files (default: twice the CPU count)"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    verify = commands.add_parser(
+        "verify", help="Find missing, truncated, unreadable or untagged tracks"
+    )
+    verify.add_argument(
+        "paths", nargs="+", help="Playlist folders, or output folders holding them"
+    )
+    verify.add_argument(
+        "--csv",
+        action="append",
+        default=[],
+        help="Playlist CSV, matched to its folder by name (repeatable)",
+    )
+    verify.add_argument(
+        "--refetch",
+        action="store_true",
+        help="Delete broken tracks and download them again (needs --csv)",
+    )
+    verify.add_argument(
+        "--no-art-check", action="store_true", help="Do not report missing cover art"
+    )
+    verify.add_argument(
+        "--json", action="store_true", help="Print one JSON object per problem"
+    )
+    verify.set_defaults(run=cmd_verify)
+
+    retag = commands.add_parser(
+        "retag", help="Rewrite tags from playlist CSVs, without downloading"
+    )
+    retag.add_argument(
+        "paths", nargs="+", help="Playlist folders, or output folders holding them"
+    )
+    retag.add_argument(
+        "--csv",
+        action="append",
+        required=True,
+        help="Playlist CSV, matched to its folder by name (repeatable)",
+    )
+    retag.add_argument(
+        "--all-artists",
+        action="store_true",
+        help="Tag every credited artist instead of the primary one",
+    )
+    retag.add_argument(
+        "--dry-run", action="store_true", help="Report changes without saving"
+    )
+    retag.add_argument(
+        "-v", "--verbose", action="store_true", help="Print the fields changed per file"
+    )
+    retag.set_defaults(run=cmd_retag)
+
+    replaygain = commands.add_parser(
+        "replaygain",
+        help="Tag track and album gain, each playlist folder as one album",
+    )
+    replaygain.add_argument(
+        "paths", nargs="+", help="Playlist folders, or output folders holding them"
+    )
+    replaygain.set_defaults(run=cmd_replaygain)
+
+    duplicates = commands.add_parser(
+        "duplicates",
+        help="Find tracks that sound the same, and downloads that sound wrong",
+    )
+    duplicates.add_argument(
+        "paths", nargs="+", help="Playlist folders, or output folders holding them"
+    )
+    duplicates.add_argument(
+        "--threshold",
+        type=float,
+        default=0.75,
+        help="Similarity (0-1) from which files count as duplicates (default 0.75)",
+    )
+    duplicates.add_argument(
+        "--mismatch",
+        type=float,
+        default=0.5,
+        help="Report downloads of one track less similar than this (default 0.5)",
+    )
+    duplicates.add_argument(
+        "--link",
+        action="store_true",
+        help="Hardlink duplicates of the same track and format to one copy",
+    )
+    duplicates.add_argument(
+        "--json", action="store_true", help="Print one JSON object per finding"
+    )
+    duplicates.set_defaults(run=cmd_duplicates)
+
+    args = parser.parse_args()
+    raise SystemExit(args.run(args, core.load_config()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+RATE = 48000
+CHANNELS = 2
+# Mean squares are taken per 100 ms segment; four of them make one 400 ms
+# gating block (75% overlap), as in ITU-R BS.1770
+SEGMENT = RATE // 10
+SEGMENTS_PER_BLOCK = 4
+# Segments decoded per read from ffmpeg (about a minute of audio)
+READ_SEGMENTS = 600
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+REPLAYGAIN_REFERENCE = -18.0
+R128_REFERENCE = -23.0
+
+# BS.1770 K-weighting at 48 kHz: a high shelf, then the RLB high-pass
+K_WEIGHTING = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285),
+     (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)  # fmt: skip
+
+
+def k_weighting_power(n):
+    """Squared magnitude response of the K-weighting at the rfft bins of n samples."""
+    z = np.exp(-1j * 2 * np.pi * np.fft.rfftfreq(n))
+    response = np.ones_like(z)
+    for b, a in K_WEIGHTING:
+        response *= (b[0] + b[1] * z + b[2] * z**2) / (a[0] + a[1] * z + a[2] * z**2)
+    return np.abs(response) ** 2
+
+
+_WEIGHTS = k_weighting_power(SEGMENT)
+
+
+def segment_power(samples):
+    """
+    K-weighted mean square of each whole 100 ms segment of ``samples``
+    (frames x channels), summed over channels.
+
+    The filter is applied in the frequency domain, segment by segment
+    (Parseval), so a whole read is processed with one batched FFT.
+    """
+    count = len(samples) // SEGMENT
+    segments = samples[: count * SEGMENT].reshape(count, SEGMENT, -1)
+    spectrum = np.abs(np.fft.rfft(segments, axis=1)) ** 2
+    # One-sided spectrum: every bin but DC and Nyquist stands for two
+    spectrum[:, 1:-1] *= 2
+    return np.einsum("sbc,b->s", spectrum, _WEIGHTS) / SEGMENT**2
+
+
+def block_powers(segments):
+    """Mean square of each overlapping 400 ms gating block."""
+    if len(segments) < SEGMENTS_PER_BLOCK:
+        return np.array([segments.mean()]) if len(segments) else segments
+    window = np.ones(SEGMENTS_PER_BLOCK) / SEGMENTS_PER_BLOCK
+    return np.convolve(segments, window, mode="valid")
+
+
+def gated_loudness(blocks):
+    """Integrated loudness in LUFS of gating block powers, or None if silent."""
+    loudness = -0.691 + 10 * np.log10(np.maximum(blocks, 1e-12))
+    blocks = blocks[loudness > ABSOLUTE_GATE]
+    if not len(blocks):
+        return None
+    threshold = -0.691 + 10 * np.log10(blocks.mean()) + RELATIVE_GATE
+    loudness = -0.691 + 10 * np.log10(blocks)
+    return float(-0.691 + 10 * np.log10(blocks[loudness > threshold].mean()))
+
+
+def analyze_file(path, ffmpeg_exe="ffmpeg"):
+    """
+    Decode one file with ffmpeg and measure it.
+
+    Runs in a worker process. Audio is read and weighted a minute at a time,
+    so memory stays flat however long the track is.
+
+    Returns:
+        dict: "path", "loudness" (LUFS, None if silent), "peak" (sample
+            peak, 1.0 = full scale) and "blocks" (gating block powers, for
+            album loudness); or "path" and "error"
+    """
+    proc = subprocess.Popen(
+        [
+            ffmpeg_exe,
+            "-nostdin",
+            "-v",
+            "error",
+            "-i",
+            path,
+            "-map",
+            "0:a:0",
+            "-ac",
+            str(CHANNELS),
+            "-ar",
+            str(RATE),
+            "-f",
+            "f32le",
+            "-",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    frame_bytes = 4 * CHANNELS
+    chunk = READ_SEGMENTS * SEGMENT * frame_bytes
+    segments = []
+    peak = 0.0
+    tail = b""
+    while True:
+        data = proc.stdout.read(chunk)
+        if not data:
+            break
+        data = tail + data
+        usable = len(data) // (SEGMENT * frame_bytes) * SEGMENT * frame_bytes
+        tail = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype="<f4").reshape(-1, CHANNELS)
+        if len(samples):
+            peak = max(peak, float(np.abs(samples).max()))
+            segments.append(segment_power(samples))
+    stderr = proc.stderr.read().decode("utf-8", "replace")
+    if proc.wait() != 0 or not segments:
+        return {"path": path, "error": stderr.strip() or "no audio decoded"}
+    blocks = block_powers(np.concatenate(segments))
+    return {
+        "path": path,
+        "loudness": gated_loudness(blocks),
+        "peak": peak,
+        "blocks": blocks.astype(np.float32),
+    }
+
+
+def analyze_album(paths, ffmpeg_exe="ffmpeg", workers=None):
+    """
+    Measure a group of files in a process pool.
+
+    Returns:
+        tuple: (results per file as from analyze_file, album loudness in
+            LUFS gated over the blocks of every file, album peak)
+    """
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        results = list(pool.map(analyze_file, paths, [ffmpeg_exe] * len(paths)))
+    measured = [r for r in results if "error" not in r]
+    if not measured:
+        return results, None, None
+    album = gated_loudness(np.concatenate([r["blocks"] for r in measured]))
+    return results, album, max(r["peak"] for r in measured)
+
+
+def replaygain_tags(path, loudness, peak, album_loudness=None, album_peak=None):
+    """
+    Tags for one file: REPLAYGAIN_* (gain to -18 LUFS) for most formats,
+    R128_* (Q7.8 gain to -23 LUFS, as Opus players expect) for Opus.
+    """
+    tags = {}
+    if path.lower().endswith(".opus"):
+        for scope, value in (("TRACK", loudness), ("ALBUM", album_loudness)):
+            if value is not None:
+                gain = round((R128_REFERENCE - value) * 256)
+                tags[f"R128_{scope}_GAIN"] = str(max(-32768, min(32767, gain)))
+        return tags
+    for scope, value, scope_peak in (
+        ("TRACK", loudness, peak),
+        ("ALBUM", album_loudness, album_peak),
+    ):
+        if value is not None:
+            tags[f"REPLAYGAIN_{scope}_GAIN"] = f"{REPLAYGAIN_REFERENCE - value:.2f} dB"
+            tags[f"REPLAYGAIN_{scope}_PEAK"] = f"{scope_peak:.6f}"
+    return tags
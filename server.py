@@ -0,0 +1,379 @@
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import core
+
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+
+class Job:
+    """One submitted playlist, its per-track status and its event log."""
+
+    def __init__(self, job_id, csv_path, sync=False, retry=False):
+        self.id = job_id
+        self.csv_path = csv_path
+        self.sync = sync
+        self.retry = retry
+        self.status = "queued"
+        self.created = time.time()
+        self.finished = None
+        self.progress = {"current": 0, "total": 0, "text": ""}
+        self.tracks = {}
+        self.events = []
+        self.not_found = []
+        self.error = None
+        self.token = core.CancelToken()
+        self.cond = threading.Condition()
+
+    def add_event(self, event):
+        with self.cond:
+            event = dict(event, seq=len(self.events), time=time.time())
+            self.events.append(event)
+            self.cond.notify_all()
+
+    def on_progress(self, current, total, text):
+        self.progress = {"current": current, "total": total, "text": text}
+        self.add_event({"type": "progress", **self.progress})
+
+    def on_track(self, event):
+        self.tracks[event["track"]] = event
+        self.add_event({"type": "track", **event})
+
+    def set_status(self, status, error=None):
+        self.status = status
+        self.error = error
+        if status in FINISHED_STATES:
+            self.finished = time.time()
+        self.add_event({"type": "status", "status": status, "error": error})
+
+    def events_since(self, since, wait=0):
+        """Events with seq >= since, waiting up to ``wait`` seconds for new ones."""
+        with self.cond:
+            finished = self.status in FINISHED_STATES
+            if wait and len(self.events) <= since and not finished:
+                self.cond.wait(wait)
+            return self.events[since:]
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "playlist": os.path.splitext(os.path.basename(self.csv_path))[0],
+            "status": self.status,
+            "sync": self.sync,
+            "retry": self.retry,
+            "created": self.created,
+            "finished": self.finished,
+            "progress": self.progress,
+            "not_found": len(self.not_found),
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs submitted jobs against one shared track pool and search cache.
+
+    Playlist-level work (reading the CSV, waiting on tracks, writing the M3U)
+    runs on a small job pool; the tracks of every job share ``workers``
+    threads so many small submissions do not each pay for their own pool.
+
+    Finished jobs are forgotten, with their uploaded CSV, ``job_ttl`` seconds
+    after they end, or sooner once more than ``max_finished`` have piled up.
+    """
+
+    def __init__(
+        self,
+        output_folder,
+        spool_dir,
+        workers=None,
+        max_jobs=2,
+        job_ttl=3600,
+        max_finished=100,
+    ):
+        self.output_folder = output_folder
+        self.spool_dir = spool_dir
+        self.config = core.load_config()
+        self.config["ffmpeg_path"], self.config["yt_dlp_path"] = core.find_executables(
+            self.config
+        )
+        self.search_cache = core.SearchCache()
+        self.track_pool = ThreadPoolExecutor(
+            max_workers=workers or int(self.config.get("workers") or 1)
+        )
+        self.job_pool = ThreadPoolExecutor(max_workers=max_jobs)
+        self.job_ttl = job_ttl
+        self.max_finished = max_finished
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, name, data, sync=False, retry=False):
+        name = re.sub(r"[^\w\s.-]", "", os.path.basename(name)).strip() or "playlist"
+        if not name.lower().endswith(".csv"):
+            name += ".csv"
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        csv_path = os.path.join(job_dir, name)
+        with open(csv_path, "wb") as f:
+            f.write(data)
+        job = Job(job_id, csv_path, sync=sync, retry=retry)
+        self.evict()
+        with self.lock:
+            self.jobs[job_id] = job
+        self.job_pool.submit(self.run, job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        self.evict()
+        with self.lock:
+            return list(self.jobs.values())
+
+    def evict(self):
+        """Drop finished jobs past their TTL, and the oldest beyond the cap."""
+        with self.lock:
+            finished = sorted(
+                (j for j in self.jobs.values() if j.status in FINISHED_STATES),
+                key=lambda j: j.finished,
+            )
+            expired = [j for j in finished if time.time() - j.finished > self.job_ttl]
+            expired += finished[
+                len(expired) : max(0, len(finished) - self.max_finished)
+            ]
+            for job in expired:
+                del self.jobs[job.id]
+        for job in expired:
+            shutil.rmtree(os.path.dirname(job.csv_path), ignore_errors=True)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED_STATES:
+            job.token.cancel()
+        return job
+
+    def run(self, job):
+        if job.token.cancelled:
+            job.set_status("cancelled")
+            return
+        job.set_status("running")
+        cfg = self.config
+        options = {}
+        if job.retry:
+            convert = core.retry_failures
+        else:
+            convert = core.sync_playlist if job.sync else core.convert_playlist
+            options["deep_search"] = core.config_flag(cfg, "deep_search", True)
+        try:
+            _, job.not_found = convert(
+                job.csv_path,
+                self.output_folder,
+                cfg,
+                transcode_mp3=core.config_flag(cfg, "transcode_mp3"),
+                generate_m3u=core.config_flag(cfg, "generate_m3u", True),
+                exclude_instrumentals=core.config_flag(cfg, "exclude_instrumentals"),
+                progress_callback=job.on_progress,
+                search_cache=self.search_cache,
+                executor=self.track_pool,
+                cancel_token=job.token,
+                event_callback=job.on_track,
+                **options,
+            )
+        except core.Cancelled:
+            job.set_status("cancelled")
+        except Exception as e:
+            traceback.print_exc()
+            job.set_status("failed", error=str(e))
+        else:
+            job.set_status("done")
+
+    def shutdown(self):
+        for job in self.list():
+            job.token.cancel()
+        self.job_pool.shutdown(wait=True)
+        self.track_pool.shutdown(wait=True)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes:
+        POST   /jobs?name=<file.csv>[&sync=1]  body is the CSV; returns the job
+                                               (&retry=1 re-searches only the
+                                               playlist's failed tracks)
+        GET    /jobs                           all jobs
+        GET    /jobs/<id>                      job summary and per-track status
+        GET    /jobs/<id>/events?since=N&wait=S  events from seq N (long poll)
+        GET    /jobs/<id>/stream               events as NDJSON until finished
+        GET    /jobs/<id>/not_found            not-found report as CSV
+        DELETE /jobs/<id>                      cancel (also POST /jobs/<id>/cancel)
+    """
+
+    manager = None
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}")
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if not parts or parts[0] != "jobs":
+            return None, parts, query
+        job = self.manager.get(parts[1]) if len(parts) > 1 else None
+        return job, parts, query
+
+    def do_POST(self):
+        job, parts, query = self.route()
+        if parts == ["jobs"]:
+            length = int(self.headers.get("Content-Length") or 0)
+            data = self.rfile.read(length)
+            if not data:
+                return self.send_json({"error": "empty CSV"}, 400)
+            job = self.manager.submit(
+                query.get("name", "playlist.csv"),
+                data,
+                sync=query.get("sync") in ("1", "true", "yes"),
+                retry=query.get("retry") in ("1", "true", "yes"),
+            )
+            return self.send_json(job.summary(), 201)
+        if len(parts) == 3 and parts[2] == "cancel" and job:
+            self.manager.cancel(job.id)
+            return self.send_json(job.summary(), 202)
+        self.send_json({"error": "not found"}, 404)
+
+    def do_DELETE(self):
+        job, parts, _ = self.route()
+        if len(parts) == 2 and job:
+            self.manager.cancel(job.id)
+            return self.send_json(job.summary(), 202)
+        self.send_json({"error": "not found"}, 404)
+
+    def do_GET(self):
+        job, parts, query = self.route()
+        if parts == ["jobs"]:
+            return self.send_json([j.summary() for j in self.manager.list()])
+        if job is None:
+            return self.send_json({"error": "not found"}, 404)
+        if len(parts) == 2:
+            data = job.summary()
+            data["tracks"] = [job.tracks[k] for k in sorted(job.tracks)]
+            return self.send_json(data)
+        if parts[2] == "events":
+            try:
+                since = int(query.get("since", 0))
+                wait = min(float(query.get("wait", 0)), 60)
+                # "not wait >= 0" also rejects nan
+                if since < 0 or not wait >= 0:
+                    raise ValueError
+            except ValueError:
+                return self.send_json(
+                    {"error": "since and wait must be non-negative numbers"}, 400
+                )
+            return self.send_json(job.events_since(since, wait))
+        if parts[2] == "stream":
+            return self.stream(job)
+        if parts[2] == "not_found":
+            out = io.StringIO()
+            writer = csv.DictWriter(out, fieldnames=core.NOT_FOUND_FIELDS)
+            writer.writeheader()
+            writer.writerows(job.not_found)
+            body = out.getvalue().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_json({"error": "not found"}, 404)
+
+    def stream(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        since = 0
+        try:
+            while True:
+                events = job.events_since(since, wait=15)
+                for event in events:
+                    self.wfile.write(json.dumps(event).encode("utf-8") + b"\n")
+                self.wfile.flush()
+                since += len(events)
+                if job.status in FINISHED_STATES and since >= len(job.events):
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP API for playlist jobs")
+    parser.add_argument("output_folder", help="Folder to write playlists into")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--workers", type=int, help="Parallel tracks (default: config 'workers')"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=2, help="Playlists processed at the same time"
+    )
+    parser.add_argument(
+        "--job-ttl",
+        type=float,
+        default=3600,
+        help="Seconds a finished job stays listed (default: 3600)",
+    )
+    parser.add_argument(
+        "--max-finished",
+        type=int,
+        default=100,
+        help="Finished jobs kept at most, oldest dropped first (default: 100)",
+    )
+    parser.add_argument(
+        "--spool",
+        help="Folder for uploaded CSVs (default: <output_folder>/.jobs)",
+    )
+    args = parser.parse_args()
+    os.makedirs(args.output_folder, exist_ok=True)
+    manager = JobManager(
+        args.output_folder,
+        args.spool or os.path.join(args.output_folder, ".jobs"),
+        workers=args.workers,
+        max_jobs=args.jobs,
+        job_ttl=args.job_ttl,
+        max_finished=args.max_finished,
+    )
+    JobRequestHandler.manager = manager
+    httpd = ThreadingHTTPServer((args.host, args.port), JobRequestHandler)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down")
+    finally:
+        httpd.server_close()
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,209 @@
-from PyQt5 import uic
-from PyQt5.QtCore import QFile, QUrl
+from PyQt5.QtCore import (
+    QAbstractTableModel,
+    QModelIndex,
+    QObject,
+    QRunnable,
+    Qt,
+    QThreadPool,
+    QTimer,
+    QUrl,
+    pyqtSignal,
+)
 from PyQt5.QtGui import QDesktopServices
-from PyQt5.QtWidgets import QApplication, QMainWindow, QFileDialog
+from PyQt5.QtWidgets import QApplication, QMainWindow, QFileDialog, QMessageBox
 import sys
 import os
-import threading
-import subprocess
-import csv
-import re
-import json
+import hashlib
+import importlib.util
+import io
+import multiprocessing
 import time
-import sys
-import zipfile
-import shutil
-from datetime import timedelta
-from mutagen.easyid3 import EasyID3
-from mutagen.mp4 import MP4, MP4Tags
-from pathlib import PureWindowsPath
-import webbrowser
-import platform
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import core
+from trackmodel import COLUMNS, TrackTableModel
+
+SDMW = core.resource_path("gui/qt/MainWindow.ui")
+UI_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "spotdown")
+# Minimum seconds between progress signals from one conversion
+PROGRESS_INTERVAL = 0.1
+
+
+def load_ui_class(ui_path, cache_dir=UI_CACHE_DIR):
+    """
+    Return the form class for ``ui_path``, compiled to a cached Python module.
+
+    The module is named after a hash of the .ui file, so it is only rebuilt
+    (and uic only imported) when the form changes; later launches import the
+    cached module and its bytecode instead of parsing the XML again.
+    """
+    with open(ui_path, "rb") as f:
+        data = f.read()
+    module_name = "ui_" + hashlib.sha1(data).hexdigest()[:16]
+    module_path = os.path.join(cache_dir, module_name + ".py")
+    if not os.path.isfile(module_path):
+        from PyQt5 import uic
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = module_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                uic.compileUi(io.StringIO(data.decode("utf-8")), f)
+            os.replace(tmp, module_path)
+        except OSError:
+            # Read-only home: compile in memory for this launch
+            return uic.loadUiType(io.StringIO(data.decode("utf-8")))[0]
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.Ui_MainWindow
+
+
+Ui_MainWindow = load_ui_class(SDMW)
+
+
+class TrackQtModel(QAbstractTableModel):
+    """
+    Qt view of a TrackTableModel.
+
+    QTableView only asks for the cells it paints, so the row count costs
+    nothing by itself; changes are folded in by ``apply`` from any thread and
+    published every ``FLUSH_MS`` as one dataChanged per contiguous run.
+    """
+
+    FLUSH_MS = 100
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tracks = TrackTableModel()
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.FLUSH_MS)
+        self.timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.tracks)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return self.tracks.values(index.row())[index.column()]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def reset(self, titles):
+        self.beginResetModel()
+        self.tracks.reset(titles)
+        self.tracks.take_dirty()
+        self.endResetModel()
+        self.timer.start()
+
+    def apply(self, event):
+        self.tracks.apply(event)
+
+    def flush(self):
+        dirty = self.tracks.take_dirty()
+        last = len(COLUMNS) - 1
+        start = prev = None
+        for row in dirty + [None]:
+            if start is not None and row != prev + 1:
+                self.dataChanged.emit(self.index(start, 0), self.index(prev, last))
+                start = None
+            if start is None:
+                start = row
+            prev = row
+
+
+class ConversionSignals(QObject):
+    # Emitted from pool threads; Qt queues them onto the GUI thread
+    progress = pyqtSignal(int, int, int, str)
+    finished = pyqtSignal(int, list, list)
+    cancelled = pyqtSignal(int)
+    failed = pyqtSignal(int, str)
 
-SDMW = "gui/qt/MainWindow.ui"
 
+class ConversionTask(QRunnable):
+    """
+    Runs ``core.convert_playlist`` for one CSV on a QThreadPool thread.
 
-def resource_path(relative_path):
-    if hasattr(sys, "_MEIPASS"):
-        return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.abspath("."), relative_path)
+    Track events go straight into the shared table model (its ``apply`` is
+    thread-safe and the view polls it); progress is throttled to one signal
+    per ``PROGRESS_INTERVAL`` so large playlists don't flood the event loop.
+    """
 
+    def __init__(
+        self, job_id, csv_path, output_folder, config, options, row_offset, window
+    ):
+        super().__init__()
+        self.job_id = job_id
+        self.csv_path = csv_path
+        self.output_folder = output_folder
+        self.config = config
+        self.options = options
+        self.row_offset = row_offset
+        self.track_model = window.track_model
+        self.search_cache = window.search_cache
+        self.executor = window.executor
+        self.token = core.CancelToken()
+        self.signals = ConversionSignals()
+        self.last_progress = 0
 
-CONFIG_FILE = resource_path("config.json")
+    def on_progress(self, current, total, text):
+        now = time.monotonic()
+        if current < total and now - self.last_progress < PROGRESS_INTERVAL:
+            return
+        self.last_progress = now
+        self.signals.progress.emit(self.job_id, current, total, text)
 
+    def on_track(self, event):
+        self.track_model.apply(dict(event, track=event["track"] + self.row_offset))
 
-def load_config():
-    default = {
-        "variants": [],
-        "duration_min": 30,
-        "duration_max": 600,
-        "transcode_mp3": "false",
-        "generate_m3u": "true",
-        "exclude_instrumentals": "false",
-    }
-    if os.path.isfile(CONFIG_FILE):
+    def run(self):
         try:
-            with open(CONFIG_FILE, "r") as f:
-                cfg = json.load(f)
-                return {**default, **cfg}
-        except:
-            return default
-    return default
+            downloaded, not_found = core.convert_playlist(
+                self.csv_path,
+                self.output_folder,
+                self.config,
+                progress_callback=self.on_progress,
+                search_cache=self.search_cache,
+                executor=self.executor,
+                cancel_token=self.token,
+                event_callback=self.on_track,
+                **self.options,
+            )
+        except core.Cancelled:
+            self.signals.cancelled.emit(self.job_id)
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.failed.emit(self.job_id, str(e))
+        else:
+            self.signals.finished.emit(self.job_id, downloaded, not_found)
 
 
-class SpotDownMainWindow(QMainWindow):
+class SpotDownMainWindow(QMainWindow, Ui_MainWindow):
     def __init__(self):
         super().__init__()
-        print(CONFIG_FILE)
-        uic.loadUi(SDMW, self)
+        self.setupUi(self)
+
+        self.config = core.load_config()
+        # Playlists run side by side on the Qt pool; their tracks share one
+        # executor and search cache so concurrent jobs don't multiply threads
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(int(self.config.get("jobs") or 2))
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(self.config.get("workers") or 1)
+        )
+        self.search_cache = core.SearchCache()
+        self.tasks = {}
+        self.progress = {}
+        self.csv_paths = []
+        self.not_found_count = 0
 
         self.init_ui()
         self.show()
@@ -64,11 +212,20 @@ class SpotDownMainWindow(QMainWindow):
         self.OutputFolderLabel.hide()
         self.ConversionProgressLabel.hide()
         self.ConversionProgressBar.hide()
+        self.OpenOutputFolder.hide()
+
+        self.track_model = TrackQtModel(self)
+        self.TrackTable.setModel(self.track_model)
+        self.TrackTable.verticalHeader().setDefaultSectionSize(22)
 
         self.ExportifyButton.clicked.connect(self.open_exportify)
         self.TuneMyMusicButton.clicked.connect(self.open_tunemymusic)
         self.LoadFilePath.clicked.connect(self.load_file_path)
         self.ChooseOutputFolderButton.clicked.connect(self.choose_output_folder)
+        self.ConvertPlaylistButton.clicked.connect(self.toggle_conversion)
+        self.OpenOutputFolder.clicked.connect(self.open_output_folder)
+        self.EmbedThumbnailsCheckbox.toggled.connect(self.update_artwork_options)
+        self.EmbedSpotifyAlbumCheckbox.toggled.connect(self.update_artwork_options)
 
     def choose_output_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Select Output Folder", "")
@@ -77,11 +234,135 @@ class SpotDownMainWindow(QMainWindow):
             self.OutputFolderLabel.show()
 
     def load_file_path(self):
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, "Select Playlist File", "", "All Files (*)"
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "Select Playlist Files", "", "CSV Files (*.csv);;All Files (*)"
+        )
+        if file_paths:
+            self.FilenameInput.setText("; ".join(file_paths))
+
+    def update_artwork_options(self):
+        # Thumbnail and Spotify art embedding are mutually exclusive
+        self.EmbedSpotifyAlbumCheckbox.setEnabled(
+            not self.EmbedThumbnailsCheckbox.isChecked()
+        )
+        self.EmbedThumbnailsCheckbox.setEnabled(
+            not self.EmbedSpotifyAlbumCheckbox.isChecked()
+        )
+
+    def toggle_conversion(self):
+        if self.tasks:
+            self.cancel_conversions()
+        else:
+            self.start_conversions()
+
+    def start_conversions(self):
+        csv_paths = [
+            p.strip() for p in self.FilenameInput.text().split(";") if p.strip()
+        ]
+        output_folder = self.OutputFolderLabel.text()
+        if not csv_paths or self.OutputFolderLabel.isHidden():
+            QMessageBox.critical(self, "Error", "Select CSV and output folder.")
+            return
+
+        titles = []
+        offsets = []
+        counts = []
+        for csv_path in csv_paths:
+            try:
+                rows = core.read_rows(csv_path)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Could not read {csv_path}:\n{e}")
+                return
+            name = os.path.splitext(os.path.basename(csv_path))[0]
+            offsets.append(len(titles))
+            counts.append(len(rows))
+            titles += [core.track_info(row, name)["title"] for row in rows]
+        self.track_model.reset(titles)
+
+        cfg = self.config
+        options = {
+            "deep_search": core.config_flag(cfg, "deep_search", True),
+            "transcode_mp3": core.config_flag(cfg, "transcode_mp3"),
+            "generate_m3u": core.config_flag(cfg, "generate_m3u", True),
+            "exclude_instrumentals": core.config_flag(cfg, "exclude_instrumentals"),
+            "embed_thumbnails": self.EmbedThumbnailsCheckbox.isChecked(),
+            "spotify_art": self.EmbedSpotifyAlbumCheckbox.isChecked(),
+        }
+        self.csv_paths = csv_paths
+        self.progress = {}
+        self.not_found_count = 0
+        for job_id, csv_path in enumerate(csv_paths):
+            task = ConversionTask(
+                job_id, csv_path, output_folder, cfg, options, offsets[job_id], self
+            )
+            task.signals.progress.connect(self.show_progress)
+            task.signals.finished.connect(self.on_finished)
+            task.signals.cancelled.connect(self.on_cancelled)
+            task.signals.failed.connect(self.on_failed)
+            self.tasks[job_id] = task
+            self.progress[job_id] = (0, counts[job_id])
+            self.pool.start(task)
+
+        self.ConvertPlaylistButton.setText("Cancel")
+        self.ConversionProgressBar.setMaximum(max(len(titles), 1))
+        self.ConversionProgressBar.setValue(0)
+        self.ConversionProgressBar.show()
+        self.ConversionProgressLabel.setText(
+            f"Starting {len(csv_paths)} playlist(s)..."
+        )
+        self.ConversionProgressLabel.show()
+        self.OpenOutputFolder.hide()
+
+    def cancel_conversions(self):
+        for task in self.tasks.values():
+            task.token.cancel()
+        self.ConversionProgressLabel.setText("Cancelling...")
+
+    def show_progress(self, job_id, current, total, text):
+        self.progress[job_id] = (current, total)
+        self.ConversionProgressBar.setValue(sum(c for c, _ in self.progress.values()))
+        if len(self.progress) > 1:
+            text = f"{self.playlist_name(job_id)}: {text}"
+        self.ConversionProgressLabel.setText(text)
+
+    def on_finished(self, job_id, downloaded, not_found):
+        total = self.progress[job_id][1]
+        self.progress[job_id] = (total, total)
+        self.ConversionProgressBar.setValue(sum(c for c, _ in self.progress.values()))
+        self.not_found_count += len(not_found)
+        self.job_done(job_id)
+
+    def on_cancelled(self, job_id):
+        self.job_done(job_id, "Conversion cancelled")
+
+    def on_failed(self, job_id, error):
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Conversion of {self.playlist_name(job_id)} failed:\n{error}",
+        )
+        self.job_done(job_id, "Conversion failed")
+
+    def playlist_name(self, job_id):
+        return os.path.splitext(os.path.basename(self.csv_paths[job_id]))[0]
+
+    def job_done(self, job_id, text=None):
+        self.tasks.pop(job_id, None)
+        if self.tasks:
+            return
+        self.track_model.flush()
+        self.track_model.timer.stop()
+        self.ConvertPlaylistButton.setText("Convert Playlist")
+        self.ConversionProgressLabel.setText(
+            text or f"Conversion completed, {self.not_found_count} not found"
         )
-        if file_path:
-            self.FilenameInput.setText(file_path)
+        self.OpenOutputFolder.show()
+
+    def open_output_folder(self):
+        folder = self.OutputFolderLabel.text()
+        if len(self.csv_paths) == 1:
+            folder = os.path.join(folder, self.playlist_name(0))
+        QDesktopServices.openUrl(QUrl.fromLocalFile(folder))
 
     def open_exportify(self):
         url = QUrl("https://exportify.net/")
@@ -91,8 +372,17 @@ class SpotDownMainWindow(QMainWindow):
         url = QUrl("https://www.tunemymusic.com/")
         QDesktopServices.openUrl(url)
 
+    def closeEvent(self, event):
+        # Stop running downloads so pool threads don't keep the process alive
+        self.cancel_conversions()
+        self.pool.waitForDone(5000)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        super().closeEvent(event)
+
 
 if __name__ == "__main__":
+    # Loudness analysis runs in worker processes, which frozen builds re-enter
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     window = SpotDownMainWindow()
@@ -2,17 +2,15 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
 import threading
+import queue
+import multiprocessing
 import subprocess
-import csv
-import re
 import json
 import time
 import sys
-import zipfile
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from mutagen.easyid3 import EasyID3
-from mutagen.mp4 import MP4, MP4Tags
 from tkinter import ttk
 # Optional drag & drop support import
 try:
@@ -22,37 +20,22 @@ except ImportError:
     _tkdnd_imported = False
 # Will determine DND availability at runtime
 DND_AVAILABLE = False
-from pathlib import PureWindowsPath
-import webbrowser
 import platform
+import core
+from trackmodel import COLUMNS, TrackTableModel
 
 DEFAULT_DROP_BG = '#e0e0e0'
 LOADED_DROP_BG  = '#c0ffc0'
+EVENT_PUMP_MS = 50  # GUI refresh interval while converting (20 fps)
 
 def resource_path(relative_path):
     if hasattr(sys, '_MEIPASS'):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath('.'), relative_path)
 
-CONFIG_FILE = resource_path('config.json')
-
-def load_config():
-    default = {
-        "variants": [],
-        "duration_min": 30,
-        "duration_max": 600,
-        "transcode_mp3": "false",
-        "generate_m3u": "true",
-        "exclude_instrumentals": "false"
-    }
-    if os.path.isfile(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                cfg = json.load(f)
-                return {**default, **cfg}
-        except:
-            return default
-    return default
+def open_url(url):
+    import webbrowser  # only needed when a link is clicked
+    webbrowser.open(url)
 
 
 class Tooltip:
@@ -77,15 +60,87 @@ class Tooltip:
             self.tip.destroy()
             self.tip = None
 
+class VirtualTrackTable(tk.Frame):
+    """Treeview that shows a TrackTableModel through a fixed set of row slots.
+
+    Only the rows in view exist as Tk items; scrolling re-fills the same slots,
+    so a 10k-track playlist costs the same to draw as a 10-track one.
+    """
+    WIDTHS = (40, 150, 80, 120, 70, 120)
+
+    def __init__(self, master, model, visible_rows=10):
+        super().__init__(master)
+        self.model = model
+        self.visible_rows = visible_rows
+        self.offset = 0
+        self.slots = []
+        self.tree = ttk.Treeview(self, columns=COLUMNS, show='headings', height=visible_rows, selectmode='none')
+        for col, width in zip(COLUMNS, self.WIDTHS):
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, minwidth=30, stretch=col in ('Title', 'Match', 'Error'))
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.on_scroll)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+        self.tree.bind('<MouseWheel>', self.on_wheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll_to(self.offset - 3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_to(self.offset + 3))
+
+    def render(self):
+        count = max(0, min(self.visible_rows, len(self.model) - self.offset))
+        while len(self.slots) < count:
+            self.slots.append(self.tree.insert('', 'end'))
+        while len(self.slots) > count:
+            self.tree.delete(self.slots.pop())
+        for k, iid in enumerate(self.slots):
+            self.tree.item(iid, values=self.model.values(self.offset + k))
+        total = len(self.model)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def refresh(self, dirty):
+        """Redraw the changed rows that are currently in view."""
+        if len(self.slots) != max(0, min(self.visible_rows, len(self.model) - self.offset)):
+            return self.render()
+        for index in dirty:
+            k = index - self.offset
+            if 0 <= k < len(self.slots):
+                self.tree.item(self.slots[k], values=self.model.values(index))
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.model) - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * len(self.model)))
+        elif action == 'scroll':
+            step = self.visible_rows if unit == 'pages' else 1
+            self.scroll_to(self.offset + int(amount) * step)
+
+    def on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        steps = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        self.scroll_to(self.offset - steps * 3)
+
+
 class Spotify2MP3GUI:
     def __init__(self, root):
         self.root = root
         self.root.title('Spotify2MP3')
-        self.root.geometry('540x650')
+        self.root.geometry('560x860')
         self.root.minsize(300, 500)
         self.csv_path = None
         self.output_folder = None
         self.last_output_dir = None
+        self.cancel_token = None
+        self.executor = None
+        self.events = queue.Queue()
+        self.initial_state = None
+        self.completed = 0
         self.deep_search_var = tk.BooleanVar(value=True)
         
         # Set initial directory to Downloads folder
@@ -94,10 +149,11 @@ class Spotify2MP3GUI:
         else:
             self.last_directory = os.path.expanduser("~/Downloads")
             
-        self.config = load_config()
+        self.config = core.load_config()
         self.exclude_instr_var = tk.BooleanVar(value=self.config.get("exclude_instrumentals", False))
 
         self.setup_ui()
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
         if sys.platform == 'darwin':
             icon_path = resource_path('icon.icns')  # macOS icon
         elif sys.platform.startswith('linux'):
@@ -132,11 +188,11 @@ class Spotify2MP3GUI:
         instr = tk.Label(self.root, text='Download Spotify CSV via Exportify: https://exportify.net/', fg='blue', cursor='hand2',font=("Arial", 12))
         Tooltip(instr, 'Use this link for downloading Spotify playlists.')
         instr.pack(fill='x', padx=20)
-        instr.bind('<Button-1>', lambda e: webbrowser.open('https://exportify.net/'))
+        instr.bind('<Button-1>', lambda e: open_url('https://exportify.net/'))
         instr2 = tk.Label(self.root, text='Download other CSVs (Apple Music, Youtube Music, etc) \n via TuneMyMusic: https://tunemymusic.com/transfer/', fg='blue', cursor='hand2',font=("Arial", 12))
         Tooltip(instr2, 'Use this link for downloading from any other platform or for Spotify albums')
         instr2.pack(fill='x', padx=20)
-        instr2.bind('<Button-1>', lambda e: webbrowser.open('https://www.tunemymusic.com/transfer/apple-music-to-file'))
+        instr2.bind('<Button-1>', lambda e: open_url('https://www.tunemymusic.com/transfer/apple-music-to-file'))
 
         # CSV Input
         tk.Label(self.root, text='1) Drag and drop CSV File:', anchor='w').pack(fill='x', padx=20)
@@ -194,22 +250,9 @@ class Spotify2MP3GUI:
 
         # Spotify album art option
         self.spotify_art_var = tk.BooleanVar(value=False)
-        self.spotify_art_check = tk.Checkbutton(self.root, text='Get and embed album art from Spotify link (Requires Chrome or Firefox)', variable=self.spotify_art_var, command=self.update_artwork_options)
+        self.spotify_art_check = tk.Checkbutton(self.root, text='Embed Spotify album art', variable=self.spotify_art_var, command=self.update_artwork_options)
         self.spotify_art_check.pack(pady=2)
-        Tooltip(self.spotify_art_check, 'Download album art from Spotify using spotifycover.art')
-        
-        # Spotify link input
-        self.spotify_link_frame = tk.Frame(self.root)
-        self.spotify_link_frame.pack(fill='x', padx=20)
-        self.spotify_link_label = tk.Label(self.spotify_link_frame, text='Spotify Link:')
-        self.spotify_link_label.pack(side='left')
-        self.spotify_link_entry = tk.Entry(self.spotify_link_frame)
-        self.spotify_link_entry.pack(side='left', fill='x', expand=True, padx=(5,0))
-        self.spotify_link_entry.insert(0, 'https://open.spotify.com/playlist/')
-        self.spotify_link_frame.pack_forget()
-        self.spotify_link_entry.config(state='normal')
-        self.spotify_art_var.trace_add('write', self.toggle_spotify_link)
-        Tooltip(self.spotify_link_entry, 'Enter Spotify playlist/album link')
+        Tooltip(self.spotify_art_check, "Download each album's cover from the image links in the CSV (Exportify's Album Image URL).")
 
 
 
@@ -225,6 +268,18 @@ class Spotify2MP3GUI:
         self.convert_button = tk.Button(self.root, text='Convert Playlist', command=self.start_conversion, state=tk.DISABLED, font=('Arial', 14) )
         self.convert_button.pack(pady=10)
 
+        # Pause / cancel a running conversion
+        run_frame = tk.Frame(self.root)
+        run_frame.pack()
+        self.pause_button = tk.Button(run_frame, text='Pause', command=self.toggle_pause, state=tk.DISABLED)
+        self.pause_button.pack(side='left', padx=5)
+        self.cancel_button = tk.Button(run_frame, text='Cancel', command=self.cancel_conversion, state=tk.DISABLED)
+        self.cancel_button.pack(side='left', padx=5)
+        Tooltip(self.cancel_button, 'Stop the conversion and any running downloads.')
+        self.retry_button = tk.Button(run_frame, text='Retry Not Found', command=lambda: self.start_conversion(retry=True), state=tk.DISABLED)
+        self.retry_button.pack(side='left', padx=5)
+        Tooltip(self.retry_button, 'Search again, more widely, for the tracks that were not found.')
+
 
         # Actions
         tk.Label(self.root, text='4) Actions:', anchor='w').pack(fill='x', padx=20, pady=(10,0))
@@ -236,6 +291,13 @@ class Spotify2MP3GUI:
         self.progress = ttk.Progressbar(self.root, orient='horizontal', length=500, mode='determinate')
         self.progress.pack(pady=10)
 
+        # Per-track status
+        self.track_model = TrackTableModel()
+        self.track_table = VirtualTrackTable(self.root, self.track_model)
+        self.track_table.pack(fill='both', expand=True, padx=20)
+        self.track_summary = tk.Label(self.root, text='', anchor='w')
+        self.track_summary.pack(fill='x', padx=20)
+
         #output folder
         self.open_folder_button = tk.Button(self.root, text='Open Output Folder', command=self.open_output_folder)
         self.open_folder_button.pack(pady=5)
@@ -246,17 +308,6 @@ class Spotify2MP3GUI:
         self.quality_check.pack_forget()
         self.m3u_check.pack_forget()
 
-    def toggle_spotify_link(self, *args):
-        if self.spotify_art_var.get():
-            self.spotify_link_frame.pack(
-                fill='x',
-                padx=20,
-                pady=(0, 10),
-                after=self.spotify_art_check
-            )
-        else:
-            self.spotify_link_frame.pack_forget()
-
     def open_settings(self):
         win = tk.Toplevel(self.root)
         win.title("Settings")
@@ -301,17 +352,22 @@ class Spotify2MP3GUI:
         def save():
             try:
                 variants = [v.strip() for v in variants_str.get().split(",") if v.strip()]
-                cfg = {
+                # Keep settings the dialog doesn't show (workers, caches, paths)
+                cfg = {}
+                if os.path.isfile(core.CONFIG_FILE):
+                    with open(core.CONFIG_FILE, "r") as f:
+                        cfg = json.load(f)
+                cfg.update({
                     "variants": variants,
                     "duration_min": int(min_var.get()),
                     "duration_max": int(max_var.get()),
                     "transcode_mp3": self.mp3_var.get(),
                     "generate_m3u": self.m3u_var.get(),
                     "exclude_instrumentals": self.exclude_instr_var.get()
-                }
-                with open(CONFIG_FILE, "w") as f:
+                })
+                with open(core.CONFIG_FILE, "w") as f:
                     json.dump(cfg, f, indent=4)
-                self.config = load_config()
+                self.config = core.load_config()
                 win.destroy()
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save settings:\n{e}")
@@ -370,14 +426,51 @@ class Spotify2MP3GUI:
         else:
             messagebox.showerror('Error', 'No valid folder to open.')
 
-    def start_conversion(self):
+    def start_conversion(self, retry=False):
         if not (self.csv_path and self.output_folder):
             messagebox.showerror('Error', 'Select CSV and output folder.')
             return
+        self.initial_state = {
+            'cursor': self.root.cget('cursor'),
+            'convert_button_state': self.convert_button.cget('state'),
+            'clear_button_state': self.clear_button.cget('state'),
+            'progress_value': self.progress['value'],
+            'status_text': self.status_label.cget('text')
+        }
+        # Tk variables may only be read on this thread, so snapshot them here
+        options = {
+            'deep_search': self.deep_search_var.get(),
+            'transcode_mp3': self.mp3_var.get(),
+            'generate_m3u': self.m3u_var.get(),
+            'exclude_instrumentals': self.exclude_instr_var.get(),
+            'embed_thumbnails': self.thumb_var.get(),
+            'spotify_art': self.spotify_art_var.get(),
+        }
+        if retry:
+            # retry_failures always deep-searches and leaves artwork alone
+            del options['deep_search'], options['spotify_art']
+        playlist_name = os.path.splitext(os.path.basename(self.csv_path))[0]
+        self.last_output_dir = os.path.join(self.output_folder, playlist_name)
+        try:
+            rows = core.read_rows(self.csv_path)
+        except Exception as e:
+            messagebox.showerror('Error', f'Could not read CSV:\n{e}')
+            return
+        self.track_model.reset([core.track_info(row, playlist_name)['title'] for row in rows])
+        self.track_table.scroll_to(0)
+        self.track_table.render()
+        self.track_model.take_dirty()
         self.convert_button.config(state=tk.DISABLED)
         self.clear_button.config(state=tk.DISABLED)
+        self.retry_button.config(state=tk.DISABLED)
         self.root.config(cursor='watch')
-        threading.Thread(target=self.convert_playlist, daemon=True).start()
+        self.cancel_token = core.CancelToken()
+        self.completed = 0
+        self.progress['value'] = 0
+        self.cancel_button.config(state=tk.NORMAL)
+        self.pause_button.config(state=tk.NORMAL, text='Pause')
+        threading.Thread(target=self.convert_playlist, args=(self.csv_path, self.output_folder, options, retry), daemon=True).start()
+        self.root.after(EVENT_PUMP_MS, self.drain_events)
 
     def handle_drop(self, event):
         path = event.data.strip('{}')
@@ -389,512 +482,151 @@ class Spotify2MP3GUI:
             self.drop_label.config(bg=LOADED_DROP_BG)
             self.update_convert_button_state()
 
-    def get_file_timestamps(self, file_path):
-        return {
-            'created': os.path.getctime(file_path),
-            'modified': os.path.getmtime(file_path)
-        }
-
-    def set_file_timestamps(self, file_path, timestamps):
-        os.utime(file_path, (timestamps['modified'], timestamps['modified']))
-        # Note: Creation time can't be directly set on Unix systems, but we preserve it where possible
-
-    def embed_artwork(self, audio_file, jpg_file):
-        print(f"\nEmbedding artwork for: {audio_file}")
-        print(f"Using artwork: {jpg_file}")
-        
-        # Save original timestamps
-        timestamps = self.get_file_timestamps(audio_file)
-        
-        # Create temp file in the same directory as the audio file
-        audio_dir = os.path.dirname(audio_file)
-        audio_filename = os.path.basename(audio_file)
-        temp_output = os.path.join(audio_dir, f"temp_{audio_filename}")
-        
-        # Get the correct ffmpeg path
-        if platform.system() == "Darwin":  # macOS
-            ffmpeg_path = resource_path("ffmpeg")
-            ffmpeg_exe = os.path.join(ffmpeg_path, "ffmpeg")
-        elif platform.system() == "Linux":
-            ffmpeg_exe = "ffmpeg"
-        else:
-            ffmpeg_path = resource_path("ffmpeg")
-            ffmpeg_exe = os.path.join(ffmpeg_path, "ffmpeg.exe" if platform.system() == "Windows" else "ffmpeg")
-        cmd = [
-            ffmpeg_exe, '-i', audio_file,
-            '-i', jpg_file,
-            '-map', '0:a',
-            '-map', '1:v',
-            '-c:a', 'copy',
-            '-c:v', 'mjpeg',
-            '-disposition:v:0', 'attached_pic',
-            temp_output
-        ]
-        try:
-            creationflags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-            subprocess.run(cmd, check=True, capture_output=True, creationflags=creationflags)
-            os.replace(temp_output, audio_file)
-            # Restore original timestamps
-            self.set_file_timestamps(audio_file, timestamps)
-            print(f"Successfully embedded artwork for {audio_file}")
-        except subprocess.CalledProcessError as e:
-            print(f"Error processing {audio_file}: {e.stderr.decode()}")
-            if os.path.exists(temp_output):
-                os.remove(temp_output)
-
-    def get_modified_time(self, file_path):
-        return os.path.getmtime(file_path)
-
-    def clean_filename_for_artwork(self, filename):
-        # Remove file extension
-        filename = os.path.splitext(filename)[0]
-        return filename
-
-    def get_jpg_number(self, filename):
-        # Extract the number prefix from jpg files (e.g., "1_" or "42_")
-        match = re.match(r'^(\d+)_', filename)
-        return int(match.group(1)) if match else float('inf')
-
-    def rename_album_art(self, output_dir, not_found_songs=None):
-        if not_found_songs is None:
-            not_found_songs = []
-            
-        # Create a set of failed song track numbers for faster lookup
-        failed_track_numbers = {song['Track Number'] for song in not_found_songs}
-        
-        # Get all audio files (MP3 and M4A) and JPG files
-        audio_files = [f for f in os.listdir(output_dir) if f.lower().endswith(('.mp3', '.m4a'))]
-        jpg_files = [f for f in os.listdir(output_dir) if f.endswith('.jpg')]
-        
-        # Sort audio files by creation time (date added)
-        audio_files.sort(key=lambda x: os.path.getctime(os.path.join(output_dir, x)))
-        
-        # Sort JPG files by their number prefix
-        jpg_files.sort(key=self.get_jpg_number)
-        
-        # Make sure we have the same number of files
-        if len(audio_files) != len(jpg_files):
-            print(f"Warning: Number of files doesn't match! Audio files: {len(audio_files)}, JPG: {len(jpg_files)}")
-            print("Will process as many files as possible.")
-        
-        # Process files in pairs
-        i = 0
-        while i < len(audio_files) and i < len(jpg_files):
-            audio_file = audio_files[i]
-            jpg_file = jpg_files[i]
-            
-            # Get the track number from the JPG filename
-            jpg_number = self.get_jpg_number(jpg_file)
-            
-            # Skip if this track number was in the failed songs list
-            if jpg_number in failed_track_numbers:
-                # Remove only the JPG file from the list
-                jpg_files.pop(i)
-                continue
-                
-            # Generate new jpg filename based on audio filename
-            new_jpg_name = self.clean_filename_for_artwork(audio_file) + '.jpg'
-            print(f"New JPG name: {new_jpg_name}")
-            
-            try:
-                os.rename(
-                    os.path.join(output_dir, jpg_file),
-                    os.path.join(output_dir, new_jpg_name)
-                )
-                print(f"Successfully renamed {jpg_file} to {new_jpg_name}")
-            except Exception as e:
-                print(f"Error renaming file: {e}")
-            
-            i += 1
-
-    def embed_all_artwork(self, output_dir, not_found_songs=None):
-        """Embed artwork for all audio files, skipping songs that weren't found"""
-        if not_found_songs is None:
-            not_found_songs = []
-            
-        print("\n=== Starting metadata and artwork embedding process ===")
-        print(f"Number of not found songs: {len(not_found_songs)}")
-        if not_found_songs:
-            print("Not found songs:")
-            for song in not_found_songs:
-                print(f"  Track {song['Track Number']}: {song['Track Name']} by {song['Artist Name(s)']}")
-            
-        # Create a set of failed song track numbers for faster lookup
-        failed_track_numbers = {song['Track Number'] for song in not_found_songs}
-        print(f"Failed track numbers: {failed_track_numbers}")
-        
-        # Read CSV file once and store in memory
-        csv_data = []
-        try:
-            with open(self.csv_path, 'r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                # Filter out failed tracks from CSV data
-                csv_data = [row for i, row in enumerate(reader, 1) if i not in failed_track_numbers]
-                print(f"\nLoaded {len(csv_data)} entries from CSV file (excluding failed tracks)")
-                print("First few CSV entries:")
-                for i, row in enumerate(csv_data[:3]):
-                    print(f"Entry {i+1}:")
-                    print(f"  Title: {row.get('Track Name') or row.get('Track name')}")
-                    print(f"  Artist: {row.get('Artist Name(s)') or row.get('Artist name')}")
-                    print(f"  Album: {row.get('Album Name') or row.get('Album')}")
-        except Exception as e:
-            print(f"Error reading CSV file: {str(e)}")
-            return
-        
-        # Get all audio files (both M4A and MP3) and JPG files
-        audio_files = [f for f in os.listdir(output_dir) if f.lower().endswith(('.m4a', '.mp3'))]
-        jpg_files = [f for f in os.listdir(output_dir) if f.endswith('.jpg')]
-        
-        print(f"\nFound {len(audio_files)} audio files and {len(jpg_files)} JPG files")
-        
-        # Sort audio files by creation time (date added)
-        audio_files.sort(key=lambda x: os.path.getctime(os.path.join(output_dir, x)))
-        
-        print("\nAudio files sorted by creation time:")
-        for i, f in enumerate(audio_files):
-            print(f"{i+1}. {f}")
-            
-        print("\nJPG files:")
-        for i, f in enumerate(jpg_files):
-            print(f"{i+1}. {f}")
-        
-        # Process files in pairs
-        csv_index = 0  # Separate index for CSV data
-        for audio_file in audio_files:
-            print(f"\nProcessing audio file: {audio_file}")
-            
-            # Find matching JPG file by base name
-            audio_base = os.path.splitext(audio_file)[0]
-            matching_jpg = None
-            for jpg_file in jpg_files:
-                jpg_base = os.path.splitext(jpg_file)[0]
-                if jpg_base == audio_base:
-                    matching_jpg = jpg_file
-                    break
-            
-            if matching_jpg:
-                print(f"Found matching JPG: {matching_jpg}")
-                try:
-                    audio_path = os.path.join(output_dir, audio_file)
-                    jpg_path = os.path.join(output_dir, matching_jpg)
-                    
-                    # Get metadata from CSV in the same order
-                    if csv_index < len(csv_data):
-                        row = csv_data[csv_index]
-                        title = row.get('Track Name') or row.get('Track name') or 'Unknown'
-                        artist = row.get('Artist Name(s)') or row.get('Artist name') or 'Unknown'
-                        album = row.get('Album Name') or row.get('Album') or 'Unknown'
-                        print(f"\nUsing metadata from CSV (row {csv_index+1}):")
-                        print(f"  Title: {title}")
-                        print(f"  Artist: {artist}")
-                        print(f"  Album: {album}")
-                        csv_index += 1
-                    else:
-                        print(f"No matching artwork found for {audio_file} (expected {jpg_file})")
-                        title = os.path.splitext(audio_file)[0]
-                        artist = 'Unknown Artist'
-                        album = 'Unknown Album'
-                        print(f"\nNo matching CSV row found, using defaults:")
-                        print(f"  Title: {title}")
-                        print(f"  Artist: {artist}")
-                        print(f"  Album: {album}")
-                    
-                    if audio_file.lower().endswith('.m4a'):
-                        print("\nEmbedding metadata for M4A file...")
-                        audio = MP4(audio_path)
-                        tags = audio.tags or MP4Tags()
-                        tags['\xa9nam'] = [title]  # Title
-                        tags['\xa9ART'] = [artist]  # Artist
-                        tags['\xa9alb'] = [album]  # Album
-                        audio.save()
-                        print("M4A metadata embedded successfully")
-                    else:  # MP3
-                        print("\nEmbedding metadata for MP3 file...")
-                        try:
-                            audio = EasyID3(audio_path)
-                        except:
-                            audio = EasyID3()
-                        audio['title'] = title
-                        audio['artist'] = artist 
-                        audio['album'] = album
-                        audio.save()
-                        print("MP3 metadata embedded successfully")
-                    
-                    # Embed artwork
-                    print(f"\nEmbedding artwork from: {matching_jpg}")
-                    self.embed_artwork(audio_path, jpg_path)
-                    
-                except Exception as e:
-                    print(f"Error processing {audio_file}: {str(e)}")
-            else:
-                print(f"No matching JPG file found for {audio_file}")
-            
-            print(f"=== Finished processing {audio_file} ===\n")
-    
-
-    def convert_playlist(self):
-        
-        def normalize(text: str) -> str:
-            """Lowercase and strip out any punctuation, leaving only word chars and spaces."""
-            return re.sub(r"[^\w\s]", "", text.lower())
-
-        def contains_keywords_in_order(candidate_title: str, keywords: list[str]) -> bool:
-            txt = normalize(candidate_title)
-            pos = 0
-            for kw in keywords:
-                idx = txt.find(kw, pos)
-                if idx < 0:
-                    return False
-                pos = idx + len(kw)
-            return True
-
+    def convert_playlist(self, csv_path, output_folder, options, retry=False):
+        """Runs on the worker thread: never touches Tk, only posts to self.events."""
+        post = self.events.put
         start_time = time.time()
-        # Load duration filters from settings
-        duration_min = self.config.get("duration_min", 0)
-        duration_max = self.config.get("duration_max", float("inf"))
-        self.status_label.config(text='Starting conversion...')
-        playlist_name = os.path.splitext(os.path.basename(self.csv_path))[0]
-        output_dir = os.path.join(self.output_folder, playlist_name)
-        os.makedirs(output_dir, exist_ok=True)
-        self.last_output_dir = output_dir
-
-        cookies_path = self.config.get('cookies_path')
-        if cookies_path and not os.path.isfile(cookies_path):
-            messagebox.showerror('Missing Cookies', f'Cookies file not found: {cookies_path}')
-            return
-
-        downloaded = []
-        not_found_songs = []
-        initial_state = {
-            'cursor': self.root.cget('cursor'),
-            'convert_button_state': self.convert_button.cget('state'),
-            'clear_button_state': self.clear_button.cget('state'),
-            'progress_value': self.progress['value'],
-            'status_text': self.status_label.cget('text')
-        }
-
         try:
-            if self.spotify_art_var.get():
-                self.fetch_spotify_album_art(output_dir)
-
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            if platform.system() == "Darwin":
-                ffmpeg_exe = os.path.join(resource_path("ffmpeg"), "ffmpeg")
-                yt_dlp_exe = os.path.join(resource_path("yt-dlp"), "yt-dlp")
-            elif platform.system() == "Linux":
-                ffmpeg_exe = shutil.which("ffmpeg") or "ffmpeg"
-                yt_dlp_exe = shutil.which("yt-dlp") or "yt-dlp"
-            else:
-                ffmpeg_exe = os.path.join(base_dir, "ffmpeg", "ffmpeg.exe")
-                yt_dlp_exe = os.path.join(base_dir, "yt-dlp", "yt-dlp.exe")
+            post(('status', 'Starting conversion...'))
+            cookies_path = self.config.get('cookies_path')
+            if cookies_path and not os.path.isfile(cookies_path):
+                post(('error', 'Missing Cookies', f'Cookies file not found: {cookies_path}'))
+                return
 
+            ffmpeg_exe, yt_dlp_exe = core.find_executables(self.config)
+            ffmpeg_exe = shutil.which(ffmpeg_exe) or ffmpeg_exe
+            yt_dlp_exe = shutil.which(yt_dlp_exe) or yt_dlp_exe
             if not os.path.isfile(ffmpeg_exe) or not os.path.isfile(yt_dlp_exe):
                 missing = []
                 if not os.path.isfile(ffmpeg_exe): missing.append('ffmpeg')
                 if not os.path.isfile(yt_dlp_exe): missing.append('yt-dlp')
-                messagebox.showerror('Missing Executable', f"{', '.join(missing)} not found. Please install.")
+                post(('error', 'Missing Executable', f"{', '.join(missing)} not found. Please install."))
                 return
 
-            rows = list(csv.DictReader(open(self.csv_path, newline='', encoding='utf-8')))
-            total = len(rows)
-            self.progress['maximum'] = total
-            archive_file = os.path.join(output_dir, 'downloaded.txt')
-            creationflags = subprocess.CREATE_NO_WINDOW if platform.system() == 'Windows' else 0
-
-            for i, row in enumerate(rows, start=1):
-                title = row.get('Track Name') or row.get('Track name') or 'Unknown'
-                artist_raw = row.get('Artist Name(s)') or row.get('Artist name') or 'Unknown'
-                artist_primary = re.split(r'[,/&]| feat\.| ft\.', artist_raw, flags=re.I)[0].strip()
-                safe_artist = re.sub(r"[^\w\s]", '', artist_primary)
-                album = row.get('Album Name') or row.get('Album') or playlist_name
-                spotify_ms = row.get('Duration (ms)')
-                spotify_sec = int(spotify_ms) / 1000 if spotify_ms and spotify_ms.isdigit() else None
-
-                safe_title = re.sub(r"[^\w\s]", '', title)
-                variants = self.config.get('variants') or ['']
-                if 'instrumental' in title.lower():
-                    variants.insert(0, 'instrumental')
-
-                best_file = None
-                for variant in variants:
-                    parts = [safe_title]
-                    if safe_artist and safe_artist.lower() != 'unknown': parts.append(safe_artist)
-                    if variant: parts.append(variant)
-                    q = ' '.join(parts)
-                    print(f"Searching for → {q!r}")
-                    self.status_label.config(text=f"[{i}/{total}] Searching: {q}")
-                    self.root.update_idletasks()
-
-                    def yt_cmd(extra_args, search_spec):
-                        cmd = [yt_dlp_exe, f"--ffmpeg-location={os.path.dirname(ffmpeg_exe)}", "--no-config"]
-                        if cookies_path: cmd += ["--cookies", cookies_path]
-                        cmd += extra_args + [search_spec]
-                        return cmd
-
-                    if self.deep_search_var.get():
-                        # Phase 1: quick flat-playlist probe
-                        proc_q = subprocess.run(
-                            yt_cmd(["--flat-playlist", "--dump-single-json", "--no-playlist"], f"ytsearch1:{q}"),
-                            capture_output=True, text=True, creationflags=creationflags
-                        )
-                        try:
-                            data_q = json.loads(proc_q.stdout) or {}
-                        except Exception:
-                            data_q = {}
-                        if not isinstance(data_q, dict): data_q = {}
-                        entries_q = data_q.get('entries') if isinstance(data_q.get('entries'), list) else []
-                        top = entries_q[0] if entries_q else {}
-
-                        vid_title = top.get('title', '')
-                        upl = (top.get('uploader') or '').lower()
-                        duration = top.get('duration') or 0
-                        passes = (
-                            safe_title.lower() in vid_title.lower()
-                            and (not safe_artist or safe_artist.lower() in upl)
-                            and (not spotify_sec or abs(duration - spotify_sec) <= 10)
-                            and (duration >= duration_min and duration <= duration_max)
-                        )
-                        if passes:
-                            download_spec = top.get('webpage_url', f"https://www.youtube.com/watch?v={top.get('id','')}" )
-                        else:
-                            print("Deep searching : " + title)
-                            # Phase 2: deep-search candidate IDs
-                            proc_ids = subprocess.run(
-                                yt_cmd(["--flat-playlist", "--dump-single-json", "--no-playlist"], f"ytsearch3:{q}"),
-                                capture_output=True, text=True, creationflags=creationflags
-                            )
-                            try:
-                                tmp = json.loads(proc_ids.stdout) or {}
-                            except Exception:
-                                tmp = {}
-                            data_ids = tmp if isinstance(tmp, dict) else {}
-                            entries_ids = data_ids.get('entries') if isinstance(data_ids.get('entries'), list) else []
-                            ids = [e for e in entries_ids if isinstance(e, dict)][:3]
-
-                            scored = []
-                            first_words = normalize(title).split()[:5]
-                            for entry in ids:
-                                vid = entry.get('id')
-                                url = f"https://www.youtube.com/watch?v={vid}"
-                                proc_i = subprocess.run(
-                                    yt_cmd(["--dump-single-json", "--no-playlist"], url),
-                                    capture_output=True, text=True, creationflags=creationflags
-                                )
-                                if "Sign in to confirm your age" in (proc_i.stderr or ''):
-                                    continue
-                                try:
-                                    info = json.loads(proc_i.stdout) or {}
-                                except Exception:
-                                    continue
-
-                                raw_title = info.get('title','')
-                                low = raw_title.lower()
-                                up2 = (info.get('uploader') or '').lower()
-                                dur2 = info.get('duration') or 0
-                                # enforce duration bounds
-                                if dur2 < duration_min or dur2 > duration_max:
-                                    continue
-                                if 'shorts/' in info.get('webpage_url','') or '#shorts' in low: continue
-                                if safe_artist.lower() and safe_artist.lower() not in up2: continue
-                                if variant and variant.lower() not in low: continue
-                                if not contains_keywords_in_order(raw_title, first_words): continue
-                                score = 100 if low.startswith(safe_title.lower()) else 80
-                                if spotify_sec: score -= abs(dur2 - spotify_sec)
-                                scored.append((score, url))
-                            download_spec = scored and max(scored, key=lambda x: x[0])[1] or f"ytsearch1:{q}"
-                    else:
-                        download_spec = f"ytsearch1:{q}"
-
-                    # Download
-                    file_title = re.sub(r"[^\w\s]", "", title).strip()
-                    base = f"{i:03d} - {file_title}" + (f" - {variant}" if variant else "")
-                    tmpl = base + ".%(ext)s"
-                    cmd_dl = yt_cmd([
-                        '--download-archive', archive_file,
-                        '-f', 'bestaudio[ext=m4a]/bestaudio',
-                        '--output', os.path.join(output_dir, tmpl),
-                        '--no-playlist'
-                    ], download_spec)
-                    if self.thumb_var.get(): cmd_dl += ['--embed-thumbnail','--add-metadata']
-                    if self.mp3_var.get(): cmd_dl += ['--extract-audio','--audio-format','mp3','--audio-quality','0']
-                    else: cmd_dl += ['--remux-video','m4a']
-                    if self.exclude_instr_var.get(): cmd_dl += ['--reject-title','instrumental']
-
-                    ret = subprocess.run(cmd_dl, capture_output=True, text=True, creationflags=creationflags)
-                    if ret.returncode != 0:
-                        stderr = ret.stderr or ''
-                        if 'Sign in to confirm your age' in stderr:
-                            not_found_songs.append({
-                                'Track Name': title,
-                                'Artist Name(s)': artist_primary,
-                                'Album Name': album,
-                                'Track Number': i,
-                                'Error': 'Age-restricted video'
-                            })
-                            break
-                        else:
-                            print(f"Download failed for {download_spec}: {stderr[:200]}")
-                            continue
-                    out_ext = '.mp3' if self.mp3_var.get() else '.m4a'
-                    candidate_path = os.path.join(output_dir, base + out_ext)
-                    if os.path.isfile(candidate_path):
-                        best_file = candidate_path
-                        if out_ext == '.m4a':
-                            audio = MP4(best_file); tags = audio.tags or MP4Tags()
-                            tags['\xa9nam']=[title]; tags['\xa9ART']=[artist_primary]; tags['\xa9alb']=[album]; audio.save()
-                        else:
-                            audio = EasyID3();
-                            try: audio.load(best_file)
-                            except: pass
-                            audio.update({'artist':artist_primary,'title':title,'album':album,'tracknumber':str(i)}); audio.save()
-                        downloaded.append(os.path.basename(best_file))
-                        break
-
-                if not best_file:
-                    not_found_songs.append({'Track Name':title,'Artist Name(s)':artist_primary,'Album Name':album,'Track Number':i,'Error':'No valid download'})
-
-                elapsed = time.time() - start_time
-                eta = timedelta(seconds=int((elapsed/i)*(total-i)))
-                self.progress['value']=i
-                self.status_label.config(text=f"Downloaded {i}/{total}, ETA: {eta}")
-                self.root.update_idletasks()
-
-            if not_found_songs:
-                nf_path = os.path.join(output_dir, f"{playlist_name}_not_found.csv")
-                with open(nf_path, 'w', newline='', encoding='utf-8') as cf:
-                    writer = csv.DictWriter(cf, fieldnames=['Track Name','Artist Name(s)','Album Name','Track Number','Error'])
-                    writer.writeheader()
-                    writer.writerows(not_found_songs)
-            if self.m3u_var.get():
-                m3u_filename = playlist_name.replace('_',' ')
-                m3u_path = os.path.join(output_dir, f"{m3u_filename}.m3u")
-                with open(m3u_path,'w',encoding='utf-8') as m3u:
-                    m3u.write('#EXTM3U\n')
-                    audio_files = sorted([f for f in os.listdir(output_dir) if f.lower().endswith(('.mp3','.m4a'))], key=lambda x: os.path.getctime(os.path.join(output_dir,x)))
-                    for fn in audio_files:
-                        m3u.write(f'#EXTINF:-1,{os.path.splitext(fn)[0]}\n')
-                        m3u.write(f'{fn}\n')
-
-            if self.spotify_art_var.get():
-                self.rename_album_art(output_dir)
-                self.embed_all_artwork(output_dir)
-
-            self.progress['value'] = self.progress['maximum']
-            self.root.config(cursor='')
-            self.convert_button.config(state=tk.NORMAL)
-            self.clear_button.config(state=tk.NORMAL)
-            self.status_label.config(text=f"✅ Completed in {timedelta(seconds=int(time.time()-start_time))}")
-            self.root.bell()
-
+            convert = core.retry_failures if retry else core.convert_playlist
+            convert(
+                csv_path,
+                output_folder,
+                dict(self.config, ffmpeg_path=ffmpeg_exe, yt_dlp_path=yt_dlp_exe),
+                progress_callback=lambda current, total, text: post(('progress', current, total, text)),
+                event_callback=lambda event: post(('track', event)),
+                cancel_token=self.cancel_token,
+                executor=self.get_executor(),
+                **options,
+            )
+            post(('completed', f"✅ Completed in {timedelta(seconds=int(time.time()-start_time))}"))
+        except core.Cancelled:
+            post(('cancelled',))
         except Exception as e:
-            self.restore_state(initial_state)
-            messagebox.showerror('Error', f'Unexpected error: {e}')
+            post(('error', 'Error', f'Unexpected error: {e}'))
         finally:
+            post(('finished',))
+
+    def get_executor(self):
+        # One pool for the app's lifetime so later runs start warm
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=int(self.config.get('workers') or 1))
+        return self.executor
+
+    def drain_events(self):
+        """Apply queued worker events on the Tk thread, at most once per frame.
+
+        Progress updates are coalesced: only the newest one is drawn, so a
+        burst of thousands of events costs a single redraw.
+        """
+        latest_progress = None
+        finished = False
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            kind = event[0]
+            if kind == 'progress':
+                latest_progress = event
+                continue
+            if kind == 'track':
+                self.track_model.apply(event[1])
+                if event[1]['state'] in ('done', 'not_found'):
+                    self.completed += 1
+                continue
+            if latest_progress:
+                self.show_progress(*latest_progress[1:])
+                latest_progress = None
+            if kind == 'status':
+                self.status_label.config(text=event[1])
+            elif kind == 'completed':
+                self.progress['value'] = self.progress['maximum']
+                self.root.config(cursor='')
+                self.status_label.config(text=event[1])
+                self.root.bell()
+            elif kind == 'cancelled':
+                self.restore_state(self.initial_state)
+                self.status_label.config(text='Conversion cancelled.')
+            elif kind == 'error':
+                self.restore_state(self.initial_state)
+                messagebox.showerror(event[1], event[2])
+            elif kind == 'finished':
+                finished = True
+        if latest_progress:
+            self.show_progress(*latest_progress[1:])
+        self.refresh_tracks()
+
+        if finished:
             self.convert_button.config(state=tk.NORMAL)
             self.clear_button.config(state=tk.NORMAL)
-            self.root.update_idletasks()
+            self.cancel_button.config(state=tk.DISABLED)
+            self.pause_button.config(state=tk.DISABLED, text='Pause')
+            self.retry_button.config(state=tk.NORMAL if self.track_model.counts().get('not_found') else tk.DISABLED)
+            self.root.config(cursor='')
+        else:
+            self.root.after(EVENT_PUMP_MS, self.drain_events)
+
+    def refresh_tracks(self):
+        dirty = self.track_model.take_dirty()
+        if not dirty:
+            return
+        self.track_table.refresh(dirty)
+        counts = self.track_model.counts()
+        active = sum(counts.get(s, 0) for s in ('searching', 'downloading', 'downloaded'))
+        self.track_summary.config(
+            text=f"Done: {counts.get('done', 0)}   Not found: {counts.get('not_found', 0)}   "
+                 f"Active: {active}   Queued: {counts.get('queued', 0)}"
+        )
+
+    def show_progress(self, current, total, text):
+        # Tracks finish out of order with parallel workers; the bar counts finished ones
+        self.progress['maximum'] = total
+        self.progress['value'] = self.completed
+        self.status_label.config(text=f"[{current}/{total}] {text}")
+
+    def cancel_conversion(self):
+        if self.cancel_token:
+            self.cancel_token.cancel()
+            self.cancel_button.config(state=tk.DISABLED)
+            self.pause_button.config(state=tk.DISABLED)
+            self.status_label.config(text='Cancelling...')
+
+    def toggle_pause(self):
+        if not self.cancel_token:
+            return
+        if self.cancel_token.paused:
+            self.cancel_token.resume()
+            self.pause_button.config(text='Pause')
+            self.status_label.config(text='Resumed.')
+        else:
+            self.cancel_token.pause()
+            self.pause_button.config(text='Resume')
+            self.status_label.config(text='Paused after the current track step.')
 
 
+    def on_close(self):
+        # Stop running downloads so pool threads don't keep the process alive
+        if self.cancel_token:
+            self.cancel_token.cancel()
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
 
     def restore_state(self, state):
         """Restore the UI to its initial state"""
@@ -924,6 +656,7 @@ class Spotify2MP3GUI:
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # worker processes of frozen builds
     if _tkdnd_imported:
         try:
             root = TkinterDnD.Tk()
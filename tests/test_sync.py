@@ -0,0 +1,83 @@
+import csv
+import json
+import os
+import stat
+import sys
+import textwrap
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+
+# Stand-ins for yt-dlp and ffmpeg: "downloads" write a few bytes named after
+# the query and honour --download-archive like the real tool, printing no ID
+# for archived videos
+FAKE_YT_DLP = """
+    import hashlib, os, sys
+    args = sys.argv[1:]
+    spec = args[-1]
+    video_id = hashlib.md5(spec.encode()).hexdigest()[:11]
+    archive = args[args.index("--download-archive") + 1]
+    if os.path.isfile(archive) and f"youtube {video_id}\\n" in open(archive).read():
+        sys.exit(0)
+    out = args[args.index("--output") + 1].replace("%(ext)s", "webm")
+    with open(out, "wb") as f:
+        f.write(b"\\0" * 1024)
+    with open(archive, "a") as f:
+        f.write(f"youtube {video_id}\\n")
+    print(video_id)
+"""
+FAKE_FFMPEG = """
+    import shutil, sys
+    args = sys.argv[1:]
+    shutil.copy(args[args.index("-i") + 1], args[-1])
+"""
+
+
+def write_script(path, body):
+    with open(path, "w") as f:
+        f.write(f"#!{sys.executable}\n" + textwrap.dedent(body))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def manifest_ids(output_dir):
+    with open(os.path.join(output_dir, core.MANIFEST_FILE), encoding="utf-8") as f:
+        return [t["video_id"] for t in json.load(f)["tracks"]]
+
+
+def test_video_ids_survive_reruns_and_sync(tmp_path):
+    csv_path = tmp_path / "mix.csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Track URI", "Track Name", "Artist Name(s)", "Album Name"])
+        writer.writerow(["spotify:track:a", "Alpha", "Ann", "A"])
+        writer.writerow(["spotify:track:b", "Beta", "Bob", "B"])
+    config = dict(
+        core.load_config(),
+        yt_dlp_path=write_script(tmp_path / "yt-dlp", FAKE_YT_DLP),
+        ffmpeg_path=write_script(tmp_path / "ffmpeg", FAKE_FFMPEG),
+        workers=1,
+        preflight=False,
+    )
+    out = str(tmp_path / "out")
+    output_dir = os.path.join(out, "mix")
+    options = dict(deep_search=False, transcode_mp3=True, generate_m3u=False)
+
+    core.convert_playlist(str(csv_path), out, config, **options)
+    ids = manifest_ids(output_dir)
+    assert all(ids)
+
+    # Every download is now an archive skip
+    core.convert_playlist(str(csv_path), out, config, **options)
+    assert manifest_ids(output_dir) == ids
+    core.sync_playlist(str(csv_path), out, config, **options)
+    assert manifest_ids(output_dir) == ids
+
+    # A deleted file is fetched again, under the same ID
+    os.remove(os.path.join(output_dir, "001 - Alpha.mp3"))
+    downloaded, _ = core.sync_playlist(str(csv_path), out, config, **options)
+    assert downloaded == ["001 - Alpha.mp3"]
+    assert os.path.isfile(os.path.join(output_dir, "001 - Alpha.mp3"))
+    core.sync_playlist(str(csv_path), out, config, **options)
+    assert manifest_ids(output_dir) == ids
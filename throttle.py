@@ -0,0 +1,153 @@
+import re
+import select
+import socket
+import socketserver
+import threading
+import time
+
+CHUNK_SIZE = 16384
+RATE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_rate(value):
+    """
+    Parse a bandwidth setting such as 500K, 2.5M or 1048576 (bytes/sec),
+    the same notation as yt-dlp's --limit-rate. Returns 0 for no limit.
+    """
+    if not value:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?)i?B?(?:/s)?\s*", str(value), re.I)
+    if not match:
+        raise ValueError(f"Invalid bandwidth limit: {value!r}")
+    return int(float(match.group(1)) * RATE_UNITS[match.group(2).upper()])
+
+
+class BandwidthLimiter:
+    """
+    Token bucket shared by every connection in the process.
+
+    Readers reserve bytes before passing them on and sleep off any debt, so
+    the total rate stays at ``rate`` however many downloads are running and
+    each one gets an even share as others start and finish.
+    """
+
+    def __init__(self, rate, burst=0.25):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = 0.0
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n):
+        with self._lock:
+            rate = self.rate
+            if rate <= 0:
+                return
+            now = time.monotonic()
+            self.tokens = min(rate * self.burst, self.tokens + (now - self.last) * rate)
+            self.last = now
+            self.tokens -= n
+            delay = -self.tokens / rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+
+class ThrottledProxyHandler(socketserver.BaseRequestHandler):
+    """
+    Minimal HTTP proxy: tunnels CONNECT requests and forwards plain HTTP
+    requests, pacing the bytes coming back from the server.
+    """
+
+    def handle(self):
+        client = self.request
+        head = b""
+        while b"\r\n\r\n" not in head:
+            data = client.recv(CHUNK_SIZE)
+            if not data:
+                return
+            head += data
+            if len(head) > 65536:
+                return
+        method, target = head.split(b" ", 2)[:2]
+        if method.upper() == b"CONNECT":
+            host, _, port = target.decode("latin-1").rpartition(":")
+            port = int(port or 443)
+        else:
+            match = re.match(r"http://([^/:]+)(?::(\d+))?", target.decode("latin-1"))
+            if not match:
+                client.sendall(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+                return
+            host, port = match.group(1), int(match.group(2) or 80)
+        try:
+            upstream = socket.create_connection((host.strip("[]"), port), timeout=30)
+        except OSError:
+            client.sendall(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
+            return
+        with upstream:
+            if method.upper() == b"CONNECT":
+                client.sendall(b"HTTP/1.1 200 Connection established\r\n\r\n")
+                early = head.split(b"\r\n\r\n", 1)[1]
+                if early:
+                    upstream.sendall(early)
+            else:
+                # Origin servers accept absolute-form request targets
+                upstream.sendall(head)
+            self.pipe(client, upstream)
+
+    def pipe(self, client, upstream):
+        limiter = self.server.limiter
+        sockets = [client, upstream]
+        while True:
+            readable, _, _ = select.select(sockets, [], [], 60)
+            if not readable:
+                return
+            for sock in readable:
+                data = sock.recv(CHUNK_SIZE)
+                if not data:
+                    return
+                if sock is upstream:
+                    limiter.consume(len(data))
+                    client.sendall(data)
+                else:
+                    upstream.sendall(data)
+
+
+class ThrottledProxy(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, rate, host="127.0.0.1", port=0):
+        super().__init__((host, port), ThrottledProxyHandler)
+        self.limiter = BandwidthLimiter(rate)
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+_proxy = None
+_proxy_lock = threading.Lock()
+
+
+def shared_proxy(limit):
+    """
+    Return the URL of the process-wide throttling proxy for ``limit``
+    (see parse_rate), starting it on first use, or None when unlimited.
+
+    Later calls with a different limit retune the running proxy, so a
+    reloaded config takes effect for downloads already in flight.
+    """
+    global _proxy
+    rate = parse_rate(limit)
+    with _proxy_lock:
+        if _proxy is None:
+            if rate <= 0:
+                return None
+            _proxy = ThrottledProxy(rate)
+        _proxy.limiter.rate = rate
+        return _proxy.url if rate > 0 else None
@@ -0,0 +1,98 @@
+import threading
+
+COLUMNS = ("#", "Title", "State", "Match", "Speed", "Error")
+
+STATE_LABELS = {
+    "queued": "Queued",
+    "searching": "Searching",
+    "downloading": "Downloading",
+    "downloaded": "Tagging",
+    "transcoding": "Transcoding",
+    "done": "Done",
+    "not_found": "Not found",
+    "kept": "Up to date",
+}
+
+
+def format_speed(bytes_per_sec):
+    if not bytes_per_sec:
+        return ""
+    for unit in ("B/s", "KB/s", "MB/s"):
+        if bytes_per_sec < 1024 or unit == "MB/s":
+            return f"{bytes_per_sec:.0f} {unit}"
+        bytes_per_sec /= 1024
+
+
+class TrackTableModel:
+    """
+    Per-track status rows for a playlist, fed by core's event_callback.
+
+    Views never read the event stream directly: events are folded into rows
+    with ``apply`` (cheap, any thread) and views ask for ``take_dirty`` once
+    per frame to redraw only the rows that changed and are visible.
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.dirty = set()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def reset(self, titles):
+        """Start a new run with one queued row per CSV track, in order."""
+        with self.lock:
+            self.rows = [
+                {
+                    "number": n,
+                    "title": title,
+                    "state": "queued",
+                    "match": "",
+                    "speed": None,
+                    "error": "",
+                }
+                for n, title in enumerate(titles, start=1)
+            ]
+            self.dirty = set(range(len(self.rows)))
+
+    def apply(self, event):
+        index = event["track"] - 1
+        with self.lock:
+            if not 0 <= index < len(self.rows):
+                return
+            row = self.rows[index]
+            row["state"] = event["state"]
+            if event.get("source"):
+                row["match"] = event["source"]
+            if event.get("file"):
+                row["match"] = event["file"]
+            if event.get("speed"):
+                row["speed"] = event["speed"]
+            row["error"] = event.get("error") or ""
+            self.dirty.add(index)
+
+    def take_dirty(self):
+        """Indexes of rows changed since the last call, in order."""
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+        return sorted(dirty)
+
+    def values(self, index):
+        """Display strings for one row, matching COLUMNS."""
+        row = self.rows[index]
+        return (
+            str(row["number"]),
+            row["title"],
+            STATE_LABELS.get(row["state"], row["state"]),
+            row["match"],
+            format_speed(row["speed"]),
+            row["error"],
+        )
+
+    def counts(self):
+        with self.lock:
+            counts = {}
+            for row in self.rows:
+                counts[row["state"]] = counts.get(row["state"], 0) + 1
+        return counts
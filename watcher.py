@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import core
+
+STATE_FILE = ".watcher_state.json"
+
+
+class InboxWatcher:
+    """
+    Long-running service that converts playlist CSVs dropped into a folder.
+
+    The inbox is polled every ``interval`` seconds. A CSV is queued once its
+    size and modification time are unchanged between two polls (so half-copied
+    files are not picked up) and differ from the last version processed.
+    Jobs run one at a time on a background thread and share the loaded
+    config, the search cache, the resolved executables and one worker pool.
+    """
+
+    def __init__(self, inbox, output_folder, interval=5, sync=True, workers=None):
+        self.inbox = inbox
+        self.output_folder = output_folder
+        self.interval = interval
+        self.sync = sync
+        self.search_cache = core.SearchCache()
+        self.config = None
+        self.config_mtime = None
+        self.reload_config()
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or int(self.config.get("workers") or 1)
+        )
+        self.jobs = queue.Queue()
+        self.queued = set()
+        self.seen = {}
+        self.state_path = os.path.join(inbox, STATE_FILE)
+        self.processed = self.load_state()
+        self.stop_event = threading.Event()
+
+    def load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.processed, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def reload_config(self):
+        try:
+            mtime = os.path.getmtime(core.CONFIG_FILE)
+        except OSError:
+            mtime = None
+        if self.config is None or mtime != self.config_mtime:
+            self.config = core.load_config()
+            self.config["ffmpeg_path"], self.config["yt_dlp_path"] = (
+                core.find_executables(self.config)
+            )
+            self.config_mtime = mtime
+
+    def scan(self):
+        """Queue every CSV in the inbox that is new or changed and has settled."""
+        for name in sorted(os.listdir(self.inbox)):
+            if not name.lower().endswith(".csv"):
+                continue
+            path = os.path.join(self.inbox, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            signature = [st.st_mtime_ns, st.st_size]
+            settled = self.seen.get(name) == signature
+            self.seen[name] = signature
+            if not settled or self.processed.get(name) == signature:
+                continue
+            if name not in self.queued:
+                self.queued.add(name)
+                self.jobs.put((name, signature))
+                print(f"Queued {name}")
+
+    def run_job(self, name, signature):
+        self.reload_config()
+        csv_path = os.path.join(self.inbox, name)
+        cfg = self.config
+        convert = core.sync_playlist if self.sync else core.convert_playlist
+        start = time.time()
+        print(f"Starting {name}")
+        downloaded, not_found = convert(
+            csv_path,
+            self.output_folder,
+            cfg,
+            deep_search=core.config_flag(cfg, "deep_search", True),
+            transcode_mp3=core.config_flag(cfg, "transcode_mp3"),
+            generate_m3u=core.config_flag(cfg, "generate_m3u", True),
+            exclude_instrumentals=core.config_flag(cfg, "exclude_instrumentals"),
+            search_cache=self.search_cache,
+            executor=self.executor,
+        )
+        print(
+            f"Finished {name} in {time.time() - start:.1f}s: "
+            f"{len(downloaded)} downloaded, {len(not_found)} not found"
+        )
+
+    def worker(self):
+        while not self.stop_event.is_set():
+            try:
+                name, signature = self.jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.run_job(name, signature)
+            except Exception:
+                print(f"Error converting {name}:")
+                traceback.print_exc()
+            finally:
+                # Failed jobs are not retried until the CSV changes again
+                self.processed[name] = signature
+                self.save_state()
+                self.queued.discard(name)
+                self.jobs.task_done()
+
+    def run_forever(self):
+        print(f"Watching {self.inbox} → {self.output_folder}")
+        thread = threading.Thread(target=self.worker, daemon=True)
+        thread.start()
+        try:
+            while not self.stop_event.is_set():
+                self.scan()
+                self.stop_event.wait(self.interval)
+        except KeyboardInterrupt:
+            print("Stopping watcher")
+        finally:
+            self.stop_event.set()
+            thread.join()
+            self.executor.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert playlist CSVs as they appear in an inbox folder"
+    )
+    parser.add_argument("inbox", help="Folder to watch for CSV exports")
+    parser.add_argument("output_folder", help="Folder to write playlists into")
+    parser.add_argument(
+        "--interval", type=float, default=5, help="Seconds between inbox scans"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Always run a full conversion instead of syncing existing folders",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Parallel tracks (default: config 'workers')"
+    )
+    args = parser.parse_args()
+    os.makedirs(args.output_folder, exist_ok=True)
+    InboxWatcher(
+        args.inbox,
+        args.output_folder,
+        interval=args.interval,
+        sync=not args.full,
+        workers=args.workers,
+    ).run_forever()
+
+
+if __name__ == "__main__":
+    main()